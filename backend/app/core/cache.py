@@ -0,0 +1,260 @@
+# ==========================================
+# IN-PROCESS CACHES
+# ==========================================
+# Small helpers for keeping hot lookups in memory so we don't pay a network
+# round-trip to Supabase for data we asked for a moment ago.
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe "Least Recently Used" cache.
+
+    When it is full, the entry that was read/written longest ago gets evicted.
+    Used e.g. for (student_id, program_id) -> enrollment_id lookups.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        # FastAPI runs sync routes in a threadpool, so guard the dict
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            # Mark as "recently used" by moving it to the end
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                # popitem(last=False) removes the OLDEST entry
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+# ==========================================
+# READ-THROUGH CACHE (Reference Data)
+# ==========================================
+# Programs, batches and exams change a few times a week but are read on every page.
+# 'ReadThroughCache' sits in front of repository methods:
+#
+#     @cache.cached("programs")
+#     def get_all_programs(self): ...        # 1st call -> DB, next calls -> memory
+#
+#     cache.invalidate("programs")           # called from create_program() etc.
+#
+# Invalidation works with "generations": every namespace has a counter that is part of
+# each key. Bumping the counter makes all old keys unreachable at once (they simply age
+# out), so we never have to list or delete keys one by one - which also works on Redis,
+# where several worker processes share the same counters.
+#
+# Backends:
+#   - MemoryCacheBackend: in-process LRU with a TTL per entry (default).
+#   - RedisCacheBackend: any redis-py compatible client (redis.Redis, fakeredis.FakeRedis, ...).
+# Pick one with the CACHE_BACKEND environment variable ("memory" or "redis" + REDIS_URL).
+
+import functools
+import json
+import os
+import time
+
+_MISS = object()
+
+
+class MemoryCacheBackend:
+    """In-process backend: a bounded LRU where every entry also has an expiry time."""
+    def __init__(self, maxsize: int = 1024):
+        self._lru = LRUCache(maxsize)
+        # Generation counters live OUTSIDE the LRU: if one got evicted it would reset to 0
+        # and old entries with generation 0 would become reachable again.
+        self._counters = {}
+        self._counter_lock = threading.Lock()
+
+    def get(self, key: str):
+        entry = self._lru.get(key, _MISS)
+        if entry is _MISS:
+            return _MISS
+        expires_at, value = entry
+        if expires_at is not None and time.monotonic() > expires_at:
+            self._lru.delete(key)
+            return _MISS
+        return value
+
+    def set(self, key: str, value, ttl: float = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._lru.set(key, (expires_at, value))
+
+    def delete(self, key: str):
+        self._lru.delete(key)
+
+    def incr(self, key: str) -> int:
+        with self._counter_lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counter(self, key: str) -> int:
+        with self._counter_lock:
+            return self._counters.get(key, 0)
+
+    def clear(self):
+        self._lru.clear()
+
+
+class RedisCacheBackend:
+    """
+    Shared backend for multi-process deployments.
+    'client' only needs get/set/delete/incr, so tests can pass a fake (e.g. fakeredis).
+    """
+    def __init__(self, client, prefix: str = "moniem:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        # Optional dependency: only needed when CACHE_BACKEND=redis
+        try:
+            import redis
+        except ImportError:
+            raise Exception("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return _MISS
+        # Values are wrapped in {"v": ...} so a cached None is different from a miss
+        return json.loads(raw)["v"]
+
+    def set(self, key: str, value, ttl: float = None):
+        payload = json.dumps({"v": value}, default=str)
+        if ttl:
+            self.client.set(self.prefix + key, payload, ex=max(1, int(ttl)))
+        else:
+            self.client.set(self.prefix + key, payload)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str) -> int:
+        # Generation counters are plain integers (no TTL), not JSON-wrapped
+        return int(self.client.incr(self.prefix + "gen:" + key))
+
+    def get_counter(self, key: str) -> int:
+        raw = self.client.get(self.prefix + "gen:" + key)
+        return int(raw) if raw is not None else 0
+
+    def clear(self):
+        for k in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(k)
+
+
+class ReadThroughCache:
+    """
+    Namespaced read-through cache with hit/miss metrics.
+    """
+    def __init__(self, backend, default_ttl: float = 300):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    # ------------------------------------------
+    # Metrics
+    # ------------------------------------------
+    def _count(self, namespace: str, field: str):
+        # Per-record namespaces ("exam_analytics:42") are reported under their family ("exam_analytics")
+        family = namespace.split(":", 1)[0]
+        with self._stats_lock:
+            ns = self._stats.setdefault(family, {"hits": 0, "misses": 0, "invalidations": 0})
+            ns[field] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            per_namespace = {ns: dict(v) for ns, v in self._stats.items()}
+        hits = sum(v["hits"] for v in per_namespace.values())
+        misses = sum(v["misses"] for v in per_namespace.values())
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "namespaces": per_namespace
+        }
+
+    # ------------------------------------------
+    # Keys & invalidation
+    # ------------------------------------------
+    def _key(self, namespace: str, name: str, args, kwargs) -> str:
+        generation = self.backend.get_counter(namespace)
+        return f"{namespace}:{generation}:{name}:{args!r}:{sorted(kwargs.items())!r}"
+
+    def invalidate(self, *namespaces: str):
+        """Drops every cached entry of the given namespaces (e.g. after a create/delete)."""
+        for namespace in namespaces:
+            self.backend.incr(namespace)
+            self._count(namespace, "invalidations")
+
+    # ------------------------------------------
+    # Read-through
+    # ------------------------------------------
+    def get_or_load(self, namespace: str, name: str, loader, args=(), kwargs=None, ttl: float = None):
+        kwargs = kwargs or {}
+        key = self._key(namespace, name, args, kwargs)
+        value = self.backend.get(key)
+        if value is not _MISS:
+            self._count(namespace, "hits")
+            return value
+
+        self._count(namespace, "misses")
+        value = loader(*args, **kwargs)
+        self.backend.set(key, value, ttl if ttl is not None else self.default_ttl)
+        return value
+
+    def cached(self, namespace: str, ttl: float = None):
+        """
+        Decorator for repository METHODS. 'self' is left out of the key,
+        so every repository instance shares the same cached results.
+        """
+        def decorator(method):
+            name = method.__qualname__
+
+            @functools.wraps(method)
+            def wrapper(repo, *args, **kwargs):
+                return self.get_or_load(
+                    namespace, name, lambda *a, **kw: method(repo, *a, **kw), args, kwargs, ttl
+                )
+            return wrapper
+
+        return decorator
+
+
+def build_cache_from_env() -> ReadThroughCache:
+    backend_name = os.environ.get("CACHE_BACKEND", "memory").lower()
+    ttl = float(os.environ.get("CACHE_DEFAULT_TTL", "300"))
+    if backend_name == "redis":
+        backend = RedisCacheBackend.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    else:
+        backend = MemoryCacheBackend(maxsize=int(os.environ.get("CACHE_MAX_ENTRIES", "1024")))
+    return ReadThroughCache(backend, default_ttl=ttl)
+
+
+# The shared cache for reference data (programs, batches, exams)
+cache = build_cache_from_env()
@@ -0,0 +1,885 @@
+# ==========================================
+# FAKE SUPABASE (in-process PostgREST stand-in)
+# ==========================================
+# Selected with SUPABASE_BACKEND=fake. Lets the whole backend run WITHOUT a Supabase project:
+# offline benchmarks, reproducible performance work, local experiments.
+#
+# It implements the part of the supabase-py query builder our repositories use:
+#     table(...).select("*, enrollment!inner(program_id, student(name)), exam(count)", count="exact")
+#         .eq / .neq / .gt / .gte / .lt / .lte / .in_ / .is_ / .like / .ilike / .or_
+#         .order(col, desc=, nullsfirst=) / .limit / .range / .single
+#     .insert / .upsert(on_conflict=) / .update / .delete
+#     rpc("exam_analytics" | "search_students", params)
+# over plain in-memory tables that follow database_setup.sql (SERIAL ids, defaults, the generated
+# total_score, UNIQUE constraints, ON DELETE CASCADE / SET NULL, the payment_outbox trigger).
+#
+# Embeds follow PostgREST rules: a foreign key on THIS table embeds one object (or null),
+# a foreign key pointing AT this table embeds a list. Filters on "embed.column" filter the
+# embedded rows; with '!inner' the parent row disappears when nothing is left.
+#
+# Every call is passed through the same httpx event hooks as the real clients (as a
+# pseudo-request with a PostgREST-style URL), so /metrics, Server-Timing and the N+1 detector
+# behave exactly as against Supabase.
+#
+# Environment:
+#     FAKE_SUPABASE_LATENCY_MS  simulated network round-trip per call (default 0)
+#     FAKE_SUPABASE_JITTER_MS   + random 0..jitter ms on top (default 0)
+#     FAKE_SUPABASE_MAX_ROWS    most rows one select returns, like PostgREST's db-max-rows
+#                               (default 1000, Supabase's setting; 0 = no cap)
+#     FAKE_SUPABASE_DATA        JSON file {"table": [rows...]} loaded at startup (optional)
+
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+from urllib.parse import urlencode
+
+
+class FakeAPIError(Exception):
+    """Raised where PostgREST would answer with an error (mirrors postgrest.APIError's message)."""
+    def __init__(self, message: str, code: str = None):
+        super().__init__({"message": message, "code": code})
+        self.message = message
+        self.code = code
+
+
+# ------------------------------------------
+# Schema (mirrors database_setup.sql)
+# ------------------------------------------
+# Plus the columns the app writes that the live tables have but the setup script doesn't list:
+# enrollment.status, payment.payment_method, payment.remarks.
+def _today():
+    return date.today().isoformat()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+SCHEMA = {
+    "roles": {"pk": ("role_id",), "columns": ("role_id", "role_name"), "unique": [("role_name",)]},
+    "users": {
+        "pk": ("user_id",),
+        "columns": ("user_id", "user_name", "email", "password_hash", "role_id"),
+        "unique": [("email",)],
+        "fks": {"role_id": ("roles", "set null")},
+    },
+    "batch": {"pk": ("batch_id",), "columns": ("batch_id", "batch_name")},
+    "program": {
+        "pk": ("program_id",),
+        "columns": ("program_id", "program_name", "batch_id", "monthly_fee", "start_date", "end_date"),
+        "defaults": {"monthly_fee": lambda: 0},
+        "fks": {"batch_id": ("batch", "set null")},
+    },
+    "teacher": {
+        "pk": ("teacher_id",),
+        "columns": ("teacher_id", "full_name", "contact", "user_id"),
+        "unique": [("user_id",)],
+        "fks": {"user_id": ("users", "cascade")},
+    },
+    "teacher_program_enrollment": {
+        "pk": ("teacher_id", "program_id"),
+        "serial": False,
+        "columns": ("teacher_id", "program_id", "field"),
+        "fks": {"teacher_id": ("teacher", "cascade"), "program_id": ("program", "cascade")},
+    },
+    "student": {
+        "pk": ("student_id",),
+        "columns": ("student_id", "name", "fathers_name", "school", "contact", "roll_no", "class",
+                    "user_id", "created_at", "updated_at"),
+        "defaults": {"created_at": _now, "updated_at": _now},
+        "unique": [("user_id",)],
+        "fks": {"user_id": ("users", "set null")},
+    },
+    "enrollment": {
+        "pk": ("enrollment_id",),
+        "columns": ("enrollment_id", "student_id", "program_id", "enrollment_date", "status"),
+        "defaults": {"enrollment_date": _today, "status": lambda: "active"},
+        "fks": {"student_id": ("student", "cascade"), "program_id": ("program", "cascade")},
+    },
+    "exam": {
+        "pk": ("exam_id",),
+        "columns": ("exam_id", "program_id", "exam_name", "exam_date", "exam_type", "subject", "total_marks"),
+        "fks": {"program_id": ("program", "cascade")},
+    },
+    "student_individual_result": {
+        "pk": ("result_id",),
+        "columns": ("result_id", "enrollment_id", "exam_id", "written_marks", "mcq_marks", "total_score"),
+        "defaults": {"written_marks": lambda: 0, "mcq_marks": lambda: 0},
+        "generated": {"total_score": lambda r: (r.get("written_marks") or 0) + (r.get("mcq_marks") or 0)},
+        "unique": [("enrollment_id", "exam_id")],
+        "fks": {"enrollment_id": ("enrollment", "cascade"), "exam_id": ("exam", "cascade")},
+    },
+    "attendance": {
+        "pk": ("attendance_id",),
+        "columns": ("attendance_id", "enrollment_id", "status", "date"),
+        "defaults": {"date": _today},
+        "unique": [("enrollment_id", "date")],
+        "fks": {"enrollment_id": ("enrollment", "cascade")},
+    },
+    "payment": {
+        "pk": ("payment_id",),
+        "columns": ("payment_id", "enrollment_id", "paid_amount", "month", "year", "transaction_group_id",
+                    "status", "payment_date", "payment_method", "remarks"),
+        "defaults": {"paid_amount": lambda: 0, "payment_date": _today},
+        "fks": {"enrollment_id": ("enrollment", "cascade")},
+    },
+    "payment_event": {
+        "pk": ("event_id",),
+        "columns": ("event_id", "event_type", "transaction_group_id", "payload", "created_at"),
+        "defaults": {"event_type": lambda: "payments.created", "created_at": _now},
+    },
+    "payment_event_consumer": {
+        "pk": ("consumer",),
+        "serial": False,
+        "columns": ("consumer", "last_event_id", "updated_at"),
+        "defaults": {"last_event_id": lambda: 0, "updated_at": _now},
+    },
+}
+
+
+class Table:
+    """Rows keyed by primary key, plus hash indexes on every FK / unique column."""
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.pk = spec["pk"]
+        self.columns = spec["columns"]
+        self.column_set = set(spec["columns"])
+        self.defaults = spec.get("defaults", {})
+        self.generated = spec.get("generated", {})
+        self.unique = [tuple(u) for u in spec.get("unique", [])]
+        self.fks = spec.get("fks", {})
+        self.serial = self.pk[0] if spec.get("serial", True) else None
+        self.next_id = 1
+        self.rows = {}   # pk tuple -> row dict
+        indexed = set(self.fks) | {c for u in self.unique for c in u} | set(self.pk)
+        self.indexes = {c: {} for c in indexed}
+
+    def key(self, row: dict) -> tuple:
+        return tuple(row.get(c) for c in self.pk)
+
+    def _index(self, row: dict, add: bool):
+        k = self.key(row)
+        for col, index in self.indexes.items():
+            bucket = index.setdefault(row.get(col), set()) if add else index.get(row.get(col))
+            if add:
+                bucket.add(k)
+            elif bucket is not None:
+                bucket.discard(k)
+
+    def lookup(self, col: str, value) -> list:
+        return [self.rows[k] for k in self.indexes[col].get(value, ())]
+
+    def find_unique(self, cols: tuple, row: dict):
+        candidates = self.indexes[cols[0]].get(row.get(cols[0]), ())
+        for k in candidates:
+            existing = self.rows[k]
+            if all(existing.get(c) == row.get(c) for c in cols):
+                return existing
+        return None
+
+    def check_columns(self, row: dict):
+        unknown = [c for c in row if c not in self.column_set]
+        if unknown:
+            raise FakeAPIError(f"Could not find the '{unknown[0]}' column of '{self.name}' in the schema cache",
+                               "PGRST204")
+
+    def add(self, values: dict) -> dict:
+        self.check_columns(values)
+        row = {c: None for c in self.columns}
+        for col, default in self.defaults.items():
+            row[col] = default()
+        row.update(values)
+        if self.serial and row.get(self.serial) is None:
+            row[self.serial] = self.next_id
+        if self.serial:
+            self.next_id = max(self.next_id, int(row[self.serial]) + 1)
+        for col, fn in self.generated.items():
+            row[col] = fn(row)
+        self._check_unique(row)
+        self.rows[self.key(row)] = row
+        self._index(row, add=True)
+        return row
+
+    def change(self, row: dict, values: dict) -> dict:
+        self.check_columns(values)
+        updated = {**row, **values}
+        for col, fn in self.generated.items():
+            updated[col] = fn(updated)
+        self._check_unique(updated, ignore=self.key(row))
+        self.remove(row)
+        self.rows[self.key(updated)] = updated
+        self._index(updated, add=True)
+        return updated
+
+    def remove(self, row: dict):
+        self._index(row, add=False)
+        self.rows.pop(self.key(row), None)
+
+    def _check_unique(self, row: dict, ignore=None):
+        constraints = list(self.unique)
+        if self.serial is None or ignore is None:
+            constraints.append(self.pk)
+        for cols in constraints:
+            if any(row.get(c) is None for c in cols):
+                continue  # NULLs never conflict
+            existing = self.find_unique(cols, row)
+            if existing is not None and self.key(existing) != ignore:
+                raise FakeAPIError(
+                    f'duplicate key value violates unique constraint "{self.name}_{"_".join(cols)}_key"', "23505")
+
+
+# ------------------------------------------
+# Select / filter parsing
+# ------------------------------------------
+def parse_select(text: str) -> list:
+    """
+    "a, b, rel!inner(x, sub(y)), other(count)" ->
+    [("col", "a"), ("col", "b"), ("embed", "rel", True, [...]), ("embed", "other", False, [("col", "count")])]
+    """
+    items, depth, token = [], 0, ""
+    for ch in (text or "*") + ",":
+        if ch == "," and depth == 0:
+            token = token.strip()
+            if token:
+                items.append(_parse_item(token))
+            token = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        token += ch
+    return items
+
+
+def _parse_item(token: str):
+    if "(" not in token:
+        return ("col", token)
+    head, inner = token.split("(", 1)
+    name = head.strip()
+    is_inner = name.endswith("!inner")
+    if "!" in name:
+        name = name.split("!", 1)[0]
+    if ":" in name:
+        name = name.split(":", 1)[1]
+    return ("embed", name, is_inner, parse_select(inner[:-1]))
+
+
+def _coerce(value, like):
+    """Casts a filter value (often a string from or_()) to the type of the row's value."""
+    if value is None or like is None or isinstance(like, bool):
+        return value
+    if isinstance(like, (int, float)):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+    return str(value)
+
+
+def _pattern(value: str, case_insensitive: bool):
+    # LIKE: % (or PostgREST's *) = any run, _ = one character, a backslash makes the next one literal
+    parts, escaped = [], False
+    for ch in str(value):
+        if escaped:
+            parts.append(re.escape(ch))
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        else:
+            parts.append(".*" if ch in "%*" else "." if ch == "_" else re.escape(ch))
+    regex = "".join(parts)
+    return re.compile(regex, re.IGNORECASE | re.DOTALL if case_insensitive else re.DOTALL)
+
+
+def _match(op: str, actual, expected) -> bool:
+    if op == "is":
+        token = str(expected).lower()
+        if token == "null":
+            return actual is None
+        return actual is (token == "true")
+    if op == "in":
+        return any(actual == _coerce(v, actual) for v in expected)
+    if actual is None:
+        return False
+    if op in ("like", "ilike"):
+        return _pattern(expected, op == "ilike").fullmatch(str(actual)) is not None
+    expected = _coerce(expected, actual)
+    try:
+        if op == "eq":
+            return actual == expected
+        if op == "neq":
+            return actual != expected
+        if op == "gt":
+            return actual > expected
+        if op == "gte":
+            return actual >= expected
+        if op == "lt":
+            return actual < expected
+        if op == "lte":
+            return actual <= expected
+    except TypeError:
+        return False
+    raise FakeAPIError(f"Unsupported operator '{op}'")
+
+
+def _split_top(text: str) -> list:
+    parts, depth, token = [], 0, ""
+    for ch in text:
+        if ch == "," and depth == 0:
+            parts.append(token)
+            token = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        token += ch
+    if token:
+        parts.append(token)
+    return parts
+
+
+def parse_logic(text: str, mode: str = "or"):
+    """PostgREST logic tree: 'a.gt.1,and(b.eq.2,c.gt.3),d.is.null' -> predicate(row)."""
+    preds = []
+    for part in _split_top(text):
+        part = part.strip()
+        if part.startswith(("and(", "or(")):
+            inner_mode, rest = part.split("(", 1)
+            preds.append(parse_logic(rest[:-1], inner_mode))
+            continue
+        col, op, value = part.split(".", 2)
+        if op == "in":
+            value = [v.strip().strip('"') for v in value.strip("()").split(",")]
+        preds.append(lambda row, c=col, o=op, v=value: _match(o, row.get(c), v))
+    if mode == "and":
+        return lambda row: all(p(row) for p in preds)
+    return lambda row: any(p(row) for p in preds)
+
+
+# ------------------------------------------
+# Query builder
+# ------------------------------------------
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _PseudoRequest:
+    """Just enough of httpx.Request for the instrumentation hooks."""
+    def __init__(self, method: str, url: str, headers: dict, content: bytes = b""):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.content = content
+        self.extensions = {}
+
+
+class _PseudoResponse:
+    def __init__(self, request, content: bytes, status_code: int = 200):
+        self.request = request
+        self.content = content
+        self.status_code = status_code
+
+    def read(self):
+        return self.content
+
+    async def aread(self):
+        return self.content
+
+
+class FakeQuery:
+    def __init__(self, db, table: str):
+        self._db = db
+        self._table = table
+        self._action = "select"
+        self._select = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._filters = []    # (path, op, value)
+        self._logic = []      # predicates from or_()
+        self._orders = []     # (column, desc, nullsfirst)
+        self._limit = None
+        self._offset = 0
+        self._single = False
+        self._params = []     # PostgREST-style query string, for the instrumentation hooks
+
+    # --- verbs ---
+    def select(self, columns: str = "*", count: str = None):
+        self._select, self._count = columns, count
+        self._params.append(("select", columns))
+        return self
+
+    def insert(self, data, **kwargs):
+        self._action, self._payload = "insert", data
+        return self
+
+    def upsert(self, data, on_conflict: str = None, ignore_duplicates: bool = False, **kwargs):
+        self._action, self._payload, self._on_conflict = "upsert", data, on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        if on_conflict:
+            self._params.append(("on_conflict", on_conflict))
+        return self
+
+    def update(self, data, **kwargs):
+        self._action, self._payload = "update", data
+        return self
+
+    def delete(self, **kwargs):
+        self._action = "delete"
+        return self
+
+    # --- filters ---
+    def _filter(self, column: str, op: str, value, shown=None):
+        self._filters.append((column, op, value))
+        self._params.append((column, f"{op}.{value if shown is None else shown}"))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def like(self, column, pattern):
+        return self._filter(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter(column, "ilike", pattern)
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    def in_(self, column, values):
+        values = list(values)
+        return self._filter(column, "in", values, "(" + ",".join(str(v) for v in values) + ")")
+
+    def or_(self, filters: str, **kwargs):
+        self._logic.append(parse_logic(filters))
+        self._params.append(("or", f"({filters})"))
+        return self
+
+    # --- shaping ---
+    def order(self, column: str, desc: bool = False, nullsfirst: bool = None, **kwargs):
+        self._orders.append((column, desc, nullsfirst))
+        self._params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self._limit = size
+        self._params.append(("limit", str(size)))
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self._offset, self._limit = start, end - start + 1
+        self._params.append(("offset", str(start)))
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        return self.single()
+
+    # --- execution ---
+    def _method(self) -> str:
+        if self._action == "select":
+            return "GET"
+        if self._action in ("insert", "upsert"):
+            return "POST"
+        return "PATCH" if self._action == "update" else "DELETE"
+
+    def _headers(self) -> dict:
+        if self._action == "upsert":
+            resolution = "ignore-duplicates" if self._ignore_duplicates else "merge-duplicates"
+            return {"prefer": f"resolution={resolution},return=representation"}
+        return {}
+
+    def _url(self) -> str:
+        query = urlencode(self._params)
+        return f"http://fake-supabase/rest/v1/{self._table}" + (f"?{query}" if query else "")
+
+    def _run(self):
+        return self._db.run_query(self)
+
+    def execute(self):
+        return self._db.call_sync(self._method(), self._url(), self._headers(), self._run)
+
+
+class AsyncFakeQuery(FakeQuery):
+    async def execute(self):
+        return await self._db.call_async(self._method(), self._url(), self._headers(), self._run)
+
+
+class FakeRPC:
+    def __init__(self, db, name: str, params: dict, query_class=FakeQuery):
+        self._db, self._name, self._params = db, name, params or {}
+        self._async = query_class is AsyncFakeQuery
+
+    def _url(self):
+        return f"http://fake-supabase/rest/v1/rpc/{self._name}"
+
+    def _run(self):
+        return FakeResponse(self._db.run_rpc(self._name, self._params))
+
+    def execute(self):
+        content = json.dumps(self._params, default=str).encode()
+        if self._async:
+            return self._db.call_async("POST", self._url(), {}, self._run, content)
+        return self._db.call_sync("POST", self._url(), {}, self._run, content)
+
+
+# ------------------------------------------
+# The database
+# ------------------------------------------
+class FakeDatabase:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, max_rows: int = 1000):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # A select without a limit (or with a bigger one) is cut to this many rows, silently,
+        # so code that forgets to page is as wrong here as against Supabase
+        self.max_rows = max_rows
+        self.tables = {name: Table(name, spec) for name, spec in SCHEMA.items()}
+        self._lock = threading.RLock()
+        self.sync_hooks = {"request": [], "response": []}
+        self.async_hooks = {"request": [], "response": []}
+        self.rpcs = {"exam_analytics": _rpc_exam_analytics, "search_students": _rpc_search_students}
+        # AFTER INSERT statement triggers: fn(db, inserted_rows), run in the same "transaction"
+        self.after_insert = {"payment": _trigger_payment_events}
+
+    # --- loading ---
+    def load(self, data: dict):
+        """Bulk-loads {"table": [rows]} (ids kept as given, serials continue after the max)."""
+        with self._lock:
+            for name, rows in data.items():
+                table = self._table(name)
+                for row in rows:
+                    table.add(dict(row))
+
+    def dump(self) -> dict:
+        with self._lock:
+            return {name: [dict(r) for r in t.rows.values()] for name, t in self.tables.items()}
+
+    def reset(self):
+        with self._lock:
+            self.tables = {name: Table(name, spec) for name, spec in SCHEMA.items()}
+
+    def _table(self, name: str) -> Table:
+        table = self.tables.get(name)
+        if table is None:
+            raise FakeAPIError(f"relation \"public.{name}\" does not exist", "42P01")
+        return table
+
+    # --- transport (latency + instrumentation hooks) ---
+    def _delay(self) -> float:
+        ms = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        return ms / 1000.0
+
+    def call_sync(self, method: str, url: str, headers: dict, run, content: bytes = b""):
+        request = _PseudoRequest(method, url, headers, content)
+        for hook in self.sync_hooks["request"]:
+            hook(request)
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        response = run()
+        pseudo = _PseudoResponse(request, json.dumps(response.data, default=str).encode())
+        for hook in self.sync_hooks["response"]:
+            hook(pseudo)
+        return response
+
+    async def call_async(self, method: str, url: str, headers: dict, run, content: bytes = b""):
+        request = _PseudoRequest(method, url, headers, content)
+        for hook in self.async_hooks["request"]:
+            await hook(request)
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        response = run()
+        pseudo = _PseudoResponse(request, json.dumps(response.data, default=str).encode())
+        for hook in self.async_hooks["response"]:
+            await hook(pseudo)
+        return response
+
+    # --- relationships ---
+    def _relation(self, parent: str, child: str):
+        """('one', fk column on parent) or ('many', fk column on child) or None."""
+        for col, (target, _) in self.tables[parent].fks.items():
+            if target == child:
+                return "one", col
+        for col, (target, _) in self.tables[child].fks.items():
+            if target == parent:
+                return "many", col
+        return None
+
+    # --- execution ---
+    def run_query(self, q: FakeQuery) -> FakeResponse:
+        with self._lock:
+            table = self._table(q._table)
+            if q._action == "insert":
+                return self._insert(table, q)
+            if q._action == "upsert":
+                return self._upsert(table, q)
+
+            matched = self._filter_rows(table, q)
+            if q._action == "update":
+                return FakeResponse([dict(table.change(r, q._payload)) for r in matched])
+            if q._action == "delete":
+                deleted = [dict(r) for r in matched]
+                for r in matched:
+                    self._delete_row(table, r)
+                return FakeResponse(deleted)
+            return self._select(table, q, matched)
+
+    def _insert(self, table: Table, q: FakeQuery) -> FakeResponse:
+        payload = q._payload if isinstance(q._payload, list) else [q._payload]
+        # A multi-row insert is one statement: all rows or none
+        snapshot = table.next_id
+        added = []
+        try:
+            for values in payload:
+                added.append(table.add(dict(values)))
+            trigger = self.after_insert.get(table.name)
+            if trigger:
+                trigger(self, added)
+        except Exception:
+            for row in added:
+                table.remove(row)
+            table.next_id = snapshot
+            raise
+        return FakeResponse([dict(r) for r in added])
+
+    def _upsert(self, table: Table, q: FakeQuery) -> FakeResponse:
+        payload = q._payload if isinstance(q._payload, list) else [q._payload]
+        conflict = tuple(c.strip() for c in q._on_conflict.split(",")) if q._on_conflict else table.pk
+        keys = [tuple(v.get(c) for c in conflict) for v in payload]
+        if len(set(keys)) != len(keys) and not q._ignore_duplicates:
+            raise FakeAPIError("ON CONFLICT DO UPDATE command cannot affect row a second time", "21000")
+
+        result = []
+        for values in payload:
+            existing = table.find_unique(conflict, values) if conflict != table.pk or table.serial is None \
+                else table.rows.get(tuple(values.get(c) for c in conflict))
+            if existing is not None:
+                # ON CONFLICT DO NOTHING: the existing row stays and isn't returned
+                if not q._ignore_duplicates:
+                    result.append(table.change(existing, dict(values)))
+            else:
+                result.append(table.add(dict(values)))
+        return FakeResponse([dict(r) for r in result])
+
+    def _delete_row(self, table: Table, row: dict):
+        table.remove(row)
+        # ON DELETE CASCADE / SET NULL on tables pointing at this one
+        for other in self.tables.values():
+            for col, (target, action) in other.fks.items():
+                if target != table.name:
+                    continue
+                for child in other.lookup(col, row[table.pk[0]]):
+                    if action == "cascade":
+                        self._delete_row(other, child)
+                    else:
+                        other.change(child, {col: None})
+
+    def _filter_rows(self, table: Table, q: FakeQuery) -> list:
+        top = [(c, op, v) for c, op, v in q._filters if "." not in c]
+
+        # Use a hash index for an eq / in filter when there is one
+        candidates = None
+        for col, op, value in top:
+            if col in table.indexes and op in ("eq", "in"):
+                values = value if op == "in" else [value]
+                candidates = [r for v in values for r in table.lookup(col, v)]
+                break
+        if candidates is None:
+            candidates = list(table.rows.values())
+
+        rows = []
+        for row in candidates:
+            if all(_match(op, row.get(col), value) for col, op, value in top) \
+                    and all(pred(row) for pred in q._logic):
+                rows.append(row)
+        return rows
+
+    def _select(self, table: Table, q: FakeQuery, rows: list) -> FakeResponse:
+        items = parse_select(q._select)
+        embedded_filters = [(c, op, v) for c, op, v in q._filters if "." in c]
+
+        pairs = []
+        for row in rows:
+            out = self._project(table, row, items, embedded_filters)
+            if out is not None:
+                pairs.append((row, out))
+
+        # ORDER BY: stable sorts applied last key first
+        for column, desc, nullsfirst in reversed(q._orders):
+            nulls_first = desc if nullsfirst is None else nullsfirst
+            present = [p for p in pairs if p[0].get(column) is not None]
+            missing = [p for p in pairs if p[0].get(column) is None]
+            present.sort(key=lambda p: p[0].get(column), reverse=desc)
+            pairs = missing + present if nulls_first else present + missing
+
+        count = len(pairs) if q._count else None
+        limit = q._limit
+        if self.max_rows and (limit is None or limit > self.max_rows):
+            limit = self.max_rows
+        end = None if limit is None else q._offset + limit
+        data = [out for _, out in pairs[q._offset:end]]
+
+        if q._single:
+            if len(data) != 1:
+                raise FakeAPIError("JSON object requested, multiple (or no) rows returned", "PGRST116")
+            return FakeResponse(data[0], count)
+        return FakeResponse(data, count)
+
+    def _project(self, table: Table, row: dict, items: list, filters: list):
+        """Builds the output dict for one row; returns None if an '!inner' embed came back empty."""
+        out = {}
+        for item in items:
+            if item[0] == "col":
+                name = item[1]
+                if name == "*":
+                    out.update(row)
+                elif name == "count":
+                    continue
+                else:
+                    if name not in table.column_set:
+                        raise FakeAPIError(f"column {table.name}.{name} does not exist", "42703")
+                    out[name] = row.get(name)
+                continue
+
+            _, name, inner, sub_items = item
+            child = self._table(name)
+            relation = self._relation(table.name, name)
+            if relation is None:
+                raise FakeAPIError(f"Could not find a relationship between '{table.name}' and '{name}'", "PGRST200")
+            prefix = name + "."
+            own = [(c[len(prefix):], op, v) for c, op, v in filters if c.startswith(prefix)]
+            direct = [(c, op, v) for c, op, v in own if "." not in c]
+            nested = [(c, op, v) for c, op, v in own if "." in c]
+
+            kind, col = relation
+            if kind == "one":
+                target = child.rows.get((row.get(col),))
+                value = None
+                if target is not None and all(_match(op, target.get(c), v) for c, op, v in direct):
+                    value = self._project(child, target, sub_items, nested)
+                if value is None and inner:
+                    return None
+                out[name] = value
+            else:
+                children = [
+                    c for c in child.lookup(col, row[table.pk[0]])
+                    if all(_match(op, c.get(fc), v) for fc, op, v in direct)
+                ]
+                if sub_items == [("col", "count")]:
+                    out[name] = [{"count": len(children)}]
+                    if inner and not children:
+                        return None
+                    continue
+                values = [v for v in (self._project(child, c, sub_items, nested) for c in children) if v is not None]
+                if inner and not values:
+                    return None
+                out[name] = values
+        return out
+
+    # --- RPC ---
+    def run_rpc(self, name: str, params: dict):
+        fn = self.rpcs.get(name)
+        if fn is None:
+            raise FakeAPIError(f"Could not find the function public.{name}", "PGRST202")
+        with self._lock:
+            return fn(self, **params)
+
+
+def _rpc_exam_analytics(db, p_exam_id, p_pass_ratio=0.4, p_bins=10):
+    from app.services.exam_analytics import compute_exam_analytics
+    exam = db.tables["exam"].rows.get((p_exam_id,))
+    if exam is None:
+        return None
+    rows = db.tables["student_individual_result"].lookup("exam_id", p_exam_id)
+    analytics = compute_exam_analytics(rows, exam.get("total_marks"), p_pass_ratio, p_bins)
+    return analytics or {"total_students": 0}
+
+
+def _trigger_payment_events(db, rows):
+    # record_payment_events(): one 'payments.created' event per transaction_group_id of the statement
+    groups = {}
+    for row in sorted(rows, key=lambda r: r["payment_id"]):
+        groups.setdefault(row.get("transaction_group_id"), []).append(row)
+    events = db.tables["payment_event"]
+    for group_id, payments in groups.items():
+        events.add({
+            "transaction_group_id": group_id,
+            "payload": {
+                "payments": [{k: p.get(k) for k in ("payment_id", "enrollment_id", "paid_amount", "month", "year",
+                                                   "status", "payment_date")} for p in payments],
+                "total": sum(float(p.get("paid_amount") or 0) for p in payments),
+            },
+        })
+
+
+def _rpc_search_students(db, q, max_results=20):
+    from app.services.student_search import StudentSearchIndex
+    index = StudentSearchIndex()
+    index.rebuild(db.tables["student"].rows.values())
+    return index.search(q, max_results)
+
+
+# ------------------------------------------
+# Client objects (same entry points as supabase-py)
+# ------------------------------------------
+class FakeClient:
+    def __init__(self, db: FakeDatabase, query_class=FakeQuery):
+        self.db = db
+        self._query_class = query_class
+
+    def table(self, name: str):
+        return self._query_class(self.db, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: dict = None):
+        return FakeRPC(self.db, name, params, self._query_class)
+
+
+def build_fake_database() -> FakeDatabase:
+    db = FakeDatabase(
+        latency_ms=float(os.environ.get("FAKE_SUPABASE_LATENCY_MS", "0")),
+        jitter_ms=float(os.environ.get("FAKE_SUPABASE_JITTER_MS", "0")),
+        max_rows=int(os.environ.get("FAKE_SUPABASE_MAX_ROWS", "1000")),
+    )
+    path = os.environ.get("FAKE_SUPABASE_DATA")
+    if path:
+        with open(path) as f:
+            db.load(json.load(f))
+    return db
+
+
+_database = None
+
+
+def get_fake_database() -> FakeDatabase:
+    """The one shared fake database, created on first use (sync and async clients share it)."""
+    global _database
+    if _database is None:
+        _database = build_fake_database()
+    return _database
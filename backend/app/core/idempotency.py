@@ -0,0 +1,158 @@
+# ==========================================
+# IDEMPOTENCY KEYS (safe retries for writes)
+# ==========================================
+# On a flaky connection the front desk retries "Save payment" and the server can't tell a retry
+# from a new payment: every retry used to create another transaction_group_id.
+#
+# A client that sends an 'Idempotency-Key' header (any unique string, e.g. a UUID made when the
+# form was opened) gets exactly-once behaviour per key:
+#   - first request:           runs, and its response is stored under the key
+#   - same key + same body:    the stored response is returned, the database is not touched
+#                              (response header 'Idempotent-Replayed: true')
+#   - same key + OTHER body:   rejected (422) - the key was reused by mistake
+#   - same key, concurrently:  the second request waits for the first (per-key lock),
+#                              then gets its stored response
+# Failed requests are NOT stored, so the client can simply retry them.
+#
+# Keys are scoped per endpoint and kept for IDEMPOTENCY_TTL_SECONDS (default 24h), at most
+# IDEMPOTENCY_MAX_KEYS of them (least recently used go first).
+#
+# Like the other in-process stores this lives in ONE worker process: with several uvicorn
+# workers a retry that lands on another worker is not recognised. Run a single worker for the
+# write endpoints, or route retries with sticky sessions.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "10000"))
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+
+def request_fingerprint(payload) -> str:
+    # Key order and float/int formatting must not matter: hash a canonical JSON dump
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._entries = OrderedDict()   # "scope:key" -> (expires_at, fingerprint, response)
+        self._lock = threading.Lock()
+        self._key_locks = {}            # "scope:key" -> [lock, number of requests using it]
+        self._stats = {"executed": 0, "replayed": 0, "coalesced": 0, "conflicts": 0, "evicted": 0}
+
+    # ------------------------------------------
+    # Per-key locking
+    # ------------------------------------------
+    @contextmanager
+    def _key_lock(self, full_key: str):
+        with self._lock:
+            slot = self._key_locks.setdefault(full_key, [threading.Lock(), 0])
+            slot[1] += 1
+        waited = not slot[0].acquire(blocking=False)
+        if waited:
+            slot[0].acquire()
+        try:
+            yield waited
+        finally:
+            slot[0].release()
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._key_locks[full_key]
+
+    # ------------------------------------------
+    # Entries
+    # ------------------------------------------
+    def _get(self, full_key: str):
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return None
+            if time.monotonic() > entry[0]:
+                del self._entries[full_key]
+                self._stats["evicted"] += 1
+                return None
+            self._entries.move_to_end(full_key)
+            return entry
+
+    def _put(self, full_key: str, fingerprint: str, response):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[full_key] = (now + self.ttl_seconds, fingerprint, response)
+            self._entries.move_to_end(full_key)
+            # Oldest first: drop expired entries, then whatever exceeds the bound
+            while self._entries:
+                oldest_key, (expires_at, _, _) = next(iter(self._entries.items()))
+                if expires_at > now and len(self._entries) <= self.max_keys:
+                    break
+                del self._entries[oldest_key]
+                self._stats["evicted"] += 1
+
+    def _count(self, field: str):
+        with self._lock:
+            self._stats[field] += 1
+
+    def run(self, key: str, scope: str, payload, func):
+        """
+        Runs func() at most once per (scope, key, payload).
+        Returns (response, replayed). Without a key, func() simply runs.
+        """
+        if not key:
+            return func(), False
+        if len(key) > MAX_KEY_LENGTH:
+            raise Exception(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+        full_key = f"{scope}:{key}"
+        fingerprint = request_fingerprint(payload)
+        with self._key_lock(full_key) as waited:
+            entry = self._get(full_key)
+            if entry is not None:
+                if entry[1] != fingerprint:
+                    self._count("conflicts")
+                    raise IdempotencyKeyReused(
+                        "This Idempotency-Key was already used with a different request body")
+                self._count("coalesced" if waited else "replayed")
+                return entry[2], True
+            response = func()
+            self._put(full_key, fingerprint, response)
+            self._count("executed")
+            return response, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "keys": len(self._entries),
+                "in_flight": len(self._key_locks),
+                "max_keys": self.max_keys,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# One store per process, shared by every idempotent endpoint
+idempotency = IdempotencyStore()
+
+
+def run_idempotent(response, key: str, scope: str, payload, func):
+    """Route helper: idempotency.run() + the 'Idempotent-Replayed' response header."""
+    result, replayed = idempotency.run(key, scope, payload, func)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
@@ -0,0 +1,351 @@
+# ==========================================
+# REQUEST & QUERY INSTRUMENTATION
+# ==========================================
+# Answers "which endpoints are slow, and how many PostgREST round-trips do they make?"
+#
+#   1. Every Supabase HTTP call is timed through httpx event hooks installed on the clients
+#      in app/core/supabase.py and app/core/supabase_async.py (table, operation, latency, bytes).
+#   2. 'instrumentation_middleware' (registered in main.py) times each request and collects
+#      the queries made while serving it, using a context variable (works for sync routes
+#      in the threadpool and for async routes alike).
+#   3. Results are exposed as:
+#        - Prometheus text at GET /metrics
+#        - a 'Server-Timing' response header (visible in the browser's DevTools > Network > Timing)
+#   4. Opt-in sampling profiler: with PROFILING_ENABLED=1, add '?profile=1' (or the header
+#      'X-Profile: 1') to any request and the response becomes a folded-stack profile
+#      ("a;b;c 42" lines, ready for flamegraph.pl / speedscope) instead of the normal body.
+#   5. With QUERY_DETECTOR=warn|raise, repeated query shapes (N+1 loops) are reported per
+#      request, see app/core/query_detector.py.
+#
+# No extra dependencies: the Prometheus text format is simple enough to write by hand.
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from fastapi.responses import PlainTextResponse
+
+from app.core import query_detector
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.002"))
+# At most this many individual queries are listed in one Server-Timing header
+SERVER_TIMING_MAX_QUERIES = 20
+
+_REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_QUERY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+# ------------------------------------------
+# Prometheus metrics (minimal, thread-safe)
+# ------------------------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=_REQUEST_BUCKETS):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {}   # labels -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels=()):
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[len(self.buckets)] += 1
+            row[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, row in sorted(self._values.items()):
+                # Prometheus buckets are cumulative; observe() already counts every bucket >= value
+                for bound, count in zip(self.buckets, row):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {count}")
+                total = row[len(self.buckets)]
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {total}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {round(row[-1], 6)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.http_requests = Counter(
+            "moniem_http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+        self.http_duration = Histogram(
+            "moniem_http_request_duration_seconds", "Wall time per request.", ("method", "route"))
+        self.http_db_calls = Histogram(
+            "moniem_http_request_db_queries", "Supabase round-trips made per request.",
+            ("method", "route"), buckets=_COUNT_BUCKETS)
+        self.db_queries = Counter(
+            "moniem_db_queries_total", "Supabase (PostgREST) HTTP calls.", ("table", "operation", "status"))
+        self.db_duration = Histogram(
+            "moniem_db_query_duration_seconds", "Latency per Supabase call.", ("table", "operation"),
+            buckets=_QUERY_BUCKETS)
+        self.db_bytes = Counter(
+            "moniem_db_response_bytes_total", "Bytes received from Supabase.", ("table",))
+        self.singleflight = Counter(
+            "moniem_singleflight_requests_total",
+            "Coalesced reads: 'leader' ran the call, 'follower' shared one already in flight.", ("call", "role"))
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.http_requests, self.http_duration, self.http_db_calls,
+                       self.db_queries, self.db_duration, self.db_bytes, self.singleflight):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# ------------------------------------------
+# Per-request collection
+# ------------------------------------------
+class RequestMetrics:
+    __slots__ = ("db_calls", "db_seconds", "db_bytes", "queries", "_lock")
+
+    def __init__(self):
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self.db_bytes = 0
+        self.queries = []   # [(label, seconds), ...]
+        # gather_queries() can finish several queries of one request at the same time
+        self._lock = threading.Lock()
+
+    def add(self, label: str, seconds: float, nbytes: int):
+        with self._lock:
+            self.db_calls += 1
+            self.db_seconds += seconds
+            self.db_bytes += nbytes
+            self.queries.append((label, seconds))
+
+
+_current_request = contextvars.ContextVar("moniem_request_metrics", default=None)
+
+
+def current_request_metrics():
+    return _current_request.get()
+
+
+def _describe(request):
+    """(table, operation) of a PostgREST request: '/rest/v1/payment' + GET -> ('payment', 'select')."""
+    path = urlsplit(str(request.url)).path
+    parts = [p for p in path.split("/") if p]
+    if "rpc" in parts:
+        name = parts[parts.index("rpc") + 1] if parts.index("rpc") + 1 < len(parts) else "?"
+        return f"rpc:{name}", "rpc"
+    table = parts[-1] if parts else "?"
+    method = request.method
+    if method == "POST":
+        prefer = request.headers.get("prefer", "")
+        operation = "upsert" if "resolution=merge-duplicates" in prefer else "insert"
+    else:
+        operation = {"GET": "select", "HEAD": "count", "PATCH": "update", "DELETE": "delete"}.get(method, method.lower())
+    return table, operation
+
+
+def _record(request, response, started: float):
+    seconds = time.perf_counter() - started
+    table, operation = _describe(request)
+    nbytes = len(response.content)
+
+    metrics.db_queries.inc((table, operation, str(response.status_code)))
+    metrics.db_duration.observe(seconds, (table, operation))
+    metrics.db_bytes.inc((table,), nbytes)
+
+    collected = _current_request.get()
+    if collected is not None:
+        collected.add(f"{request.method} {table}", seconds, nbytes)
+
+
+# httpx event hooks. The start time rides along in request.extensions.
+def _on_request(request):
+    request.extensions["moniem_started"] = time.perf_counter()
+    # Runs on the thread/task that built the query, so the detector can see which repository method sent it
+    query_detector.record(request)
+
+
+def _on_response(response):
+    response.read()
+    _record(response.request, response, response.request.extensions.get("moniem_started", time.perf_counter()))
+
+
+async def _on_request_async(request):
+    _on_request(request)
+
+
+async def _on_response_async(response):
+    await response.aread()
+    _record(response.request, response, response.request.extensions.get("moniem_started", time.perf_counter()))
+
+
+def sync_event_hooks() -> dict:
+    """event_hooks for the httpx.Client behind the sync Supabase client."""
+    return {"request": [_on_request], "response": [_on_response]}
+
+
+def async_event_hooks() -> dict:
+    """event_hooks for the httpx.AsyncClient behind the async Supabase client."""
+    return {"request": [_on_request_async], "response": [_on_response_async]}
+
+
+# ------------------------------------------
+# Sampling profiler
+# ------------------------------------------
+# Idle threads (threadpool workers waiting for work, the event loop waiting on sockets)
+# are skipped so the profile shows where time is actually spent.
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads every 'interval' seconds on a background thread.
+    cProfile only sees the thread it was started on, but sync routes run in a threadpool
+    thread, so sampling every thread is what works for both sync and async routes.
+    Keep concurrency low while profiling: other requests' stacks are sampled too.
+    """
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = {}
+        self.total = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+                self.total += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        lines = [f"# {self.total} samples every {self.interval * 1000:g} ms (folded stacks)"]
+        for stack, count in sorted(self.samples.items(), key=lambda kv: kv[1], reverse=True):
+            lines.append(f"{stack} {count}")
+        return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------
+# Middleware
+# ------------------------------------------
+def _route_label(request) -> str:
+    # The route TEMPLATE ("/students/{student_id}"), not the raw path, keeps label cardinality low
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _server_timing(total: float, collected: RequestMetrics) -> str:
+    # For streaming responses (exports) this covers the time until the first byte;
+    # queries made while the body streams still show up in the /metrics query counters.
+    entries = [
+        f"app;dur={total * 1000:.1f}",
+        f'db;dur={collected.db_seconds * 1000:.1f};desc="{collected.db_calls} queries, {collected.db_bytes} bytes"',
+    ]
+    for i, (label, seconds) in enumerate(collected.queries[:SERVER_TIMING_MAX_QUERIES], start=1):
+        entries.append(f'q{i};dur={seconds * 1000:.1f};desc="{label}"')
+    return ", ".join(entries)
+
+
+def _wants_profile(request) -> bool:
+    return PROFILING_ENABLED and (
+        request.query_params.get("profile") == "1" or request.headers.get("x-profile") == "1"
+    )
+
+
+async def instrumentation_middleware(request, call_next):
+    collected = RequestMetrics()
+    token = _current_request.set(collected)
+    detector_token = query_detector.start() if query_detector.enabled() else None
+    offenders = []
+    profiler = None
+    if _wants_profile(request):
+        profiler = SamplingProfiler()
+        profiler.start()
+
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+        if profiler is not None:
+            # Run streaming bodies to the end so their work is part of the profile
+            async for _ in response.body_iterator:
+                pass
+    finally:
+        _current_request.reset(token)
+        if detector_token is not None:
+            offenders = query_detector.finish(detector_token)
+        if profiler is not None:
+            profiler.stop()
+    total = time.perf_counter() - started
+
+    method, route = request.method, _route_label(request)
+    metrics.http_requests.inc((method, route, str(response.status_code)))
+    metrics.http_duration.observe(total, (method, route))
+    metrics.http_db_calls.observe(collected.db_calls, (method, route))
+
+    if offenders:
+        report = query_detector.format_report(offenders, f"{method} {route}")
+        print(report)
+        if query_detector.MODE == "raise":
+            response = PlainTextResponse(report, status_code=500)
+        else:
+            response.headers["X-Query-Warnings"] = "; ".join(f"{o['count']}x {o['shape']}" for o in offenders)[:1000]
+
+    if profiler is not None:
+        response = PlainTextResponse(profiler.folded(), headers={"X-Original-Status": str(response.status_code)})
+
+    response.headers["Server-Timing"] = _server_timing(total, collected)
+    return response
@@ -0,0 +1,58 @@
+# ==========================================
+# KEYSET (CURSOR) PAGINATION HELPERS
+# ==========================================
+# "OFFSET 5000 LIMIT 50" makes Postgres walk past 5000 rows to throw them away.
+# Keyset pagination instead remembers the LAST row of the page ("student_id = 1234")
+# and asks for rows AFTER it ("student_id > 1234"), which an index answers directly.
+#
+# The cursor handed to the client is that "last row key", JSON-encoded and base64'd
+# so it is opaque and URL-safe: e.g. "eyJpZCI6MTIzNH0".
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(key: dict) -> str:
+    raw = json.dumps(key, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise Exception("Invalid cursor")
+    if not isinstance(key, dict):
+        raise Exception("Invalid cursor")
+    return key
+
+
+def clamp_page_size(limit) -> int:
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def build_page(rows: list, limit: int, cursor_key, total=None) -> dict:
+    """
+    Shapes one page of results.
+
+    The query should ask for 'limit + 1' rows: if the extra row comes back,
+    there is a next page and the cursor points at the last row we actually return.
+
+    Args:
+        rows: up to limit + 1 rows, already in keyset order.
+        cursor_key: function(row) -> dict, the key the next page continues after.
+        total: optional total row count (None if not requested).
+    """
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(cursor_key(items[-1])) if has_more and items else None,
+        "total": total
+    }
@@ -0,0 +1,263 @@
+# ==========================================
+# N+1 QUERY DETECTOR (development / tests)
+# ==========================================
+# An "N+1" is a loop that sends one query per item:
+#     for item in items:
+#         supabase.table("enrollment").select("*").eq("student_id", item.student_id)...
+# Each query is fast, but 200 items = 200 round-trips to Supabase.
+#
+# The detector sees every PostgREST request (through the httpx hooks in
+# app/core/instrumentation.py) and reduces it to a SHAPE: method + table + filters with the
+# values blanked out. The two queries above become the same shape:
+#     GET enrollment ?select=* &student_id=eq.?
+# Values are blanked the way PostgREST parses them: "quoted" values may contain , ( ) and
+# logic trees (or=(a.eq.1,and(b.gt.2,...))) keep their columns and operators. An rpc call's
+# shape is the function plus the NAMES of its arguments: POST rpc/exam_analytics ?args=p_exam_id
+# If one shape runs more than 'threshold' times while serving a single request (or inside a
+# 'detect_n_plus_one()' block), that's reported together with the repository method that sent it.
+#
+# Keyset paging is NOT an N+1: a loop that walks a table 1000 rows at a time sends the same shape
+# with a cursor that moves on every page (student_id=gt.1000 &order=student_id &limit=1000).
+# Such a query only counts as a repeat if its cursor (the gt/gte/lt/lte values on its ORDER BY
+# columns, see keyset_cursor()) was already seen for that shape; first pages always count.
+#
+# Modes (QUERY_DETECTOR environment variable):
+#     off   (default) nothing is tracked
+#     warn  print a report for offending requests and add an 'X-Query-Warnings' header
+#     raise offending requests fail with a 500, so the regression can't be missed in dev
+#
+# In a test:
+#     from app.core.query_detector import detect_n_plus_one
+#     with detect_n_plus_one(threshold=3):
+#         repo.create_bulk_payment(items)       # raises NPlusOneError if a shape repeats > 3 times
+
+import contextvars
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlsplit
+
+MODE = os.environ.get("QUERY_DETECTOR", "off").lower()
+THRESHOLD = int(os.environ.get("QUERY_DETECTOR_THRESHOLD", "5"))
+
+# Query-string keys whose value IS part of the shape (they describe what is fetched, not for whom)
+_STRUCTURAL_KEYS = {"select", "order", "on_conflict", "columns"}
+_LOGIC_TREE = re.compile(r"^(not\.)?(and|or)\((.*)\)$", re.S)
+_OPERATOR = re.compile(r"^\w+(\([^)]*\))?$")   # eq, like(any), fts(english), ...
+_CURSOR_OPERATORS = ("gt", "gte", "lt", "lte")
+_REPOSITORY_DIR = os.sep + "repositories" + os.sep
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def _split_top(text: str) -> list:
+    """Splits on the commas outside parentheses and outside "double quotes" (\\ escapes)."""
+    parts, depth, token, quoted, escaped = [], 0, "", False, False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == "\\" and quoted:
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted:
+            if ch == "," and depth == 0:
+                parts.append(token)
+                token = ""
+                continue
+            depth += ch == "("
+            depth -= ch == ")"
+        token += ch
+    parts.append(token)
+    return parts
+
+
+def _blank_condition(text: str) -> str:
+    """'not.ilike.A%' -> 'not.ilike.?', 'in.("a,b",c)' -> 'in.?' (everything after the operator is the value)."""
+    prefix = ""
+    while True:
+        head, dot, rest = text.partition(".")
+        if not dot or not _OPERATOR.match(head):
+            return prefix + "?"
+        if head == "not":
+            prefix, text = prefix + "not.", rest
+            continue
+        return f"{prefix}{head}.?"
+
+
+def _blank_logic(text: str) -> str:
+    """'a.eq.1,and(b.ilike."x,y",c.is.null)' -> 'a.eq.?,and(b.ilike.?,c.is.?)'."""
+    blanked = []
+    for part in _split_top(text):
+        part = part.strip()
+        tree = _LOGIC_TREE.match(part)
+        if tree:
+            blanked.append(f"{tree.group(1) or ''}{tree.group(2)}({_blank_logic(tree.group(3))})")
+        else:
+            column, _, condition = part.partition(".")
+            blanked.append(f"{column}.{_blank_condition(condition)}")
+    return ",".join(blanked)
+
+
+def _rpc_arguments(body) -> str:
+    try:
+        args = json.loads(body or b"{}")
+    except (ValueError, TypeError):
+        return "?"
+    return ",".join(sorted(args)) if isinstance(args, dict) else "?"
+
+
+def query_shape(method: str, url: str, body: bytes = None) -> str:
+    parts = urlsplit(url)
+    table = parts.path.rsplit("/rest/v1/", 1)[-1]
+    params = []
+    for k, v in parse_qsl(parts.query, keep_blank_values=True):
+        if k in _STRUCTURAL_KEYS:
+            params.append(f"{k}={v}")
+        elif k in ("limit", "offset"):
+            params.append(f"{k}=?")
+        elif k.rsplit(".", 1)[-1] in ("or", "and") and v.startswith("(") and v.endswith(")"):
+            # or=(...), not.and=(...), student.or=(...) on an embedded resource
+            params.append(f"{k}=({_blank_logic(v[1:-1])})")
+        else:
+            params.append(f"{k}={_blank_condition(v)}")
+    if table.startswith("rpc/"):
+        # The arguments travel in the JSON body: same function + same argument names = same shape
+        params.append(f"args={_rpc_arguments(body)}")
+    return f"{method} {table} ?" + " &".join(sorted(params))
+
+
+def _order_columns(params: list) -> set:
+    # order=total_score.desc.nullslast,result_id -> {"total_score", "result_id"}
+    columns = set()
+    for k, v in params:
+        if k == "order":
+            columns.update(part.strip().split(".", 1)[0] for part in v.split(","))
+    return columns
+
+
+def _compares_column(tree: str, columns: set) -> bool:
+    """True if a logic tree 'a.lt.5,and(a.eq.5,b.gt.7)' compares one of 'columns' with gt/gte/lt/lte."""
+    for part in _split_top(tree):
+        part = part.strip()
+        nested = _LOGIC_TREE.match(part)
+        if nested:
+            if _compares_column(nested.group(3), columns):
+                return True
+            continue
+        column, _, condition = part.partition(".")
+        if column in columns and condition.split(".", 1)[0] in _CURSOR_OPERATORS:
+            return True
+    return False
+
+
+def keyset_cursor(url: str) -> tuple:
+    """
+    Where a keyset page starts: the raw gt/gte/lt/lte filters (and logic trees) on the query's
+    ORDER BY columns, e.g. (("student_id", "gt.1000"),). () if it isn't a limited, ordered query
+    with such a filter - including the FIRST page of a keyset loop.
+    """
+    params = parse_qsl(urlsplit(url).query, keep_blank_values=True)
+    if not any(k == "limit" for k, _ in params):
+        return ()
+    columns = _order_columns(params)
+    cursor = []
+    for k, v in params:
+        if k.rsplit(".", 1)[-1] in ("or", "and") and v.startswith("(") and v.endswith(")"):
+            if _compares_column(v[1:-1], columns):
+                cursor.append((k, v))
+        elif k in columns and v.split(".", 1)[0] in _CURSOR_OPERATORS:
+            cursor.append((k, v))
+    return tuple(sorted(cursor))
+
+
+def _calling_repository_method() -> str:
+    """'PaymentRepository.create_bulk_payment (payment_repository.py:61)' or 'unknown'."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if _REPOSITORY_DIR in filename:
+            owner = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            if owner is not None:
+                name = f"{type(owner).__name__}.{name}"
+            return f"{name} ({os.path.basename(filename)}:{frame.f_lineno})"
+        frame = frame.f_back
+    # e.g. queries started by gather_queries() run in their own asyncio task
+    return "unknown"
+
+
+class QueryLog:
+    def __init__(self):
+        self.shapes = {}   # shape -> {"count": n, "callers": {caller: n}, "cursors": {cursor, ...}}
+
+    def add(self, shape: str, caller: str, cursor: tuple = ()):
+        entry = self.shapes.setdefault(shape, {"count": 0, "callers": {}, "cursors": set()})
+        if cursor and cursor not in entry["cursors"]:
+            # The next page of a keyset loop, not the same query again
+            entry["cursors"].add(cursor)
+            return
+        entry["count"] += 1
+        entry["callers"][caller] = entry["callers"].get(caller, 0) + 1
+
+    def offenders(self, threshold: int) -> list:
+        found = [
+            {"shape": shape, "count": e["count"], "callers": e["callers"]}
+            for shape, e in self.shapes.items() if e["count"] > threshold
+        ]
+        found.sort(key=lambda o: o["count"], reverse=True)
+        return found
+
+
+def format_report(offenders: list, context: str = "") -> str:
+    lines = [f"N+1 queries suspected{' in ' + context if context else ''}:"]
+    for o in offenders:
+        lines.append(f"  {o['count']}x  {o['shape']}")
+        for caller, n in sorted(o["callers"].items(), key=lambda kv: kv[1], reverse=True):
+            lines.append(f"        {n}x from {caller}")
+    return "\n".join(lines)
+
+
+_current_log = contextvars.ContextVar("moniem_query_log", default=None)
+
+
+def enabled() -> bool:
+    return MODE in ("warn", "raise")
+
+
+def record(request):
+    """Called from the httpx request hook for every PostgREST call."""
+    log = _current_log.get()
+    if log is not None:
+        body = getattr(request, "content", None) if request.method == "POST" else None
+        url = str(request.url)
+        log.add(query_shape(request.method, url, body), _calling_repository_method(), keyset_cursor(url))
+
+
+def start():
+    """Starts a new log for the current request; returns the token for finish()."""
+    return _current_log.set(QueryLog())
+
+
+def finish(token, threshold: int = None) -> list:
+    log = _current_log.get()
+    _current_log.reset(token)
+    return log.offenders(THRESHOLD if threshold is None else threshold) if log else []
+
+
+@contextmanager
+def detect_n_plus_one(threshold: int = 3):
+    """Raises NPlusOneError if any query shape runs more than 'threshold' times inside the block."""
+    token = start()
+    log = _current_log.get()
+    try:
+        yield log
+    finally:
+        _current_log.reset(token)
+    offenders = log.offenders(threshold)
+    if offenders:
+        raise NPlusOneError(format_report(offenders))
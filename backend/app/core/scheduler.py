@@ -0,0 +1,152 @@
+# ==========================================
+# BACKGROUND JOB SCHEDULER (in-process)
+# ==========================================
+# Runs maintenance jobs inside the FastAPI process, started and stopped by the lifespan in main.py.
+# No extra dependency (APScheduler, Celery...): every job is one asyncio task that sleeps until
+#   - its interval has passed        (every_seconds=900)
+#   - the next month has started     (at_month_start=True, local time)
+#   - someone called trigger(name)   (manual refresh endpoints, events)
+# whichever comes first. Plain (sync) functions run in a worker thread via asyncio.to_thread,
+# so a job that queries Supabase doesn't block the event loop.
+#
+# Every worker process (uvicorn --workers N) runs its own scheduler; that matches the in-process
+# stores the jobs maintain, which are per worker as well.
+#
+# SCHEDULER_ENABLED=0 turns it off (the stores then refresh lazily on read, as before).
+
+import asyncio
+import inspect
+import os
+import time
+from datetime import datetime, timezone
+
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") == "1"
+
+
+def seconds_until_next_month(now: datetime = None) -> float:
+    now = now or datetime.now()
+    year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+    # A second past midnight, so date.today() already reports the new month
+    return max(1.0, (datetime(year, month, 1, 0, 0, 1) - now).total_seconds())
+
+
+class Job:
+    def __init__(self, name: str, func, every_seconds: float = None, at_month_start: bool = False,
+                 run_at_start: bool = False):
+        self.name = name
+        self.func = func
+        self.every_seconds = every_seconds
+        self.at_month_start = at_month_start
+        self.run_at_start = run_at_start
+        self.runs = 0
+        self.failures = 0
+        self.running = False
+        self.last_started = None
+        self.last_duration = None
+        self.last_error = None
+        self.next_run = None
+        self._wake = None      # asyncio.Event, created on the loop in start()
+
+    def _delay(self) -> float:
+        delays = []
+        if self.every_seconds:
+            delays.append(self.every_seconds)
+        if self.at_month_start:
+            delays.append(seconds_until_next_month())
+        return min(delays) if delays else None
+
+    async def run_once(self):
+        self.running = True
+        self.last_started = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(self.func):
+                await self.func()
+            else:
+                await asyncio.to_thread(self.func)
+            self.last_error = None
+        except Exception as e:
+            # A failing job must not kill the loop; it is retried on its next run
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"Scheduled job '{self.name}' failed: {e}")
+        finally:
+            self.runs += 1
+            self.running = False
+            self.last_duration = round(time.perf_counter() - started, 3)
+
+    async def loop(self):
+        if self.run_at_start:
+            await self.run_once()
+        while True:
+            delay = self._delay()
+            self.next_run = None if delay is None else \
+                datetime.fromtimestamp(time.time() + delay, timezone.utc)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.run_once()
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "every_seconds": self.every_seconds,
+            "at_month_start": self.at_month_start,
+            "runs": self.runs,
+            "failures": self.failures,
+            "running": self.running,
+            "last_started": self.last_started.isoformat() if self.last_started else None,
+            "last_duration_seconds": self.last_duration,
+            "last_error": self.last_error,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self._jobs = {}
+        self._tasks = []
+        self._loop = None
+
+    def add_job(self, name: str, func, every_seconds: float = None, at_month_start: bool = False,
+                run_at_start: bool = False) -> Job:
+        job = self._jobs[name] = Job(name, func, every_seconds, at_month_start, run_at_start)
+        return job
+
+    async def start(self):
+        if not SCHEDULER_ENABLED or self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        for job in self._jobs.values():
+            job._wake = asyncio.Event()
+            self._tasks.append(asyncio.create_task(job.loop(), name=f"job:{job.name}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    def trigger(self, name: str) -> bool:
+        """
+        Asks a job to run as soon as possible. Safe to call from sync routes (threadpool)
+        and from the event loop. Returns False if the scheduler isn't running.
+        """
+        job = self._jobs.get(name)
+        if job is None or job._wake is None or self._loop is None:
+            return False
+        self._loop.call_soon_threadsafe(job._wake.set)
+        return True
+
+    def status(self) -> list:
+        return [job.status() for job in self._jobs.values()]
+
+
+# One scheduler per process
+scheduler = Scheduler()
@@ -0,0 +1,157 @@
+# ==========================================
+# SINGLE-FLIGHT (request coalescing)
+# ==========================================
+# When a class starts, dozens of staff open the same pages at the same moment, and each
+# request used to run the same queries in parallel. With single-flight, concurrent IDENTICAL
+# reads share ONE call:
+#
+#     @single_flight.coalesce("exam_results")
+#     def get_exam_results(self, exam_id): ...
+#
+#   - the first caller for a key (method + arguments, 'self' left out) runs the method
+#   - callers arriving while it is still running wait for it and get the same result
+#     (or the same exception)
+#   - once it has finished, the next caller starts a new call: nothing is cached here
+#
+# Works on sync methods (threadpool routes, waiters block on an Event) and async methods
+# (waiters await the same task). The call runs as its own task, so one client disconnecting
+# doesn't cancel the query the others are waiting for.
+#
+# Callers share the result OBJECT, like the read-through cache: treat it as read-only.
+# Put @single_flight.coalesce above @cache.cached, so concurrent cache misses also share
+# one load.
+#
+# Counted in /metrics (moniem_singleflight_requests_total, role="leader"|"follower")
+# and /coalescing/stats. SINGLE_FLIGHT_ENABLED=0 turns it off.
+
+import asyncio
+import functools
+import inspect
+import os
+import threading
+
+from app.core.instrumentation import metrics
+
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "1") == "1"
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}    # key -> _Call (sync)
+        self._tasks = {}    # (event loop, key) -> asyncio.Task (async)
+        self._stats = {}    # name -> {"leaders", "followers"}
+
+    def _count(self, name: str, role: str):
+        with self._lock:
+            stats = self._stats.setdefault(name, {"leaders": 0, "followers": 0})
+            stats[role + "s"] += 1
+        metrics.singleflight.inc((name, role))
+
+    @staticmethod
+    def _key(name: str, args, kwargs) -> str:
+        return f"{name}:{args!r}:{sorted(kwargs.items())!r}"
+
+    # ------------------------------------------
+    # Sync
+    # ------------------------------------------
+    def do(self, name: str, key: str, func):
+        if not self.enabled:
+            return func()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._count(name, "follower")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self._count(name, "leader")
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    # ------------------------------------------
+    # Async
+    # ------------------------------------------
+    async def do_async(self, name: str, key: str, coro_func):
+        if not self.enabled:
+            return await coro_func()
+        # Tasks belong to one event loop; key by loop so a second loop never awaits a foreign task
+        task_key = (id(asyncio.get_running_loop()), key)
+        # No await between the lookup and the insert, so no other coroutine can slip in;
+        # the lock is only for the stats shared with threadpool callers.
+        task = self._tasks.get(task_key)
+        if task is None:
+            self._count(name, "leader")
+            task = asyncio.ensure_future(coro_func())
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda t: self._tasks.pop(task_key, None))
+        else:
+            self._count(name, "follower")
+        return await asyncio.shield(task)
+
+    # ------------------------------------------
+    # Decorator
+    # ------------------------------------------
+    def coalesce(self, name: str = None):
+        """Decorator for repository METHODS (sync or async); 'self' is left out of the key."""
+        def decorator(method):
+            call_name = name or method.__qualname__
+
+            if inspect.iscoroutinefunction(method):
+                @functools.wraps(method)
+                async def async_wrapper(repo, *args, **kwargs):
+                    return await self.do_async(call_name, self._key(call_name, args, kwargs),
+                                               lambda: method(repo, *args, **kwargs))
+                return async_wrapper
+
+            @functools.wraps(method)
+            def wrapper(repo, *args, **kwargs):
+                return self.do(call_name, self._key(call_name, args, kwargs),
+                               lambda: method(repo, *args, **kwargs))
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_call = {name: dict(v) for name, v in self._stats.items()}
+            in_flight = len(self._calls) + len(self._tasks)
+        leaders = sum(v["leaders"] for v in per_call.values())
+        followers = sum(v["followers"] for v in per_call.values())
+        return {
+            "enabled": self.enabled,
+            "requests": leaders + followers,
+            "executed": leaders,
+            "coalesced": followers,
+            "coalesced_ratio": round(followers / (leaders + followers), 4) if leaders + followers else None,
+            "in_flight": in_flight,
+            "calls": per_call
+        }
+
+
+# One per process: concurrent requests in this worker share calls
+single_flight = SingleFlight()
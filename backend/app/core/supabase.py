@@ -2,7 +2,8 @@ import os
 """ We use it to read sensitive information (like passwords)
     from your computer's environment variables,
     so we don't have to hardcode them in the script where everyone can see."""
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+import httpx
 #This pulls in the specific tools provided by Supabase.
 # Client is the type of object we are creating,
 # and create_client is the factory function that makes it.
@@ -14,9 +15,25 @@ load_dotenv()
 # It's a common practice to load environment variables at the start of a program.
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
-#This line creates a Supabase client object using the URL and key.
-# It's a common practice to create a client object at the start of a program.
-supabase: Client = create_client(url, key)
+# Our own httpx client underneath, so every query is timed and counted
+# (see app/core/instrumentation.py: /metrics and the Server-Timing header).
+from app.core.instrumentation import sync_event_hooks
+_http_client = httpx.Client(
+    timeout=float(os.environ.get("SUPABASE_TIMEOUT", "30")),
+    event_hooks=sync_event_hooks(),
+)
+# SUPABASE_BACKEND=fake swaps in the in-memory PostgREST stand-in from app/core/fake_supabase.py
+# (offline benchmarks and experiments, no Supabase project needed).
+SUPABASE_BACKEND = os.environ.get("SUPABASE_BACKEND", "supabase").lower()
+if SUPABASE_BACKEND == "fake":
+    from app.core.fake_supabase import FakeClient, get_fake_database
+    _fake_db = get_fake_database()
+    _fake_db.sync_hooks = sync_event_hooks()
+    supabase = FakeClient(_fake_db)
+else:
+    #This line creates a Supabase client object using the URL and key.
+    # It's a common practice to create a client object at the start of a program.
+    supabase: Client = create_client(url, key, options=ClientOptions(httpx_client=_http_client))
 
 #1. Why use os.environ if we have a 
 #.env
@@ -0,0 +1,105 @@
+# ==========================================
+# ASYNC SUPABASE CLIENT (Pooled)
+# ==========================================
+# The regular 'supabase' client in app/core/supabase.py is synchronous: while it waits
+# for PostgREST to answer, the thread running the request just sits there.
+# FastAPI runs sync routes in a limited threadpool, so under load requests queue up
+# behind threads that are only WAITING.
+#
+# This module provides an async client for 'async def' routes:
+#   - One shared httpx.AsyncClient (per event loop) with a connection pool and keep-alive,
+#     so we reuse TCP/TLS connections to Supabase instead of opening a new one per query.
+#   - 'gather_queries()' runs several INDEPENDENT queries at the same time, so a route
+#     that needs 3 queries waits for the slowest one instead of the sum of all three.
+
+import asyncio
+import os
+import weakref
+
+import httpx
+from supabase import acreate_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
+
+from app.core.supabase import url, key, SUPABASE_BACKEND
+from app.core.instrumentation import async_event_hooks
+
+# Pool sizing (override through environment variables on the server)
+POOL_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "30"))
+
+class _LoopClient:
+    """The async client of ONE event loop, with the lock that guards its creation."""
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.client = None
+        self.http_client = None
+
+
+# One client per running event loop. An httpx.AsyncClient (and an asyncio.Lock) belongs to the
+# loop it was first used on; a second loop (TestClient, a reloaded server) gets its own instead
+# of failing with "attached to a different loop". Entries go away with their loop.
+_loop_clients = weakref.WeakKeyDictionary()
+
+
+def _current() -> _LoopClient:
+    loop = asyncio.get_running_loop()
+    entry = _loop_clients.get(loop)
+    if entry is None:
+        # No await between the lookup and the insert, so this can't race within one loop
+        entry = _loop_clients[loop] = _LoopClient()
+    return entry
+
+
+async def get_async_supabase() -> AsyncClient:
+    """
+    Returns the running event loop's async client, creating it on first use.
+    (It can't be created at import time because it needs a running event loop.)
+    """
+    entry = _current()
+    if entry.client is None:
+        async with entry.lock:
+            if entry.client is None and SUPABASE_BACKEND == "fake":
+                from app.core.fake_supabase import AsyncFakeQuery, FakeClient, get_fake_database
+                fake_db = get_fake_database()
+                fake_db.async_hooks = async_event_hooks()
+                entry.client = FakeClient(fake_db, AsyncFakeQuery)
+            if entry.client is None:
+                entry.http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=POOL_MAX_CONNECTIONS,
+                        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=REQUEST_TIMEOUT,
+                    event_hooks=async_event_hooks(),
+                )
+                entry.client = await acreate_client(
+                    url, key, options=AsyncClientOptions(httpx_client=entry.http_client)
+                )
+    return entry.client
+
+
+async def close_async_supabase():
+    """Closes the running loop's pooled connections. Called when the app shuts down."""
+    entry = _loop_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None and entry.http_client is not None:
+        await entry.http_client.aclose()
+
+
+async def gather_queries(*queries) -> list:
+    """
+    Executes several independent query builders concurrently.
+
+    Usage:
+        client = await get_async_supabase()
+        programs, payments = await gather_queries(
+            client.table("program").select("*"),
+            client.table("payment").select("*"),
+        )
+
+    Returns the '.data' of each query, in the same order.
+    """
+    responses = await asyncio.gather(*(q.execute() for q in queries))
+    return [r.data for r in responses]
@@ -1,38 +1,65 @@
 from app.core.supabase import supabase
+from app.core.supabase_async import get_async_supabase
+from app.core.cache import cache
+from app.services.attendance_analytics import (
+    attendance_streaks, build_month_bitmap, month_bounds, months_between, parse_day, summarize_range,
+    validate_range
+)
+from app.services.attendance_store import attendance_store
+from app.core.scheduler import scheduler
+import asyncio
+import os
+
+# "database" = read attendance from Supabase (month bitmaps cached in app.core.cache)
+# "memory"   = answer reads from the compact in-process store (app/services/attendance_store.py)
+ATTENDANCE_STORE = os.environ.get("ATTENDANCE_STORE", "database")
+# With ATTENDANCE_STORE=memory: the background job that reloads the store from the DB
+# (registered in main.py's lifespan), well within the store's max age so reads never wait for it
+ATTENDANCE_STORE_JOB = "attendance_store"
+ATTENDANCE_STORE_REFRESH_SECONDS = int(os.environ.get("ATTENDANCE_STORE_REFRESH_SECONDS", "300"))
 
 class AttendanceRepository:
     def __init__(self):
         self.table = "attendance"
         self.enrollment_table = "enrollment"
 
-    def get_daily_attendance(self, program_id: int, date_str: str):
-        # 1. Get all enrollments for the program to list ALL students
-        enrollments = supabase.table(self.enrollment_table)\
-            .select("enrollment_id, student(student_id, name, roll_no)")\
+    def _daily_attendance_query(self, client, program_id: int, date_str: str):
+        # ONE round-trip: every enrollment of the program (so unmarked students are listed too)
+        # with its attendance row for this date embedded.
+        # The 'attendance.date' filter applies to the embedded rows only (a LEFT join),
+        # so a student with no record for the day comes back with "attendance": [].
+        return client.table(self.enrollment_table)\
+            .select("enrollment_id, student(student_id, name, roll_no), attendance(attendance_id, status)")\
             .eq("program_id", program_id)\
-            .execute().data
+            .eq("attendance.date", date_str)
 
+    def get_daily_attendance(self, program_id: int, date_str: str):
+        if ATTENDANCE_STORE == "memory":
+            self._ensure_store(program_id)
+            return attendance_store.daily(program_id, date_str)
+        enrollments = self._daily_attendance_query(supabase, program_id, date_str).execute().data
+        return self._merge_daily_attendance(enrollments, date_str)
+
+    async def get_daily_attendance_async(self, program_id: int, date_str: str):
+        if ATTENDANCE_STORE == "memory":
+            if self._store_needs_rebuild() or attendance_store.unresolved_student_ids(program_id):
+                # Cold store or new students: load them in a worker thread (sync client),
+                # so the event loop keeps serving other requests meanwhile
+                await asyncio.to_thread(self._ensure_store, program_id)
+            return attendance_store.daily(program_id, date_str)
+        client = await get_async_supabase()
+        response = await self._daily_attendance_query(client, program_id, date_str).execute()
+        return self._merge_daily_attendance(response.data, date_str)
+
+    def _merge_daily_attendance(self, enrollments: list, date_str: str):
         if not enrollments:
             return []
 
-        enrollment_ids = [e['enrollment_id'] for e in enrollments]
-
-        # 2. Get existing attendance for this date (using the enrollment_ids filter)
-        # Note: Supabase 'in' filter format is `col.in.(val1,val2)` for URL params, 
-        # but the python client uses .in_("col", [list])
-        attendance_records = supabase.table(self.table)\
-            .select("*")\
-            .in_("enrollment_id", enrollment_ids)\
-            .eq("date", date_str)\
-            .execute().data
-            
-        attendance_map = {a['enrollment_id']: a for a in attendance_records}
-        
-        # 3. Merge Data
         result = []
         for e in enrollments:
             student = e.get('student', {})
-            att_record = attendance_map.get(e['enrollment_id'], {})
+            # (enrollment_id, date) is unique, so there is at most one embedded record
+            att_record = (e.get('attendance') or [{}])[0]
             
             result.append({
                 "enrollment_id": e['enrollment_id'],
@@ -52,23 +79,217 @@ class AttendanceRepository:
         result.sort(key=get_roll)
         return result
 
-    def upsert_attendance(self, records: list):
-        # Prepare records for upsert
-        # If 'attendance_id' is None, remove it so Supabase creates a new one
-        clean_records = []
+    def upsert_attendance(self, records: list, program_id: int = None):
+        # One row per (enrollment_id, date): saving the same day twice (two teachers, a double
+        # click) updates the existing row instead of inserting a duplicate.
+        # A dict because Postgres refuses to upsert the same key twice in ONE statement;
+        # if the request repeats a student, the last record wins.
+        by_key = {}
         for r in records:
-            data = {
+            by_key[(r.enrollment_id, r.date)] = {
                 "enrollment_id": r.enrollment_id,
                 "status": r.status,
                 "date": r.date
             }
-            if r.attendance_id:
-                data["attendance_id"] = r.attendance_id
-            
-            clean_records.append(data)
 
-        # Upsert
-        # We rely on 'attendance_id' as PK for updates.
-        # For new inserts, we hope for no duplicates for the same day (user discipline or future unique constraint).
-        response = supabase.table(self.table).upsert(clean_records).execute()
+        response = supabase.table(self.table)\
+            .upsert(list(by_key.values()), on_conflict="enrollment_id, date")\
+            .execute()
+        self._invalidate_months(by_key.keys(), program_id)
+        attendance_store.apply(list(by_key.values()))
         return response.data
+
+    def _invalidate_months(self, keys, program_id: int = None):
+        # Throw away the cached month bitmaps this save touched (see get_attendance_summary)
+        if not keys:
+            return
+        if program_id is not None:
+            program_ids = [program_id]
+        else:
+            enrollment_ids = list({eid for eid, _ in keys})
+            rows = supabase.table(self.enrollment_table)\
+                .select("program_id")\
+                .in_("enrollment_id", enrollment_ids)\
+                .execute().data
+            program_ids = {r['program_id'] for r in rows}
+        months = {parse_day(day).strftime("%Y-%m") for _, day in keys}
+        cache.invalidate(*[f"attendance:{pid}:{m}" for pid in program_ids for m in months])
+
+    # ==========================
+    # RANGE ANALYTICS
+    # ==========================
+    # One cached bitmap document per (program, month), see app/services/attendance_analytics.py.
+    # A year-long report = 12 cache reads after the first run; saving attendance only
+    # invalidates the month(s) it touched.
+
+    def get_attendance_summary(self, program_id: int, start_str: str, end_str: str,
+                               min_rate: float = 0.8, min_days: int = 5):
+        start, end = parse_day(start_str), parse_day(end_str)
+        validate_range(start, end)
+
+        months, roster = self._range_data(program_id, start, end)
+        summary = summarize_range(months, start, end, roster, min_rate, min_days)
+        summary["program_id"] = program_id
+        return summary
+
+    def get_attendance_streaks(self, program_id: int, start_str: str, end_str: str):
+        start, end = parse_day(start_str), parse_day(end_str)
+        validate_range(start, end)
+
+        months, roster = self._range_data(program_id, start, end)
+        return {
+            "program_id": program_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "students": attendance_streaks(months, start, end, roster)
+        }
+
+    def _range_data(self, program_id: int, start, end):
+        """({(year, month): bitmap document}, roster) for start..end, from memory or the cache/DB."""
+        if ATTENDANCE_STORE == "memory":
+            self._ensure_store(program_id)
+            months = {
+                (year, month): attendance_store.month_bitmap(program_id, year, month)
+                for year, month in months_between(start, end)
+            }
+            return months, attendance_store.roster(program_id)
+
+        months = {}
+        for year, month in months_between(start, end):
+            months[(year, month)] = cache.get_or_load(
+                f"attendance:{program_id}:{year}-{month:02d}", "month_bitmap",
+                self._load_month_bitmap, (program_id, year, month)
+            )
+
+        roster = supabase.table(self.enrollment_table)\
+            .select("enrollment_id, student(student_id, name, roll_no)")\
+            .eq("program_id", program_id)\
+            .execute().data
+        return months, roster
+
+    def _load_month_bitmap(self, program_id: int, year: int, month: int, page_size: int = 1000):
+        first, last = month_bounds(year, month)
+
+        def rows():
+            # Only the three columns we need, paged by attendance_id (keyset)
+            last_id = 0
+            while True:
+                page = supabase.table(self.table)\
+                    .select("attendance_id, enrollment_id, date, status, enrollment!inner(program_id)")\
+                    .eq("enrollment.program_id", program_id)\
+                    .gte("date", first.isoformat())\
+                    .lte("date", last.isoformat())\
+                    .gt("attendance_id", last_id)\
+                    .order("attendance_id")\
+                    .limit(page_size)\
+                    .execute().data
+                yield from page
+                if len(page) < page_size:
+                    return
+                last_id = page[-1]['attendance_id']
+
+        return build_month_bitmap(rows())
+
+    # ==========================
+    # DUPLICATE CLEANUP
+    # ==========================
+    # Rows saved before the unique (enrollment_id, date) constraint existed can be duplicated.
+    # For every (enrollment_id, date) we keep the NEWEST row (highest attendance_id, i.e. the
+    # last save) and delete the others. Run it via backend/scripts/dedupe_attendance.py
+    # before adding the constraint. It only deletes losers, so the app can stay online.
+
+    def find_duplicate_attendance(self, page_size: int = 1000):
+        """Returns (attendance_ids_to_delete, number_of_duplicated_keys)."""
+        newest = {}      # (enrollment_id, date) -> highest attendance_id seen
+        losers = []
+        duplicated = set()
+        last_id = 0
+        while True:
+            rows = supabase.table(self.table)\
+                .select("attendance_id, enrollment_id, date")\
+                .gt("attendance_id", last_id)\
+                .order("attendance_id")\
+                .limit(page_size)\
+                .execute().data
+            for row in rows:
+                key = (row['enrollment_id'], row['date'])
+                previous = newest.get(key)
+                if previous is not None:
+                    # Pages come in attendance_id order, so this row is newer than 'previous'
+                    losers.append(previous)
+                    duplicated.add(key)
+                newest[key] = row['attendance_id']
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]['attendance_id']
+
+        return losers, len(duplicated)
+
+    def delete_attendance_ids(self, attendance_ids: list, batch_size: int = 200):
+        deleted = 0
+        for i in range(0, len(attendance_ids), batch_size):
+            batch = attendance_ids[i:i + batch_size]
+            supabase.table(self.table).delete().in_("attendance_id", batch).execute()
+            deleted += len(batch)
+        return deleted
+
+    # ==========================
+    # IN-MEMORY STORE (ATTENDANCE_STORE=memory)
+    # ==========================
+
+    def _store_needs_rebuild(self) -> bool:
+        """
+        True if the caller has to load the store itself: on a cold start, or when it is stale
+        and no background scheduler is running. With the scheduler, a stale store is served
+        as is and ATTENDANCE_STORE_JOB is asked to reload it.
+        """
+        if not attendance_store.is_stale():
+            return False
+        if not attendance_store.is_loaded():
+            return True
+        return not scheduler.trigger(ATTENDANCE_STORE_JOB)
+
+    def _ensure_store(self, program_id: int = None):
+        if self._store_needs_rebuild():
+            self.rebuild_attendance_store()
+        if program_id is not None:
+            # Students enrolled after the load: fetch their names once
+            pending = attendance_store.unresolved_student_ids(program_id)
+            if pending:
+                students = supabase.table("student")\
+                    .select("student_id, name, roll_no")\
+                    .in_("student_id", pending)\
+                    .execute().data
+                attendance_store.resolve_students(students)
+
+    def rebuild_attendance_store(self, page_size: int = 1000):
+        """
+        Full reload of the in-memory store. Run periodically by the background scheduler
+        (ATTENDANCE_STORE_JOB); reads keep using the previous copy until the new one is swapped in.
+        """
+        attendance_store.begin_rebuild()
+        try:
+            enrollments = list(self._iter_table(
+                self.enrollment_table, "enrollment_id, program_id, student(student_id, name, roll_no)",
+                "enrollment_id", page_size
+            ))
+            rows = self._iter_table(self.table, "attendance_id, enrollment_id, date, status", "attendance_id", page_size)
+            attendance_store.rebuild(enrollments, rows)
+        except Exception:
+            attendance_store.abort_rebuild()
+            raise
+
+    def _iter_table(self, table: str, columns: str, key: str, page_size: int):
+        # Keyset paging over a whole table (PostgREST caps a single response at 1000 rows)
+        last = 0
+        while True:
+            page = supabase.table(table)\
+                .select(columns)\
+                .gt(key, last)\
+                .order(key)\
+                .limit(page_size)\
+                .execute().data
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1][key]
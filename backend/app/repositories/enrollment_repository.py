@@ -1,6 +1,14 @@
 from app.core.supabase import supabase
+from app.core.cache import LRUCache, cache
 from app.schemas.enrollment import EnrollmentCreate
 from fastapi.encoders import jsonable_encoder
+from app.services.dues_snapshot import dues_snapshot
+from app.services.attendance_store import attendance_store
+
+# (student_id, program_id) -> enrollment_id
+# Shared by every EnrollmentRepository instance in this process.
+# Only successful lookups are cached, so a brand-new enrollment is never hidden by a stale "not found".
+_enrollment_pair_cache = LRUCache(maxsize=4096)
 
 class EnrollmentRepository:
     def __init__(self):
@@ -14,8 +22,60 @@ class EnrollmentRepository:
             .execute()
         return response.data
 
+    def resolve_enrollment_ids(self, pairs):
+        """
+        Maps many (student_id, program_id) pairs to enrollment IDs with at most ONE query.
+
+        Algorithm:
+        1. Answer what we can from the in-process LRU cache.
+        2. For the rest, query enrollments where student_id IN (...) AND program_id IN (...).
+           That can return a few extra combinations, so we keep only the pairs we asked for.
+        3. Remember the answers in the cache for the next request.
+
+        Returns:
+            { (student_id, program_id): enrollment_id } - pairs with no enrollment are left out.
+        """
+        resolved = {}
+        missing = set()
+        for pair in set(pairs):
+            eid = _enrollment_pair_cache.get(pair)
+            if eid is None:
+                missing.add(pair)
+            else:
+                resolved[pair] = eid
+
+        if missing:
+            rows = supabase.table(self.table)\
+                .select("enrollment_id, student_id, program_id")\
+                .in_("student_id", sorted({s for s, _ in missing}))\
+                .in_("program_id", sorted({p for _, p in missing}))\
+                .order("enrollment_id")\
+                .execute().data
+            for r in rows:
+                pair = (r['student_id'], r['program_id'])
+                # First (oldest) enrollment wins if a student was enrolled twice
+                if pair in missing and pair not in resolved:
+                    resolved[pair] = r['enrollment_id']
+                    _enrollment_pair_cache.set(pair, r['enrollment_id'])
+
+        return resolved
+
     def enroll_student(self, enrollment: EnrollmentCreate):
         data = jsonable_encoder(enrollment)
         # remove 'program' or any extra fields if they sneaked in, though Pydantic handles this.
         response = supabase.table(self.table).insert(data).execute()
-        return response.data[0]
+        created = response.data[0]
+        # Invalidate the cached answer for this pair so the next lookup re-reads it from the DB
+        _enrollment_pair_cache.delete((created.get('student_id'), created.get('program_id')))
+        # The program list shows enrollment counts
+        cache.invalidate("programs")
+        # A new enrollment starts accruing monthly dues right away
+        dues_snapshot.register_enrollment(
+            created['enrollment_id'], created.get('enrollment_date'), created.get('program_id'),
+            created.get('student_id')
+        )
+        # ... and shows up on the attendance sheet
+        attendance_store.register_enrollment(
+            created['enrollment_id'], created.get('program_id'), created.get('student_id')
+        )
+        return created
@@ -1,4 +1,6 @@
 from app.core.supabase import supabase
+from app.core.cache import cache
+from app.services.performance_engine import performance_store
 from app.schemas.exam import ExamCreate
 from fastapi.encoders import jsonable_encoder
 
@@ -6,6 +8,7 @@ class ExamRepository:
     def __init__(self):
         self.table = "exam"
 
+    @cache.cached("exams")
     def get_exams_by_program(self, program_id: int):
         # Ordered by date descending
         response = supabase.table(self.table)\
@@ -15,6 +18,7 @@ class ExamRepository:
             .execute()
         return response.data
 
+    @cache.cached("exams")
     def get_all_exams(self):
         # Fetch all exams with program and batch info
         # program(program_name, batch(batch_name))
@@ -34,8 +38,11 @@ class ExamRepository:
     def create_exam(self, exam: ExamCreate):
         data = jsonable_encoder(exam)
         response = supabase.table(self.table).insert(data).execute()
+        cache.invalidate("exams")
         return response.data[0]
 
     def delete_exam(self, exam_id: int):
         supabase.table(self.table).delete().eq("exam_id", exam_id).execute()
+        cache.invalidate("exams", f"exam_analytics:{exam_id}")
+        performance_store.remove_exam(exam_id)
         return True
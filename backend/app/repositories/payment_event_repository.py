@@ -0,0 +1,102 @@
+from app.core.supabase import supabase
+from datetime import datetime, timezone
+
+class PaymentEventRepository:
+    """
+    Reads the payment event log (the 'payment_event' outbox table, see database_setup.sql).
+    Events are written by a trigger in the same transaction as the payments themselves,
+    so this class never inserts events, it only reads them and tracks consumer offsets.
+    """
+    def __init__(self):
+        self.table = "payment_event"
+        self.consumer_table = "payment_event_consumer"
+
+    def read(self, after: int = 0, limit: int = 100):
+        """Events with event_id > 'after', oldest first. The offset IS the last event_id seen."""
+        return supabase.table(self.table)\
+            .select("event_id, event_type, transaction_group_id, payload, created_at")\
+            .gt("event_id", int(after or 0))\
+            .order("event_id")\
+            .limit(limit)\
+            .execute().data
+
+    def head(self) -> int:
+        """The newest event_id (0 when the log is empty)."""
+        rows = supabase.table(self.table)\
+            .select("event_id")\
+            .order("event_id", desc=True)\
+            .limit(1)\
+            .execute().data
+        return rows[0]['event_id'] if rows else 0
+
+    async def head_async(self, client) -> int:
+        rows = (await client.table(self.table)
+                .select("event_id")
+                .order("event_id", desc=True)
+                .limit(1)
+                .execute()).data
+        return rows[0]['event_id'] if rows else 0
+
+    def get_offset(self, consumer: str) -> int:
+        rows = supabase.table(self.consumer_table)\
+            .select("last_event_id")\
+            .eq("consumer", consumer)\
+            .execute().data
+        return rows[0]['last_event_id'] if rows else 0
+
+    def poll(self, consumer: str, limit: int = 100):
+        """
+        The next events for a named consumer: everything after its committed offset.
+        Polling does NOT move the offset; the same events come back until they are acked
+        (at-least-once delivery).
+        """
+        offset = self.get_offset(consumer)
+        events = self.read(offset, limit)
+        return {
+            "consumer": consumer,
+            "offset": offset,
+            "events": events,
+            "next_offset": events[-1]['event_id'] if events else offset
+        }
+
+    def ack(self, consumer: str, offset: int):
+        """
+        Commits 'offset' (the last event_id the consumer has fully processed).
+        Offsets only move forward; an older ack is ignored.
+        """
+        if offset < 0:
+            raise Exception("Offset must be >= 0")
+        head = self.head()
+        if offset > head:
+            raise Exception(f"Offset {offset} is past the newest event ({head})")
+
+        values = {"last_event_id": offset, "updated_at": datetime.now(timezone.utc).isoformat()}
+        # The "only forward" check is part of the write itself
+        # (UPDATE ... WHERE consumer = ? AND last_event_id < offset), so two acks racing
+        # can't leave the older offset behind.
+        if self._move_offset(consumer, values):
+            return {"consumer": consumer, "offset": offset}
+        # No row changed: the consumer is new, or already at/after 'offset'.
+        # INSERT ... ON CONFLICT DO NOTHING creates the row only if it doesn't exist yet.
+        created = supabase.table(self.consumer_table)\
+            .upsert({"consumer": consumer, **values}, on_conflict="consumer", ignore_duplicates=True)\
+            .execute().data
+        if created:
+            return {"consumer": consumer, "offset": offset}
+        # Another ack created the row in between, maybe with an older offset: try once more
+        if self._move_offset(consumer, values):
+            return {"consumer": consumer, "offset": offset}
+        return {"consumer": consumer, "offset": self.get_offset(consumer)}
+
+    def _move_offset(self, consumer: str, values: dict) -> bool:
+        return bool(supabase.table(self.consumer_table)
+                    .update(values)
+                    .eq("consumer", consumer)
+                    .lt("last_event_id", values["last_event_id"])
+                    .execute().data)
+
+    def get_consumers(self):
+        return supabase.table(self.consumer_table)\
+            .select("*")\
+            .order("consumer")\
+            .execute().data
@@ -1,5 +1,26 @@
 from app.core.supabase import supabase
-from datetime import datetime, date
+from app.core.supabase_async import get_async_supabase, gather_queries
+from app.repositories.enrollment_repository import EnrollmentRepository
+from app.repositories.payment_event_repository import PaymentEventRepository
+from app.services.dues_snapshot import dues_snapshot, DuesSnapshot
+from app.services.payment_outbox import finance_events_consumer, applied_payments
+from app.core.scheduler import scheduler
+from app.core.single_flight import single_flight
+from app.core.pagination import clamp_page_size
+from app.services.program_finance import shape_program_finance
+from app.services.payment_ledger import build_ledger
+from datetime import date
+import asyncio
+import os
+
+# The background job that reloads the dues snapshot (finance stats included) from the DB
+# (registered in main.py's lifespan, see app/core/scheduler.py)
+DUES_SNAPSHOT_JOB = "dues_snapshot"
+DUES_SNAPSHOT_REFRESH_SECONDS = int(os.environ.get("DUES_SNAPSHOT_REFRESH_SECONDS", "300"))
+# The job that feeds payments made by OTHER workers (read from the payment event log) into this
+# worker's dues snapshot, so it doesn't wait for the next full refresh
+PAYMENT_EVENTS_JOB = "payment_events"
+PAYMENT_EVENTS_POLL_SECONDS = int(os.environ.get("PAYMENT_EVENTS_POLL_SECONDS", "5"))
 
 class PaymentRepository:
     """
@@ -10,6 +31,11 @@ class PaymentRepository:
         # define the table names we will be working with
         self.table = "payment"
         self.enrollment_table = "enrollment"
+        self.enrollment_repo = EnrollmentRepository()
+        self.event_repo = PaymentEventRepository()
+        # Rows per request when a query can return more than one response's worth
+        # (PostgREST caps a single response at 1000 rows, see _fetch_all)
+        self.page_size = 1000
 
     def create_bulk_payment(self, data_list: list):
         """
@@ -19,7 +45,7 @@ class PaymentRepository:
             data_list: List of dictionaries, each containing payment details for a specific month.
             
         Algorithm:
-            1. Validate that all entries belong to the same student/program (optional but good practice).
+            1. Resolve every distinct (student, program) pair to an enrollment_id in one lookup.
             2. Generate a single 'transaction_group_id' to link them all together.
             3. Prepare the list of objects for Supabase.
             4. Execute a single .insert([list]) call. Supabase/Postgres treats this as an atomic batch.
@@ -36,25 +62,19 @@ class PaymentRepository:
         
         print(f"Processing Bulk Payment of {len(data_list)} months...")
         
+        # Resolve Enrollment IDs for the WHOLE batch at once.
+        # The UI usually sends StudentID+ProgramID rather than enrollment_id. Instead of one query
+        # per item (12 identical round-trips for a 12-month advance), collect the distinct pairs
+        # and resolve them together (cached in-process, see EnrollmentRepository).
+        pairs = [(d['student_id'], d['program_id']) for d in data_list if not d.get('enrollment_id')]
+        resolved = self.enrollment_repo.resolve_enrollment_ids(pairs) if pairs else {}
+        
         for data in data_list:
-            # Resolve Enrollment ID (Optimization: Could be done once if UI sends enrollment_id directly, 
-            # but usually UI sends StudentID+ProgramID. We'll resolve strict.)
-            
-            # For efficiency, if the UI sends 'enrollment_id' we skip the query. 
-            # If not, we query. To keep it robust, let's assume UI sends enrollment_id or we fetch it.
-            # Let's start simple: UI *should* send enrollment_id. If not, we fetch it.
-            
             eid = data.get('enrollment_id')
             if not eid:
-                # Fetch logic repeated for robustness (or assume UI sends it)
-                enrollment = supabase.table(self.enrollment_table)\
-                    .select("enrollment_id")\
-                    .eq("student_id", data['student_id'])\
-                    .eq("program_id", data['program_id'])\
-                    .execute().data
-                if not enrollment:
+                eid = resolved.get((data['student_id'], data['program_id']))
+                if not eid:
                     raise Exception(f"Enrollment not found for Student {data['student_id']} Program {data['program_id']}")
-                eid = enrollment[0]['enrollment_id']
 
             record = {
                 "enrollment_id": eid,
@@ -68,10 +88,18 @@ class PaymentRepository:
             }
             batch_payload.append(record)
             
+        # The insert also writes a 'payments.created' event for this group (DB trigger).
+        # We apply our own rows right away, so our outbox consumer must skip that event.
+        # Marked BEFORE the insert: the event is visible as soon as it commits, and the consumer
+        # may poll before we get here. If the insert fails, the mark matches no event.
+        applied_payments.mark(group_id)
         try:
             # Atomic Batch Insert
             print(f"Executing Batch Insert for Group {group_id}")
             response = supabase.table(self.table).insert(batch_payload).execute()
+            # Keep the dashboard's running totals and the dues of the enrollments that were
+            # just paid for in step with what we just wrote
+            dues_snapshot.apply_payments(response.data)
             return response.data
         except Exception as e:
             print(f"Bulk Insert Failed: {e}")
@@ -81,7 +109,13 @@ class PaymentRepository:
         """
         Calculates the current financial standing for a specific enrollment.
         Used by the Frontend to determining which months are paid/unpaid.
+        Served from the dues snapshot when it is loaded; otherwise computed from the DB.
         """
+        if self._dues_snapshot_ready():
+            ledger = dues_snapshot.ledger(enrollment_id)
+            if ledger is not None:
+                return ledger
+
         # 1. Get Enrollment Details (Start Date, Fee)
         enrollment = supabase.table(self.enrollment_table)\
             .select("enrollment_date, program(monthly_fee)")\
@@ -92,7 +126,6 @@ class PaymentRepository:
         if not enrollment:
             return None
             
-        start_date = datetime.strptime(enrollment['enrollment_date'], "%Y-%m-%d").date()
         monthly_fee = float(enrollment['program']['monthly_fee'] or 0)
         
         # 2. Get All Payments for this enrollment
@@ -101,97 +134,156 @@ class PaymentRepository:
             .eq("enrollment_id", enrollment_id)\
             .execute().data
             
+        # 3. Calculate Ledger (single pass, see app/services/payment_ledger.py)
+        return build_ledger(enrollment['enrollment_date'], monthly_fee, payments)
+
+    def _build_ledgers(self, enrollments: list, payments: list):
+        """
+        Shared core of the batch APIs: group ONE list of payments by enrollment_id
+        and build each enrollment's ledger in memory.
+        """
+        payments_by_enrollment = {}
+        for p in payments:
+            payments_by_enrollment.setdefault(p['enrollment_id'], []).append(p)
+
         today = date.today()
-        
-        # 3. Calculate Ledger
-        
-        # Determine the range: Start from Enrollment, End at MAX(Today, Last Payment Date)
-        ledger = []
-        total_due = 0
-        
-        # Helper to iterate months
-        curr = start_date.replace(day=1)
-        
-        # Find the latest payment date to ensure we cover advance payments
-        last_payment_date = today
-        if payments:
-            max_p_month = max(p['month'] for p in payments)
-            max_p_year = max(p['year'] for p in payments)
-            # Create a date object from max payment (approximate to end of that month)
-            # Handle December overlap
-            if max_p_month == 12:
-                 last_payment_date = date(max_p_year + 1, 1, 1)
-            else:
-                 last_payment_date = date(max_p_year, max_p_month + 1, 1) 
-                 # This sets it to first day of NEXT month, ensuring the loop covers the payment month.
-        
-        # End date is the later of Today or the last paid month
-        end = max(today.replace(day=1), last_payment_date)
-        
-        paid_up_to = None
-        
-        # We loop until we cover the range. 
-        # Note: If we just want to show "Active" dues, we might separate "Future Ledger" from "Due Ledger".
-        # But for "Greying out" logic, we need to know status of future months too.
-        
-        while curr < end or (curr.month == end.month and curr.year == end.year): # curr <= end logic carefully
-             # Actually, simpler: loop while curr < something? 
-             # Let's stick to standard curr <= end where end is inclusive of the last interesting month.
-             # If I set last_payment_date to "Start of Next Month of Max Payment", then `curr < last_payment_date` is clean.
-            
-            if curr > end: break # Safety
-            
-            # Find payments for this specific month/year
-            month_payments = [p for p in payments if p['month'] == curr.month and p['year'] == curr.year]
-            paid_sum = sum(p['paid_amount'] for p in month_payments)
-            
-            is_fully_paid = paid_sum >= monthly_fee
-            
-            # Only calculate DUE if the month is in the past/present (active due)
-            is_past_or_present = (curr.year < today.year) or (curr.year == today.year and curr.month <= today.month)
-            
-            if is_fully_paid:
-                status = 'Paid'
-                # Only update "Paid Up To" if this is a continuous sequence (optional, but requested)
-                # Or just update it to the latest fully paid month? 
-                # "Paid Up To" usually implies a sequence. If I skip Feb and pay March, am I paid up to March? No.
-                # But simple logic: Update paid_up_to if curr > paid_up_to?
-                # Let's keep it simple: "Paid Up To" = Latest fully paid month.
-                # Or adhere to strict sequence? 
-                # Let's stick to: "Paid Up To" updates if current month is paid. (Handling gaps is complex).
-                paid_up_to = curr 
-            elif paid_sum > 0:
-                status = 'Partial'
-            else:
-                status = 'Unpaid'
-            
-            due_for_month = 0
-            if is_past_or_present:
-                 due_for_month = max(0, monthly_fee - paid_sum)
-            
-            ledger.append({
-                "month": curr.month,
-                "year": curr.year,
-                "fee": monthly_fee,
-                "paid": paid_sum,
-                "due": due_for_month, # Will be 0 for future months, which is correct
-                "status": status,
-                "is_future": not is_past_or_present
+        ledgers = {}
+        for e in enrollments:
+            if not e.get('enrollment_date'):
+                continue
+            monthly_fee = float((e.get('program') or {}).get('monthly_fee') or 0)
+            ledgers[e['enrollment_id']] = build_ledger(
+                e['enrollment_date'], monthly_fee, payments_by_enrollment.get(e['enrollment_id'], []), today
+            )
+        return ledgers
+
+    # The query builders below take the client as a parameter so the sync routes
+    # (shared 'supabase' client) and async routes (pooled async client) run the exact same queries.
+    # Queries that can grow past one response return (make_query, key) pairs instead: a fresh
+    # builder per page plus the column to page on, for _fetch_all / _fetch_all_async.
+
+    def _bulk_status_queries(self, client, enrollment_ids: list):
+        # Both queries filter on the same IDs, so they don't depend on each other
+        enrollments = lambda: client.table(self.enrollment_table)\
+            .select("enrollment_id, enrollment_date, program(monthly_fee)")\
+            .in_("enrollment_id", enrollment_ids)
+        payments = lambda: client.table(self.table)\
+            .select("payment_id, enrollment_id, month, year, paid_amount")\
+            .in_("enrollment_id", enrollment_ids)
+        return (enrollments, "enrollment_id"), (payments, "payment_id")
+
+    def _program_status_queries(self, client, program_id: int):
+        enrollments = lambda: client.table(self.enrollment_table)\
+            .select("enrollment_id, enrollment_date, student(student_id, name, roll_no), program(monthly_fee)")\
+            .eq("program_id", program_id)
+        # '!inner' turns the embed into an INNER JOIN, so we can filter payments by the
+        # enrollment's program directly instead of waiting for the enrollment IDs first.
+        payments = lambda: client.table(self.table)\
+            .select("payment_id, enrollment_id, month, year, paid_amount, enrollment!inner(program_id)")\
+            .eq("enrollment.program_id", program_id)
+        return (enrollments, "enrollment_id"), (payments, "payment_id")
+
+    def _fetch_all(self, make_query, key: str) -> list:
+        """
+        Every row of a query, one keyset page (key > last seen) at a time.
+        A single response stops at 1000 rows, which would silently cut a class's payments
+        short and show paid months as unpaid.
+        """
+        rows, last = [], 0
+        while True:
+            page = make_query().gt(key, last).order(key).limit(self.page_size).execute().data
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+            last = page[-1][key]
+
+    async def _fetch_all_async(self, make_query, key: str) -> list:
+        rows, last = [], 0
+        while True:
+            page = (await make_query().gt(key, last).order(key).limit(self.page_size).execute()).data
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+            last = page[-1][key]
+
+    def _fetch_scans(self, scans) -> list:
+        return [self._fetch_all(make_query, key) for make_query, key in scans]
+
+    async def _fetch_scans_async(self, scans) -> list:
+        # The scans don't depend on each other: page through them at the same time
+        return list(await asyncio.gather(*(self._fetch_all_async(make_query, key) for make_query, key in scans)))
+
+    def get_payment_status_bulk(self, enrollment_ids: list):
+        """
+        Same as get_payment_status, but for MANY enrollments using just two queries
+        (enrollments + payments) instead of two queries per enrollment.
+        """
+        if not enrollment_ids:
+            return []
+        ledgers = self._snapshot_ledgers(enrollment_ids) if self._dues_snapshot_ready() else {}
+        missing = [eid for eid in enrollment_ids if eid not in ledgers]
+        if missing:
+            enrollments, payments = self._fetch_scans(self._bulk_status_queries(supabase, missing))
+            ledgers.update(self._build_ledgers(enrollments, payments))
+        return self._format_bulk_status(enrollment_ids, ledgers)
+
+    async def get_payment_status_bulk_async(self, enrollment_ids: list):
+        if not enrollment_ids:
+            return []
+        ledgers = self._snapshot_ledgers(enrollment_ids) if await self._dues_snapshot_ready_async() else {}
+        missing = [eid for eid in enrollment_ids if eid not in ledgers]
+        if missing:
+            client = await get_async_supabase()
+            enrollments, payments = await self._fetch_scans_async(self._bulk_status_queries(client, missing))
+            ledgers.update(self._build_ledgers(enrollments, payments))
+        return self._format_bulk_status(enrollment_ids, ledgers)
+
+    def _snapshot_ledgers(self, enrollment_ids: list) -> dict:
+        ledgers = {}
+        for eid in enrollment_ids:
+            ledger = dues_snapshot.ledger(eid)
+            if ledger is not None:
+                ledgers[eid] = ledger
+        return ledgers
+
+    def _format_bulk_status(self, enrollment_ids: list, ledgers: dict):
+        return [{"enrollment_id": eid, **ledgers[eid]} for eid in enrollment_ids if eid in ledgers]
+
+    def get_program_payment_status(self, program_id: int):
+        """
+        Dues for a whole class (every enrollment in the program), for the Program Details page.
+        """
+        if self._dues_snapshot_ready():
+            return dues_snapshot.program_status(program_id)
+        enrollments, payments = self._fetch_scans(self._program_status_queries(supabase, program_id))
+        return self._format_program_status(enrollments, payments)
+
+    async def get_program_payment_status_async(self, program_id: int):
+        if await self._dues_snapshot_ready_async():
+            return dues_snapshot.program_status(program_id)
+        client = await get_async_supabase()
+        enrollments, payments = await self._fetch_scans_async(self._program_status_queries(client, program_id))
+        return self._format_program_status(enrollments, payments)
+
+    def _format_program_status(self, enrollments: list, payments: list):
+        ledgers = self._build_ledgers(enrollments, payments)
+
+        result = []
+        for e in enrollments:
+            if e['enrollment_id'] not in ledgers:
+                continue
+            student = e.get('student') or {}
+            result.append({
+                "enrollment_id": e['enrollment_id'],
+                "student_id": student.get('student_id'),
+                "name": student.get('name'),
+                "roll_no": student.get('roll_no'),
+                **ledgers[e['enrollment_id']]
             })
-            
-            total_due += due_for_month
-            
-            # Increment Month
-            if curr.month == 12:
-                curr = curr.replace(year=curr.year + 1, month=1)
-            else:
-                curr = curr.replace(month=curr.month + 1)
-                
-        return {
-            "total_due": total_due,
-            "paid_up_to": paid_up_to.strftime("%B %Y") if paid_up_to else "None",
-            "ledger": ledger # Frontend can use this to disable dropdowns
-        }
+
+        # Sort by roll no (students without one go last)
+        result.sort(key=lambda x: x.get('roll_no') or 999999)
+        return result
 
     def get_recent_payments(self, limit: int = 50):
         """
@@ -229,6 +321,26 @@ class PaymentRepository:
             })
         return result
 
+    def iter_payments(self, program_id: int = None, page_size: int = 1000):
+        """
+        Yields payments (oldest first) with student and program names, one keyset page
+        (payment_id > last seen) at a time. Used by the streaming exports.
+        If program_id is given, only that program's payments ('!inner' join filter).
+        """
+        embed = "enrollment!inner" if program_id is not None else "enrollment"
+        last_id = 0
+        while True:
+            query = supabase.table(self.table)\
+                .select(f"*, {embed}(program_id, student(student_id, name, roll_no), program(program_name))")\
+                .gt("payment_id", last_id)
+            if program_id is not None:
+                query = query.eq("enrollment.program_id", program_id)
+            rows = query.order("payment_id").limit(page_size).execute().data
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['payment_id']
+
     def get_student_payments(self, student_id: int):
         """
         Fetches payment history for a specific student.
@@ -269,133 +381,299 @@ class PaymentRepository:
             })
         return result
 
+    @single_flight.coalesce("finance_stats")
     def get_finance_stats(self):
         """
         Calculates financial dashboards stats: Total Revenue and Total Due.
         This is the most complex function logic-wise.
         
         Algorithm:
-        1. Fetch ALL payments (lightweight query, just amounts and dates).
-        2. Fetch ALL active enrollments (to know who SHOULD be paying).
-        3. Calculate Revenue:
-           - Sum of checks/cash collected. Simple addition.
+        1. Read from the in-process dues snapshot (see app/services/dues_snapshot.py).
+           It keeps running totals per enrollment, so we DON'T re-download the payment table.
+        2. If the snapshot is cold (first call) or too old, rebuild it from the DB.
+        3. If new enrollments appeared since then, fetch just their fee/start date in one query.
         4. Calculate Due (The tricky part):
            - Can't just check if (Fee * Months) > Paid, because one student might have overpaid 
              and another underpaid. We can't let Student A's surplus hide Student B's debt.
-           - We must iterate STUDENT BY STUDENT.
-           - For each student:
+           - So the store works STUDENT BY STUDENT:
              a. Calculate expected fee (Months since joining * Monthly Fee).
-             b. Sum their total payments.
+             b. Compare with their running total of payments.
              c. If Expected > Paid, the difference is their DUE.
              d. If Paid > Expected, their Due is 0 (they are in advance).
            - Sum up all the individual "Dues" to get the Total Arrears.
         5. Calculate 'Due This Month':
            - The amount specifically expected for the current calendar month that hasn't been paid precisely for this month.
+        6. All of these sums are kept precomputed by the snapshot, which is refreshed on payments
+           and at month boundaries instead of on every page view.
         """
-        # Step 1: Fetch Raw Payment Data
-        # We need 'month' and 'year' to check specific monthly dues
-        all_payments = supabase.table(self.table).select("enrollment_id, paid_amount, payment_date, month, year").execute().data
-        
-        # Step 2: Fetch Active Enrollments
-        # We only care about 'Active' students for calculating current dues.
-        enrollments = supabase.table(self.enrollment_table)\
-            .select("enrollment_id, enrollment_date, program(monthly_fee)")\
-            .execute().data
+        self._ensure_finance_aggregates()
+        return self._finance_stats()
 
-        # --- REVENUE CALCULATION ---
-        # Total Cash in hand (All time)
-        total_revenue = sum(p['paid_amount'] for p in all_payments)
-        
-        today = date.today()
-        # Revenue This Month: Sum of payments made in the current calendar month (by payment_date)
-        revenue_this_month = sum(p['paid_amount'] for p in all_payments if p['payment_date'].startswith(f"{today.year}-{today.month:02d}"))
+    def _finance_stats(self):
+        return {
+            **dues_snapshot.stats(),
+            # Staleness indicator: when the dues were last reloaded from the DB
+            "snapshot": dues_snapshot.status()
+        }
 
-        # --- DUE CALCULATION ---
-        total_due_overall = 0
-        total_due_this_month = 0
-        
-        # Optimization: Group payments by enrollment_id dictionary for O(1) lookup inside the loop
-        # Format: { 101: [PaymentA, PaymentB], 102: [PaymentC] }
-        payments_by_enrollment = {}
-        for p in all_payments:
-            eid = p['enrollment_id']
-            if eid not in payments_by_enrollment:
-                payments_by_enrollment[eid] = []
-            payments_by_enrollment[eid].append(p)
-
-        # Iterate through every single student (enrollment)
-        for env in enrollments:
-            prog = env.get('program')
-            if not prog or not env['enrollment_date']: continue
-            
-            fee = float(prog['monthly_fee'] or 0)
-            if fee == 0: continue
-            
-            # Get this specific student's payment history
-            student_payments = payments_by_enrollment.get(env['enrollment_id'], [])
-            
-            # A. Calculate Total Arrears (Lifetime Due)
-            # How many months have they been here?
-            start = datetime.strptime(env['enrollment_date'], "%Y-%m-%d").date()
-            months_passed = (today.year - start.year) * 12 + (today.month - start.month) + 1
-            months_passed = max(0, months_passed)
-            
-            expected_lifetime = months_passed * fee
-            paid_lifetime = sum(p['paid_amount'] for p in student_payments)
-            
-            # IMPORTANT: max(0, ...) ensures we don't count negative due (advance payment)
-            student_due_total = max(0, expected_lifetime - paid_lifetime)
-            
-            # Add to the global accumulator
-            total_due_overall += student_due_total
-            
-            # B. Calculate Due This Specific Month
-            # Logic: Fee - (Sum of payments tagged specifically for THIS month/year)
-            if start <= today:
-                fee_this_month = fee
-                # Filter payments that have month=CurrentMonth AND year=CurrentYear
-                paid_for_this_month = sum(p['paid_amount'] for p in student_payments if p.get('month') == today.month and p.get('year') == today.year)
-                
-                student_due_this_month = max(0, fee_this_month - paid_for_this_month)
-                total_due_this_month += student_due_this_month
-        
+    def _needs_rebuild(self) -> bool:
+        """
+        True if the caller has to reload the snapshot itself: on a cold start, or when it is
+        stale and no background scheduler is running. With the scheduler, a stale read is served
+        as is and a background refresh is requested instead.
+        """
+        if not dues_snapshot.is_stale():
+            return False
+        if not dues_snapshot.is_loaded():
+            return True
+        return not scheduler.trigger(DUES_SNAPSHOT_JOB)
+
+    def _ensure_finance_aggregates(self):
+        """Warms the snapshot if needed, resolves enrollments created since the last rebuild, rolls the month over."""
+        if self._needs_rebuild():
+            self.rebuild_finance_aggregates()
+
+        pending = dues_snapshot.pending_enrollment_ids()
+        if pending:
+            enrollments = self._pending_enrollments_query(supabase, pending).execute().data
+            dues_snapshot.resolve_enrollments(enrollments, pending)
+        dues_snapshot.roll_over()
+
+    async def _ensure_finance_aggregates_async(self):
+        if self._needs_rebuild():
+            await self.rebuild_finance_aggregates_async()
+
+        pending = dues_snapshot.pending_enrollment_ids()
+        if pending:
+            client = await get_async_supabase()
+            (enrollments,) = await gather_queries(self._pending_enrollments_query(client, pending))
+            dues_snapshot.resolve_enrollments(enrollments, pending)
+        dues_snapshot.roll_over()
+
+    def _dues_snapshot_ready(self) -> bool:
+        """
+        Brings a LOADED dues snapshot up to date (month roll-over, new enrollments).
+        Returns False if it isn't loaded yet: single lookups then go to the DB
+        rather than waiting for a full load.
+        """
+        if not dues_snapshot.is_loaded():
+            return False
+        self._ensure_finance_aggregates()
+        return True
+
+    async def _dues_snapshot_ready_async(self) -> bool:
+        if not dues_snapshot.is_loaded():
+            return False
+        await self._ensure_finance_aggregates_async()
+        return True
+
+    def get_program_totals(self, program_id: int):
+        """
+        Total collected and total due for one program, read from the dues snapshot.
+        Never loads the snapshot inside the request (that scans every payment): while it is
+        cold this returns None and asks the scheduler for a load; a stale copy is served
+        with "stale": True while the scheduler refreshes it.
+        """
+        if dues_snapshot.is_stale():
+            scheduler.trigger(DUES_SNAPSHOT_JOB)
+        if not dues_snapshot.is_loaded():
+            return None
         return {
-            "total_revenue": total_revenue,
-            "revenue_this_month": revenue_this_month,
-            "due_total": total_due_overall,
-            "due_this_month": total_due_this_month
+            **dues_snapshot.program_totals(program_id),
+            "stale": dues_snapshot.is_stale() or dues_snapshot.needs_roll_over()
         }
 
+    @single_flight.coalesce("finance_stats")
+    async def get_finance_stats_async(self):
+        """Async version of get_finance_stats (same snapshot, pooled client, concurrent rebuild queries)."""
+        await self._ensure_finance_aggregates_async()
+        return self._finance_stats()
+
+    def _pending_enrollments_query(self, client, enrollment_ids: list):
+        return client.table(self.enrollment_table)\
+            .select("enrollment_id, program_id, enrollment_date, program(monthly_fee, program_name, batch_id), student(student_id, name, roll_no)")\
+            .in_("enrollment_id", enrollment_ids)
+
+    def _finance_queries(self, client):
+        # Lightweight projections: just what the dues snapshot needs.
+        # Both are whole-table scans, so they are read in keyset pages (see _fetch_all).
+        all_payments = lambda: client.table(self.table)\
+            .select("payment_id, enrollment_id, paid_amount, payment_date, month, year")
+        enrollments = lambda: client.table(self.enrollment_table)\
+            .select("enrollment_id, program_id, enrollment_date, program(monthly_fee, program_name, batch_id), student(student_id, name, roll_no)")
+        return (all_payments, "payment_id"), (enrollments, "enrollment_id")
+
+    def _fetch_finance_rows(self):
+        return self._fetch_scans(self._finance_queries(supabase))
+
+    def rebuild_finance_aggregates(self):
+        """
+        Full reload of the dues snapshot (finance stats included) from the payment and enrollment tables.
+        This is the only place that scans the whole payment table.
+        Run periodically by the background scheduler (DUES_SNAPSHOT_JOB); may overlap a
+        cold-start rebuild from a request (the snapshot keeps whichever scan started last).
+        """
+        generation = dues_snapshot.begin_refresh()
+        try:
+            # Events up to 'head' are contained in the rows we are about to load; events between
+            # 'head' and 'head_after' may or may not be (see AppliedPayments.loaded)
+            head = self._event_head(self.event_repo.head)
+            all_payments, enrollments = self._fetch_finance_rows()
+            head_after = self._event_head(self.event_repo.head) if head is not None else None
+        except Exception:
+            dues_snapshot.abort_refresh()
+            raise
+        self._loaded_up_to(head, head_after, all_payments, generation)
+        dues_snapshot.finish_refresh(enrollments, all_payments, generation=generation)
+        return dues_snapshot.stats()
+
+    async def rebuild_finance_aggregates_async(self):
+        generation = dues_snapshot.begin_refresh()
+        try:
+            client = await get_async_supabase()
+            head = await self._event_head_async(client)
+            all_payments, enrollments = await self._fetch_scans_async(self._finance_queries(client))
+            head_after = await self._event_head_async(client) if head is not None else None
+        except Exception:
+            dues_snapshot.abort_refresh()
+            raise
+        self._loaded_up_to(head, head_after, all_payments, generation)
+        dues_snapshot.finish_refresh(enrollments, all_payments, generation=generation)
+        return dues_snapshot.stats()
+
+    # ------------------------------------------
+    # Payment events (outbox, see app/services/payment_outbox.py)
+    # ------------------------------------------
+    def _event_head(self, read_head):
+        # The event log is optional: without the payment_event table the snapshot simply
+        # relies on the periodic full refresh, as before.
+        try:
+            return read_head()
+        except Exception as e:
+            print(f"Payment event log unavailable, cross-worker updates disabled: {e}")
+            return None
+
+    async def _event_head_async(self, client):
+        try:
+            return await self.event_repo.head_async(client)
+        except Exception as e:
+            print(f"Payment event log unavailable, cross-worker updates disabled: {e}")
+            return None
+
+    def _loaded_up_to(self, head, head_after, all_payments: list, generation: int):
+        # Called BEFORE the snapshot swaps in the new rows: an event the consumer applies until
+        # then goes to the snapshot's refresh replay, which already drops rows the load contains.
+        if head is None:
+            return
+        applied_payments.loaded(all_payments, head_after, generation)
+        finance_events_consumer.seek(head)
+
+    def _apply_payment_event(self, event: dict):
+        # Delivered at least once: applied_payments drops what the snapshot already contains
+        rows = applied_payments.unseen(event)
+        if rows:
+            dues_snapshot.apply_payments(rows)
+
+    def consume_payment_events(self):
+        """
+        Applies payments recorded by other workers (or other apps) since the last run to this
+        worker's dues snapshot. Run every few seconds by the scheduler (PAYMENT_EVENTS_JOB).
+        """
+        return finance_events_consumer.run_once(self.event_repo.read, self._apply_payment_event)
+
+    def get_payment_events(self, after: int = 0, limit: int = None):
+        events = self.event_repo.read(after, clamp_page_size(limit))
+        return {"events": events, "next_offset": events[-1]['event_id'] if events else after}
+
+    def poll_payment_events(self, consumer: str, limit: int = None):
+        return self.event_repo.poll(consumer, clamp_page_size(limit))
+
+    def ack_payment_events(self, consumer: str, offset: int):
+        return self.event_repo.ack(consumer, offset)
+
+    def get_payment_events_status(self):
+        return {
+            "head": self.event_repo.head(),
+            "consumers": self.event_repo.get_consumers(),
+            "in_process": finance_events_consumer.status()
+        }
+
+    def get_defaulters(self, program_id: int = None, batch_id: int = None, bucket: str = None,
+                       limit: int = None, cursor: str = None):
+        """
+        Every enrollment with arrears, most owed first, with the age of the debt in buckets.
+        Same arrears as '/finance/stats' (expected fee since joining - lifetime paid), computed
+        for all enrollments in one pass over the dues snapshot instead of one
+        '/payment-status' call per enrollment.
+        """
+        self._ensure_finance_aggregates()
+        return dues_snapshot.defaulters(program_id, batch_id, bucket, clamp_page_size(limit), cursor)
+
+    def refresh_dues_snapshot(self):
+        """Manual refresh: reloads the snapshot right now and returns its new status."""
+        self.rebuild_finance_aggregates()
+        return self.get_dues_snapshot_status()
+
+    def get_dues_snapshot_status(self):
+        return {"snapshot": dues_snapshot.status(), "jobs": scheduler.status()}
+
+    def verify_finance_aggregates(self):
+        """
+        Loads a throwaway snapshot straight from the DB and compares it with the live one.
+        Use this to check for drift (e.g. rows edited by hand in the Supabase dashboard).
+        """
+        self._ensure_finance_aggregates()
+        all_payments, enrollments = self._fetch_finance_rows()
+        fresh = DuesSnapshot()
+        fresh.finish_refresh(enrollments, all_payments)
+        return dues_snapshot.diff(fresh)
+
+    def _finance_programs_query(self, client):
+        return client.table("program").select("program_id, program_name, batch_id, batch(batch_name)")
+
+    def _program_finance_from_snapshot(self, programs: list):
+        totals = dues_snapshot.program_finance()
+        return shape_program_finance(
+            programs,
+            {pid: t["collected"] for pid, t in totals.items()},
+            {pid: t["received_this_month"] for pid, t in totals.items()},
+            {pid: t["enrollments"] for pid, t in totals.items()}
+        )
+
     def get_program_finance_stats(self):
         """
         Aggregates financial data by Program (e.g. "Physics Batch A" has collected X amount).
         Used for reports.
+
+        Algorithm:
+        1. Fetch the program list (one small query).
+        2. Revenue, this month's revenue and student counts come from the dues snapshot,
+           which keeps them per enrollment - no payment scan per page view.
         """
-        # Return list of programs with their financial breakdown
-        programs = supabase.table("program").select("program_id, program_name, monthly_fee, batch(batch_name)").execute().data
-        enrollments = supabase.table(self.enrollment_table).select("enrollment_id, program_id").execute().data
-        all_payments = supabase.table(self.table).select("enrollment_id, paid_amount, payment_date").execute().data
-        
-        stats = []
-        today = date.today()
-        
-        for prog in programs:
-            pid = prog['program_id']
-            # Find all students enrolled in this program
-            prog_enrollments = [e['enrollment_id'] for e in enrollments if e['program_id'] == pid]
-            
-            # Find all payments linked to these enrollments
-            prog_payments = [p for p in all_payments if p['enrollment_id'] in prog_enrollments]
-            
-            revenue_overall = sum(p['paid_amount'] for p in prog_payments)
-            revenue_this_month = sum(p['paid_amount'] for p in prog_payments if p['payment_date'].startswith(f"{today.year}-{today.month:02d}"))
-            
-            stats.append({
-                "program_id": pid,
-                "program_name": f"{prog['program_name']} ({prog.get('batch', {}).get('batch_name')})",
-                "total_revenue": revenue_overall,
-                "revenue_this_month": revenue_this_month,
-                "active_students": len(prog_enrollments)
-            })
-            
-        return stats
+        self._ensure_finance_aggregates()
+        programs = self._finance_programs_query(supabase).execute().data
+        program_stats, _ = self._program_finance_from_snapshot(programs)
+        return program_stats
+
+    async def get_program_finance_stats_async(self):
+        await self._ensure_finance_aggregates_async()
+        client = await get_async_supabase()
+        programs = (await self._finance_programs_query(client).execute()).data
+        program_stats, _ = self._program_finance_from_snapshot(programs)
+        return program_stats
+
+    def get_batch_finance_stats(self):
+        """
+        Same figures as get_program_finance_stats, rolled up one level to the Batch (e.g. "HSC 2024").
+        """
+        self._ensure_finance_aggregates()
+        programs = self._finance_programs_query(supabase).execute().data
+        _, batch_stats = self._program_finance_from_snapshot(programs)
+        return batch_stats
+
+    async def get_batch_finance_stats_async(self):
+        await self._ensure_finance_aggregates_async()
+        client = await get_async_supabase()
+        programs = (await self._finance_programs_query(client).execute()).data
+        _, batch_stats = self._program_finance_from_snapshot(programs)
+        return batch_stats
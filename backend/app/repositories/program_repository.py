@@ -18,16 +18,35 @@ from fastapi.encoders import jsonable_encoder
 from app.core.supabase import supabase
 # This imports our configured Supabase client instance. It's the "connection" to our database.
 
+from app.core.cache import cache
+# The shared read-through cache. Batches and programs rarely change, so we keep them in memory
+# and throw the cached copy away (invalidate) whenever we write to those tables.
+
+from app.core.single_flight import single_flight
+# Concurrent identical reads (e.g. everyone opening /programs at once) share one DB call.
+
 from app.schemas.program import ProgramCreate, BatchCreate
 # Imports Pydantic models. These define the "Shape" of data we expect to receive when creating things.
 # They act as a contract/validation layer.
 
+from app.core.pagination import build_page, clamp_page_size, decode_cursor, MAX_PAGE_SIZE
+from app.repositories.payment_repository import PaymentRepository
+
+# Optional sections of the Program Details response ('?include=...')
+PROGRAM_SECTIONS = ("enrollments", "payments", "exams", "teachers")
+
 
 class ProgramRepository:
     def __init__(self):
         # Define table names as constants to avoid typos later.
         self.program_table = "program"
         self.batch_table = "batch"
+        self.enrollment_table = "enrollment"
+        self.payment_table = "payment"
+        self.exam_table = "exam"
+        self.teacher_program_table = "teacher_program_enrollment"
+        # Reused for the money totals of the Details Page
+        self.payment_repo = PaymentRepository()
 
     # ==========================================
     # BATCH OPERATIONS
@@ -35,6 +54,7 @@ class ProgramRepository:
     # We manage Batches here too because they are so closely related to Programs.
     # In a larger app, you might split this into its own 'BatchRepository'.
     
+    @cache.cached("batches")
     def get_all_batches(self):
         # Query: SELECT * FROM batch
         result = supabase.table(self.batch_table).select("*").execute()
@@ -48,6 +68,7 @@ class ProgramRepository:
         # 2. Insert into DB
         # Query: INSERT INTO batch (...) VALUES (...)
         response = supabase.table(self.batch_table).insert(data).execute()
+        cache.invalidate("batches")
         
         # 3. Return the created object (so the frontend gets the new ID immediately)
         return response.data[0] # Return the first (and only) item created.
@@ -56,6 +77,8 @@ class ProgramRepository:
     # PROGRAM OPERATIONS
     # ==========================================
     
+    @single_flight.coalesce("programs")
+    @cache.cached("programs")
     def get_all_programs(self):
         # FANCY SUPABASE TRICK: Relationship Joins + Counts
         # We want to show a list of programs, but also which Batch they belong to, 
@@ -72,39 +95,112 @@ class ProgramRepository:
             .execute()
         return response.data
 
-    def get_program_by_id(self, program_id: int):
-        # This is a "Heavy" query for the Details Page. We want EVERYTHING connected to this program.
-        
-        # The Query String Syntax:
-        # We are asking for nested relationships. Supabase (PostgREST) allows deep fetching.
-        
-        query = """
-            *,                             
-            batch(*),                      
-            enrollment(                    
-                *,                         
-                student(*),                
-                payment(*)                 
-            ),
-            exam(*),                       
-            teacher_program_enrollment(    
-                teacher(*)                 
-            )
-        """
-        # Translation:
-        # 1. Get Program fields (*)
-        # 2. Get the Batch info (*)
-        # 3. Get all Enrollments -> inside each enrollment, get the Student details AND their Payments.
-        # 4. Get all Exams linked to this program.
-        # 5. Get all Teachers linked (via the junction table teacher_program_enrollment).
+    def get_program_by_id(self, program_id: int, include: str = None):
+        # The Details Page used to ask for EVERYTHING connected to this program in one go:
+        # every enrollment with its student AND all of its payments, every exam, every teacher.
+        # For a big program that is megabytes of JSON, mostly payment history nobody looks at.
+        #
+        # Now we split it into SECTIONS:
+        # - By default: a light summary = program + batch + counts + money totals.
+        #   The totals come from the in-memory dues snapshot only; they are null until the
+        #   background job has loaded it (we never scan the payment table for one page view).
+        # - '?include=enrollments,exams' adds just the sections the page needs.
+        #   (Allowed: enrollments, payments, exams, teachers, or "all".)
+        # - Every section comes back as the first PAGE; the rest can be fetched from
+        #   /programs/{id}/enrollments, /payments, /exams and /teachers with the cursor.
+        sections = self._parse_include(include)
 
+        # "enrollment(count)" etc. -> PostgREST counts the rows instead of returning them
         response = supabase.table(self.program_table)\
-            .select(query)\
+            .select("*, batch(*), enrollment(count), exam(count), teacher_program_enrollment(count)")\
             .eq("program_id", program_id)\
             .execute()
-            
-        # Return the single object if found, otherwise None
-        return response.data[0] if response.data else None
+        if not response.data:
+            return None
+        program = response.data[0]
+
+        def pop_count(key):
+            # "enrollment": [{"count": 5}] -> 5
+            rows = program.pop(key, None) or [{"count": 0}]
+            return rows[0].get("count", 0)
+
+        program["counts"] = {
+            "enrollments": pop_count("enrollment"),
+            "exams": pop_count("exam"),
+            "teachers": pop_count("teacher_program_enrollment")
+        }
+        program["totals"] = self.payment_repo.get_program_totals(program_id)
+
+        if "enrollments" in sections:
+            # First max-size page; the Students tab fetches the rest with next_cursor ("Load more")
+            program["enrollments"] = self.get_program_enrollments(program_id, MAX_PAGE_SIZE)
+        if "payments" in sections:
+            program["payments"] = self.get_program_payments(program_id)
+        if "exams" in sections:
+            program["exams"] = self.get_program_exams(program_id, MAX_PAGE_SIZE)
+        if "teachers" in sections:
+            program["teachers"] = self.get_program_teachers(program_id, MAX_PAGE_SIZE)
+        return program
+
+    def _parse_include(self, include: str):
+        if not include:
+            return set()
+        sections = {s.strip() for s in include.split(",") if s.strip()}
+        if "all" in sections:
+            return set(PROGRAM_SECTIONS)
+        unknown = sections - set(PROGRAM_SECTIONS)
+        if unknown:
+            raise Exception(f"Unknown sections: {', '.join(sorted(unknown))}")
+        return sections
+
+    # ------------------------------------------
+    # Program sub-resources (paginated)
+    # ------------------------------------------
+
+    def get_program_enrollments(self, program_id: int, limit: int = None, cursor: str = None):
+        # Students of the program, WITHOUT their payment history. Keyset on enrollment_id.
+        limit = clamp_page_size(limit)
+        query = supabase.table(self.enrollment_table)\
+            .select("*, student(*)")\
+            .eq("program_id", program_id)
+        if cursor:
+            query = query.gt("enrollment_id", decode_cursor(cursor)["id"])
+        rows = query.order("enrollment_id").limit(limit + 1).execute().data
+        return build_page(rows, limit, lambda r: {"id": r["enrollment_id"]})
+
+    def get_program_payments(self, program_id: int, limit: int = None, cursor: str = None):
+        # Newest payments first. '!inner' filters payments by their enrollment's program.
+        limit = clamp_page_size(limit)
+        query = supabase.table(self.payment_table)\
+            .select("*, enrollment!inner(program_id, student(student_id, name, roll_no))")\
+            .eq("enrollment.program_id", program_id)
+        if cursor:
+            query = query.lt("payment_id", decode_cursor(cursor)["id"])
+        rows = query.order("payment_id", desc=True).limit(limit + 1).execute().data
+        return build_page(rows, limit, lambda r: {"id": r["payment_id"]})
+
+    def get_program_exams(self, program_id: int, limit: int = None, cursor: str = None):
+        # Newest exams first. Keyset on exam_id: exam_date may be empty, so it can't be the key.
+        limit = clamp_page_size(limit)
+        query = supabase.table(self.exam_table)\
+            .select("*")\
+            .eq("program_id", program_id)
+        if cursor:
+            query = query.lt("exam_id", decode_cursor(cursor)["id"])
+        rows = query.order("exam_id", desc=True).limit(limit + 1).execute().data
+        return build_page(rows, limit, lambda r: {"id": r["exam_id"]})
+
+    def get_program_teachers(self, program_id: int, limit: int = None, cursor: str = None):
+        # Junction table teacher_program_enrollment -> teacher.
+        # (teacher_id, program_id) is its primary key, so teacher_id is unique within a program.
+        limit = clamp_page_size(limit)
+        query = supabase.table(self.teacher_program_table)\
+            .select("teacher_id, field, teacher(*)")\
+            .eq("program_id", program_id)
+        if cursor:
+            query = query.gt("teacher_id", decode_cursor(cursor)["id"])
+        rows = query.order("teacher_id").limit(limit + 1).execute().data
+        return build_page(rows, limit, lambda r: {"id": r["teacher_id"]})
 
     def create_program(self, program: ProgramCreate):
         # The 'program' object coming from the user already has 'batch_id'.
@@ -113,6 +209,7 @@ class ProgramRepository:
         
         # Perform Insert
         response = supabase.table(self.program_table).insert(data).execute()
+        cache.invalidate("programs")
         
         # Return the newly created program
         return response.data[0]
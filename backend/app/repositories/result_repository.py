@@ -1,6 +1,16 @@
 from app.core.supabase import supabase
 from app.schemas.result import BulkResultRequest
 from app.repositories.exam_repository import ExamRepository
+from app.services.result_import import validate_row
+from app.services.exam_analytics import compute_exam_analytics, with_summary_fields
+from app.services.performance_engine import performance_store
+from app.core.cache import cache
+from app.core.single_flight import single_flight
+import os
+
+# "python" = fetch the two mark columns and compute in app/services/exam_analytics.py
+# "database" = call the 'exam_analytics' SQL function from database_setup.sql
+ANALYTICS_BACKEND = os.environ.get("EXAM_ANALYTICS_BACKEND", "python")
 
 class ResultRepository:
     def __init__(self):
@@ -17,15 +27,8 @@ class ResultRepository:
             raise Exception("Exam not found")
         program_id = exam['program_id']
 
-        # 2. Fetch all enrollments for this program to map Student ID -> Enrollment ID
-        # We need this because the Result table uses Enrollment ID, but the user (Excel) sends Student ID.
-        enrollments = supabase.table(self.enrollment_table)\
-            .select("enrollment_id, student_id")\
-            .eq("program_id", program_id)\
-            .execute().data
-        
-        # Create a lookup map: { student_id: enrollment_id }
-        student_to_enrollment = {e['student_id']: e['enrollment_id'] for e in enrollments}
+        # 2. Map Student ID -> Enrollment ID for this program
+        student_to_enrollment = self._student_enrollment_map(program_id)
 
         # 3. Prepare the data for upsert
         upsert_list = []
@@ -48,61 +51,186 @@ class ResultRepository:
         # 4. Perform Bulk Upsert (on_conflict match enrollment_id + exam_id)
         # Note: Supabase upsert requires the primary key or unique constraint columns
         response = supabase.table(self.result_table).upsert(upsert_list, on_conflict="enrollment_id, exam_id").execute()
+        cache.invalidate(f"exam_analytics:{exam_id}")
+        self._apply_to_performance_store(exam, upsert_list)
         return response.data
 
+    def _apply_to_performance_store(self, exam: dict, records: list):
+        # The rows are already saved: a store error must not fail the request. Drop the
+        # program instead, so the next timeline/leaderboard read reloads it from the DB.
+        try:
+            performance_store.apply_results(exam, records)
+        except Exception as e:
+            print(f"Performance store update failed for exam {exam['exam_id']}, reloading program: {e}")
+            performance_store.invalidate(exam['program_id'])
+
+    def _student_enrollment_map(self, program_id: int):
+        # Fetch all enrollments for this program to map Student ID -> Enrollment ID.
+        # We need this because the Result table uses Enrollment ID, but the user (Excel) sends Student ID.
+        enrollments = supabase.table(self.enrollment_table)\
+            .select("enrollment_id, student_id")\
+            .eq("program_id", program_id)\
+            .execute().data
+        
+        # Create a lookup map: { student_id: enrollment_id }
+        return {e['student_id']: e['enrollment_id'] for e in enrollments}
+
+    def import_results(self, exam_id: int, rows, chunk_size: int = 500):
+        """
+        Imports marks from an iterator of (row_number, raw_row) - e.g. a parsed CSV/XLSX upload.
+
+        Algorithm:
+        1. Build the student_id -> enrollment_id dictionary ONCE for the exam's program.
+        2. Validate rows one at a time; invalid or unknown students go straight into the report.
+        3. Buffer valid rows and upsert them in fixed-size chunks. Each chunk is its own request,
+           so an early chunk stays saved even if a later one fails.
+
+        Returns a report: a summary plus one entry per row
+        (status = accepted / rejected / unmatched / failed).
+        """
+        exam = self.exam_repo.get_exam_by_id(exam_id)
+        if not exam:
+            raise Exception("Exam not found")
+        student_to_enrollment = self._student_enrollment_map(exam['program_id'])
+
+        report = []
+        summary = {"total_rows": 0, "accepted": 0, "rejected": 0, "unmatched": 0, "failed": 0}
+        # enrollment_id -> (row_number, student_id, record). A dict, because Postgres refuses to
+        # upsert the same (enrollment_id, exam_id) twice in ONE statement; the last row wins.
+        chunk = {}
+
+        def flush():
+            if not chunk:
+                return
+            records = [record for _, _, record in chunk.values()]
+            try:
+                supabase.table(self.result_table).upsert(records, on_conflict="enrollment_id, exam_id").execute()
+                status, reason = "accepted", None
+            except Exception as e:
+                status, reason = "failed", str(e)
+            if status == "accepted":
+                self._apply_to_performance_store(exam, records)
+            for row_number, student_id, _ in chunk.values():
+                summary[status] += 1
+                report.append({"row": row_number, "student_id": student_id, "status": status, "reason": reason})
+            chunk.clear()
+
+        for row_number, raw in rows:
+            summary["total_rows"] += 1
+            item, error = validate_row(raw, exam.get('total_marks'))
+            if error:
+                summary["rejected"] += 1
+                report.append({"row": row_number, "student_id": raw.get("student_id"), "status": "rejected", "reason": error})
+                continue
+
+            enrollment_id = student_to_enrollment.get(item["student_id"])
+            if not enrollment_id:
+                summary["unmatched"] += 1
+                report.append({"row": row_number, "student_id": item["student_id"], "status": "unmatched",
+                               "reason": "Student is not enrolled in this exam's program"})
+                continue
+
+            previous = chunk.pop(enrollment_id, None)
+            if previous:
+                # Same student twice in the file: the later row replaces the earlier one
+                summary["rejected"] += 1
+                report.append({"row": previous[0], "student_id": previous[1], "status": "rejected",
+                               "reason": f"Superseded by row {row_number}"})
+            chunk[enrollment_id] = (row_number, item["student_id"], {
+                "enrollment_id": enrollment_id,
+                "exam_id": exam_id,
+                "written_marks": item["written_marks"],
+                "mcq_marks": item["mcq_marks"],
+            })
+            if len(chunk) >= chunk_size:
+                flush()
+
+        flush()
+        if summary["accepted"]:
+            cache.invalidate(f"exam_analytics:{exam_id}")
+        report.sort(key=lambda r: r["row"])
+        return {"exam_id": exam_id, "summary": summary, "rows": report}
+
+    @single_flight.coalesce("exam_results")
     def get_exam_results(self, exam_id: int):
         # Fetch results with student details for the Merit List
         response = supabase.table(self.result_table)\
             .select("*, enrollment(student(student_id, name, roll_no))")\
             .eq("exam_id", exam_id)\
-            .order("total_score", desc=True)\
+            .order("total_score", desc=True, nullsfirst=False)\
             .execute()
         return response.data
 
+    def iter_exam_results(self, exam_id: int, page_size: int = 1000):
+        """
+        Yields the merit list row by row, fetching it from the DB in keyset pages.
+        Order: total_score DESC with NULL scores last, then result_id (a unique tie-breaker
+        so pages never overlap).
+        """
+        last = None
+        while True:
+            query = supabase.table(self.result_table)\
+                .select("result_id, written_marks, mcq_marks, total_score, enrollment(student(student_id, name, roll_no))")\
+                .eq("exam_id", exam_id)
+            if last and last['total_score'] is None:
+                # Already in the NULL tail: only NULL scores with a higher result_id are left
+                query = query.is_("total_score", "null").gt("result_id", last['result_id'])
+            elif last:
+                # "after (score, id)" = lower score, or same score with a higher result_id,
+                # or no score at all (NULLs sort last)
+                query = query.or_(
+                    f"total_score.lt.{last['total_score']},"
+                    f"and(total_score.eq.{last['total_score']},result_id.gt.{last['result_id']}),"
+                    f"total_score.is.null"
+                )
+            rows = query.order("total_score", desc=True, nullsfirst=False)\
+                .order("result_id")\
+                .limit(page_size)\
+                .execute().data
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1]
+
     def get_exam_analytics(self, exam_id: int):
-        # Get raw results
-        results = self.get_exam_results(exam_id)
-        if not results:
-            return None
+        # Cached per exam; submit_bulk_results / import_results / delete_exam throw it away.
+        # Each exam gets its own cache namespace so saving marks for one exam
+        # doesn't wipe the analytics of every other exam.
+        return cache.get_or_load(
+            f"exam_analytics:{exam_id}", "get_exam_analytics", self._compute_exam_analytics, (exam_id,)
+        )
 
-        total_students = len(results)
-        
-        # Calculate Averages and Tops
-        # Initialize
-        sum_written = 0
-        sum_mcq = 0
-        sum_total = 0
-        max_written = 0
-        max_mcq = 0
-        max_total = 0
-
-        for r in results:
-            w = r.get('written_marks', 0)
-            m = r.get('mcq_marks', 0)
-            # Calculate total manually to ensure consistency
-            t = w + m
-
-            sum_written += w
-            sum_mcq += m
-            sum_total += t
-
-            if w > max_written: max_written = w
-            if m > max_mcq: max_mcq = m
-            if t > max_total: max_total = t
+    def _compute_exam_analytics(self, exam_id: int):
+        if ANALYTICS_BACKEND == "database":
+            # Everything (percentiles, histogram, ...) is computed inside Postgres,
+            # only the small JSON summary travels over the network.
+            analytics = supabase.rpc("exam_analytics", {"p_exam_id": exam_id}).execute().data
+            if not analytics or not analytics.get("total_students"):
+                return None
+            return with_summary_fields(analytics)
 
-        return {
-            "total_students": total_students,
-            "averages": {
-                "written": round(sum_written / total_students, 2),
-                "mcq": round(sum_mcq / total_students, 2),
-                "total": round(sum_total / total_students, 2)
-            },
-            "highest": {
-                "written": max_written,
-                "mcq": max_mcq,
-                "total": max_total
-            }
-        }
+        # Python path: fetch ONLY the two mark columns (no student join), then one pass in memory
+        exam = self.exam_repo.get_exam_by_id(exam_id)
+        if not exam:
+            return None
+        return compute_exam_analytics(list(self._iter_exam_marks(exam_id)), exam.get('total_marks'))
+
+    def _iter_exam_marks(self, exam_id: int, page_size: int = 1000):
+        # Keyset pages on result_id: one plain select stops at PostgREST's 1000-row cap,
+        # which would quietly leave the rest of a big exam out of the analytics
+        last_id = 0
+        while True:
+            rows = supabase.table(self.result_table)\
+                .select("result_id, written_marks, mcq_marks")\
+                .eq("exam_id", exam_id)\
+                .gt("result_id", last_id)\
+                .order("result_id")\
+                .limit(page_size)\
+                .execute().data
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['result_id']
 
     def get_exam_candidates(self, exam_id: int):
         # 1. Get Exam -> Program ID
@@ -148,3 +276,80 @@ class ResultRepository:
         
         candidates.sort(key=get_roll)
         return candidates
+
+    # ==========================
+    # CROSS-EXAM PERFORMANCE
+    # ==========================
+    # See app/services/performance_engine.py. Every program is loaded once (two queries),
+    # then kept up to date by submit_bulk_results / import_results.
+
+    def _ensure_program_performance(self, program_id: int):
+        if performance_store.is_stale(program_id):
+            self._load_program_performance(program_id)
+        # Students who got results after the load (new enrollments): fetch their names once
+        pending = performance_store.unresolved_enrollment_ids(program_id)
+        if pending:
+            enrollments = supabase.table(self.enrollment_table)\
+                .select("enrollment_id, student(student_id, name, roll_no)")\
+                .in_("enrollment_id", pending)\
+                .execute().data
+            performance_store.resolve_students(program_id, enrollments)
+
+    def _load_program_performance(self, program_id: int):
+        performance_store.begin_load(program_id)
+        try:
+            # Query 1: the program's exams
+            exams = supabase.table("exam")\
+                .select("exam_id, program_id, exam_name, exam_date, total_marks")\
+                .eq("program_id", program_id)\
+                .execute().data
+            # Query 2: every result of those exams, with the student's identity (paged)
+            results = list(self._iter_program_results([e['exam_id'] for e in exams]))
+        except Exception:
+            performance_store.abort_load(program_id)
+            raise
+        performance_store.finish_load(program_id, exams, results)
+
+    def _iter_program_results(self, exam_ids: list, page_size: int = 1000):
+        if not exam_ids:
+            return
+        last_id = 0
+        while True:
+            rows = supabase.table(self.result_table)\
+                .select("result_id, exam_id, enrollment_id, written_marks, mcq_marks, enrollment(student(student_id, name, roll_no))")\
+                .in_("exam_id", exam_ids)\
+                .gt("result_id", last_id)\
+                .order("result_id")\
+                .limit(page_size)\
+                .execute().data
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['result_id']
+
+    def get_program_performance(self, program_id: int, window: int = 3):
+        """Leaderboard of a whole program: average normalized score, percentile, trend."""
+        self._ensure_program_performance(program_id)
+        return {
+            "program_id": program_id,
+            "window": window,
+            "students": performance_store.program_leaderboard(program_id, window)
+        }
+
+    def get_student_performance(self, student_id: int, window: int = 3):
+        """Exam-by-exam timeline of one student, for every program they are enrolled in."""
+        enrollments = supabase.table(self.enrollment_table)\
+            .select("enrollment_id, program_id, program(program_name)")\
+            .eq("student_id", student_id)\
+            .execute().data
+
+        programs = []
+        for env in enrollments:
+            self._ensure_program_performance(env['program_id'])
+            programs.append({
+                "program_id": env['program_id'],
+                "program_name": (env.get('program') or {}).get('program_name'),
+                "enrollment_id": env['enrollment_id'],
+                "timeline": performance_store.student_timeline(env['program_id'], env['enrollment_id'], window)
+            })
+        return {"student_id": student_id, "window": window, "programs": programs}
@@ -1,6 +1,25 @@
 # Imports the 'supabase' connection object we created in app/core/supabase.py
 from app.core.supabase import supabase
 from app.schemas.student import StudentCreate
+from app.core.pagination import build_page, clamp_page_size, decode_cursor
+from app.services.student_search import student_search_index, RESULT_FIELDS
+import os
+
+# "memory" = in-process trigram index (app/services/student_search.py)
+# "database" = the pg_trgm 'search_students' function from database_setup.sql
+SEARCH_BACKEND = os.environ.get("STUDENT_SEARCH_BACKEND", "memory")
+
+# Columns a client may ask for with '?fields=' (the DB calls class_grade "class")
+STUDENT_COLUMNS = (
+    "student_id", "name", "fathers_name", "school", "contact",
+    "roll_no", "class", "user_id", "created_at", "updated_at"
+)
+
+
+def escape_like(value: str) -> str:
+    # '%' and '_' are LIKE wildcards: escape them (and the backslash itself) so they match literally
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 
 class StudentRepository:
     def __init__(self):
@@ -17,6 +36,100 @@ class StudentRepository:
         # Return only the 'data' part (ignoring status codes, etc.)
         return response.data
 
+    def get_students_page(self, limit: int = None, cursor: str = None, order_by: str = "student_id",
+                          class_grade: int = None, school: str = None, program_id: int = None,
+                          name_prefix: str = None, fields: str = None, count: str = None):
+        """
+        Server-side filtered, keyset-paginated student list.
+
+        Args:
+            limit: page size (default 50, max 500).
+            cursor: 'next_cursor' from the previous page.
+            order_by: "student_id" or "roll_no" (students without a roll no come last).
+            class_grade / school / program_id / name_prefix: optional filters.
+            fields: comma-separated column list, e.g. "name,roll_no" (projection).
+            count: "exact", "planned" or "estimated" to also return the total number of matches.
+                   PostgREST computes it in the SAME query, so we never fetch every row to count them.
+
+        Returns:
+            {"items": [...], "next_cursor": "..." or None, "total": int or None}
+        """
+        if order_by not in ("student_id", "roll_no"):
+            raise Exception("order_by must be 'student_id' or 'roll_no'")
+        if count and count not in ("exact", "planned", "estimated"):
+            raise Exception("count must be 'exact', 'planned' or 'estimated'")
+        limit = clamp_page_size(limit)
+
+        # --- Projection ---
+        if fields:
+            columns = [f.strip() for f in fields.split(",") if f.strip()]
+            columns = ["class" if c == "class_grade" else c for c in columns]
+            unknown = [c for c in columns if c not in STUDENT_COLUMNS]
+            if unknown:
+                raise Exception(f"Unknown fields: {', '.join(unknown)}")
+        else:
+            columns = ["*"]
+        # The cursor needs the sort keys, so always select them
+        if columns != ["*"]:
+            for k in ("student_id", order_by):
+                if k not in columns:
+                    columns.append(k)
+
+        select = ", ".join(columns)
+        if program_id is not None:
+            # '!inner' = only students that HAVE an enrollment in this program
+            select += ", enrollment!inner(program_id)"
+
+        query = supabase.table(self.table).select(select, count=count)
+
+        # --- Filters ---
+        if class_grade is not None:
+            query = query.eq("class", class_grade)
+        if school:
+            # Case-insensitive EXACT match: the school name is a value, not a pattern
+            query = query.ilike("school", escape_like(school))
+        if program_id is not None:
+            query = query.eq("enrollment.program_id", program_id)
+        if name_prefix:
+            # We only do PREFIX matching: whatever the user types is matched literally
+            # ('*' can't be escaped, PostgREST turns it into '%', so it is dropped)
+            prefix = escape_like(name_prefix.replace("*", "").replace(",", ""))
+            query = query.ilike("name", f"{prefix}%")
+
+        # --- Keyset ---
+        last = decode_cursor(cursor) if cursor else None
+        if last and not isinstance(last.get("id"), int):
+            raise Exception("Invalid cursor")
+        if order_by == "student_id":
+            if last:
+                query = query.gt("student_id", last["id"])
+            query = query.order("student_id")
+        else:
+            if last:
+                if last.get("roll") is None:
+                    # Already in the "no roll no" tail: continue by student_id only
+                    query = query.is_("roll_no", "null").gt("student_id", last["id"])
+                else:
+                    query = query.or_(
+                        f"roll_no.gt.{int(last['roll'])},"
+                        f"and(roll_no.eq.{int(last['roll'])},student_id.gt.{int(last['id'])}),"
+                        f"roll_no.is.null"
+                    )
+            query = query.order("roll_no", nullsfirst=False).order("student_id")
+
+        response = query.limit(limit + 1).execute()
+        rows = response.data
+        if program_id is not None:
+            for r in rows:
+                r.pop("enrollment", None)
+
+        def cursor_key(row):
+            if order_by == "student_id":
+                return {"id": row["student_id"]}
+            return {"roll": row.get("roll_no"), "id": row["student_id"]}
+
+        return build_page(rows, limit, cursor_key, response.count if count else None)
+
     def enroll_new_student(self, student_data: StudentCreate):
         # Convert Pydantic object to a dictionary
         data_dict = student_data.dict()
@@ -29,6 +142,9 @@ class StudentRepository:
         # Insert the corrected dictionary
         response = supabase.table(self.table).insert(data_dict).execute()
         
+        # Keep the search index in sync
+        student_search_index.upsert(response.data[0])
+        
         # Return only the 'data' part (ignoring status codes, etc.)
         return response.data[0]
 
@@ -49,4 +165,40 @@ class StudentRepository:
             .update(updates)\
             .eq("student_id", student_id)\
             .execute()
-        return response.data[0] if response.data else None
\ No newline at end of file
+        if response.data:
+            student_search_index.upsert(response.data[0])
+        return response.data[0] if response.data else None
+
+    # ==========================================
+    # SEARCH
+    # ==========================================
+
+    def search_students(self, q: str, limit: int = 20):
+        """
+        Ranked lookup by partial name, father's name, roll number or contact number.
+        Returns at most 'limit' students, best match first, each with a 'score'.
+        """
+        limit = max(1, min(int(limit), 100))
+        if SEARCH_BACKEND == "database":
+            return supabase.rpc("search_students", {"q": q, "max_results": limit}).execute().data
+
+        if student_search_index.is_stale():
+            # Fetch first, THEN swap in: searches keep using the old index while we download
+            student_search_index.rebuild(list(self._iter_search_rows()))
+        return student_search_index.search(q, limit)
+
+    def _iter_search_rows(self, page_size: int = 1000):
+        # Supabase caps a single response (1000 rows by default), so walk the table
+        # in keyset pages instead of one giant select.
+        last_id = 0
+        while True:
+            rows = supabase.table(self.table)\
+                .select(", ".join(RESULT_FIELDS))\
+                .gt("student_id", last_id)\
+                .order("student_id")\
+                .limit(page_size)\
+                .execute().data
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['student_id']
@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
 from app.repositories.attendance_repository import AttendanceRepository
 from app.schemas.attendance import BulkAttendanceRequest
 
@@ -6,9 +6,35 @@ router = APIRouter()
 attendance_repo = AttendanceRepository()
 
 @router.get("/programs/{program_id}/attendance")
-def get_daily_attendance(program_id: int, date: str):
-    return attendance_repo.get_daily_attendance(program_id, date)
+async def get_daily_attendance(program_id: int, date: str):
+    return await attendance_repo.get_daily_attendance_async(program_id, date)
 
 @router.post("/attendance/bulk")
 def upsert_attendance(data: BulkAttendanceRequest):
-    return attendance_repo.upsert_attendance(data.records)
+    return attendance_repo.upsert_attendance(data.records, data.program_id)
+
+@router.get("/programs/{program_id}/attendance/summary")
+def get_attendance_summary(
+    program_id: int,
+    start: str,
+    end: str,
+    min_rate: float = Query(0.8, ge=0, le=1),
+    min_days: int = Query(5, ge=0)
+):
+    # Per-student counts/rates, a daily rate series and chronic absentees for start..end
+    try:
+        return attendance_repo.get_attendance_summary(program_id, start, end, min_rate, min_days)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/programs/{program_id}/attendance/streaks")
+def get_attendance_streaks(program_id: int, start: str, end: str):
+    # Current / longest attended and absent runs per student for start..end
+    try:
+        return attendance_repo.get_attendance_streaks(program_id, start, end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
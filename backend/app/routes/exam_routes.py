@@ -1,8 +1,11 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, File, Header, HTTPException, Query, Response, UploadFile
 from app.repositories.exam_repository import ExamRepository
 from app.repositories.result_repository import ResultRepository
 from app.schemas.exam import ExamCreate
 from app.schemas.result import BulkResultRequest
+from app.services.result_import import iter_upload_rows
+from app.core.idempotency import IdempotencyKeyReused, run_idempotent
 
 router = APIRouter()
 exam_repo = ExamRepository()
@@ -37,8 +40,28 @@ def delete_exam(exam_id: int):
 # ==========================
 
 @router.post("/results/bulk")
-def submit_bulk_results(bulk_data: BulkResultRequest):
-    return result_repo.submit_bulk_results(bulk_data)
+def submit_bulk_results(bulk_data: BulkResultRequest, response: Response,
+                        idempotency_key: Optional[str] = Header(None)):
+    # Optional 'Idempotency-Key' header: a retried submission returns the first response
+    try:
+        return run_idempotent(response, idempotency_key, "POST /results/bulk", bulk_data.dict(),
+                              lambda: result_repo.submit_bulk_results(bulk_data))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/exams/{exam_id}/results/import")
+def import_exam_results(exam_id: int, file: UploadFile = File(...)):
+    # Upload a .csv or .xlsx marks sheet (student_id, written_marks, mcq_marks).
+    # Rows are parsed and saved in chunks; the response says what happened to every row.
+    try:
+        rows = iter_upload_rows(file.file, file.filename)
+        return result_repo.import_results(exam_id, rows)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/exams/{exam_id}/results")
 def get_exam_merit_list(exam_id: int):
@@ -51,3 +74,17 @@ def get_exam_analytics(exam_id: int):
 @router.get("/exams/{exam_id}/candidates")
 def get_exam_candidates(exam_id: int):
     return result_repo.get_exam_candidates(exam_id)
+
+# ==========================
+# CROSS-EXAM PERFORMANCE
+# ==========================
+
+@router.get("/programs/{program_id}/performance")
+def get_program_performance(program_id: int, window: int = Query(3, ge=1, le=20)):
+    # Leaderboard across ALL exams of the program (one call instead of one per exam)
+    return result_repo.get_program_performance(program_id, window)
+
+@router.get("/students/{student_id}/performance")
+def get_student_performance(student_id: int, window: int = Query(3, ge=1, le=20)):
+    # Rank / percentile / normalized score per exam plus a moving average, per program
+    return result_repo.get_student_performance(student_id, window)
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.repositories.result_repository import ResultRepository
+from app.repositories.payment_repository import PaymentRepository
+from app.services.exporters import export_stream
+
+router = APIRouter()
+result_repo = ResultRepository()
+payment_repo = PaymentRepository()
+
+# ==========================================
+# STREAMING EXPORTS (CSV / XLSX)
+# ==========================================
+# Rows are pulled from the DB page by page and written straight into the response,
+# so the whole export is never held in memory.
+
+PAYMENT_HEADER = [
+    "Payment ID", "Payment Date", "Month", "Year", "Student ID", "Roll No", "Student Name",
+    "Program", "Paid Amount", "Method", "Transaction Group", "Remarks"
+]
+
+
+def _payment_rows(payments):
+    for p in payments:
+        enroll = p.get('enrollment') or {}
+        student = enroll.get('student') or {}
+        program = enroll.get('program') or {}
+        yield [
+            p.get('payment_id'), p.get('payment_date'), p.get('month'), p.get('year'),
+            student.get('student_id'), student.get('roll_no'), student.get('name'),
+            program.get('program_name'), p.get('paid_amount'), p.get('payment_method'),
+            p.get('transaction_group_id'), p.get('remarks')
+        ]
+
+
+def _merit_rows(results):
+    # Standard competition ranking: equal scores share a rank (1, 2, 2, 4, ...)
+    rank = 0
+    previous_score = None
+    for position, r in enumerate(results, start=1):
+        if r.get('total_score') != previous_score:
+            rank = position
+            previous_score = r.get('total_score')
+        student = (r.get('enrollment') or {}).get('student') or {}
+        yield [
+            rank, student.get('student_id'), student.get('roll_no'), student.get('name'),
+            r.get('written_marks'), r.get('mcq_marks'), r.get('total_score')
+        ]
+
+
+def _streaming_response(fmt: str, filename: str, header: list, rows, sheet_title: str):
+    try:
+        body, media_type, extension = export_stream(fmt, header, rows, sheet_title)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
+
+
+@router.get("/exports/exams/{exam_id}/merit-list")
+def export_merit_list(exam_id: int, format: str = "csv"):
+    rows = _merit_rows(result_repo.iter_exam_results(exam_id))
+    header = ["Rank", "Student ID", "Roll No", "Name", "Written", "MCQ", "Total"]
+    return _streaming_response(format, f"merit_list_exam_{exam_id}", header, rows, "Merit List")
+
+@router.get("/exports/programs/{program_id}/payments")
+def export_program_payments(program_id: int, format: str = "csv"):
+    rows = _payment_rows(payment_repo.iter_payments(program_id))
+    return _streaming_response(format, f"payments_program_{program_id}", PAYMENT_HEADER, rows, "Program Ledger")
+
+@router.get("/exports/payments")
+def export_all_payments(format: str = "csv"):
+    rows = _payment_rows(payment_repo.iter_payments())
+    return _streaming_response(format, "payment_history", PAYMENT_HEADER, rows, "Payments")
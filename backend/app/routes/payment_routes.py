@@ -1,17 +1,31 @@
-from typing import List
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from app.repositories.payment_repository import PaymentRepository
-from app.schemas.payment import PaymentCreate
+from app.schemas.payment import PaymentCreate, PaymentEventAck
+from app.services.dues_snapshot import dues_snapshot
+from app.core.idempotency import IdempotencyKeyReused, run_idempotent
 
 router = APIRouter()
 payment_repo = PaymentRepository()
 
+# Read-heavy finance endpoints are 'async def' and use the pooled async client
+# (see app/core/supabase_async.py). Write endpoints stay sync and run in FastAPI's threadpool.
+
+def _snapshot_headers(response: Response):
+    # Dues are served from the snapshot (app/services/dues_snapshot.py); tell the client how old it is
+    status = dues_snapshot.status()
+    if status["loaded"]:
+        response.headers["X-Dues-As-Of"] = status["as_of"]
+        response.headers["X-Dues-Snapshot-Age"] = str(status["age_seconds"])
+
 @router.get("/payments/recent")
 def get_recent_payments():
     return payment_repo.get_recent_payments()
 
+# Writes accept an 'Idempotency-Key' header: a retried request with the same key returns the
+# first response instead of recording the payment again (see app/core/idempotency.py).
 @router.post("/payments")
-def create_payment(payment: PaymentCreate):
+def create_payment(payment: PaymentCreate, response: Response, idempotency_key: Optional[str] = Header(None)):
     try:
         # Legacy Single: Wrap in list for atomic bulk logic or keep distinct?
         # User wants Atomic. Let's redirect to bulk logic for safety if we want.
@@ -20,21 +34,83 @@ def create_payment(payment: PaymentCreate):
         # Repository has create_payment removed? No, I replaced it?
         # Step 1725: I REPLACED create_payment with create_bulk_payment!
         # So I MUST update this route to use create_bulk_payment but wrapping single item.
-        return payment_repo.create_bulk_payment([payment.dict()])[0]
+        data = payment.dict()
+        return run_idempotent(response, idempotency_key, "POST /payments", data,
+                              lambda: payment_repo.create_bulk_payment([data])[0])
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/payments/bulk")
-def create_bulk_payment(payments: List[PaymentCreate]):
+def create_bulk_payment(payments: List[PaymentCreate], response: Response,
+                        idempotency_key: Optional[str] = Header(None)):
+    try:
+        data = [p.dict() for p in payments]
+        return run_idempotent(response, idempotency_key, "POST /payments/bulk", data,
+                              lambda: payment_repo.create_bulk_payment(data))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Payment event log (outbox). Other services follow it with their own named consumer:
+#     GET  /payments/events/consumers/receipts          -> events after the committed offset
+#     POST /payments/events/consumers/receipts/ack      {"offset": <last event_id processed>}
+# Until acked, the same events are returned again (at-least-once).
+@router.get("/payments/events")
+def get_payment_events(after: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1, le=500)):
+    try:
+        return payment_repo.get_payment_events(after, limit)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/payments/events/status")
+def get_payment_events_status():
     try:
-        return payment_repo.create_bulk_payment([p.dict() for p in payments])
+        return payment_repo.get_payment_events_status()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/payments/events/consumers/{consumer}")
+def poll_payment_events(consumer: str, limit: Optional[int] = Query(None, ge=1, le=500)):
+    try:
+        return payment_repo.poll_payment_events(consumer, limit)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/payments/events/consumers/{consumer}/ack")
+def ack_payment_events(consumer: str, ack: PaymentEventAck):
+    try:
+        return payment_repo.ack_payment_events(consumer, ack.offset)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/enrollments/{enrollment_id}/payment-status")
-def get_payment_status(enrollment_id: int):
+def get_payment_status(enrollment_id: int, response: Response):
+    try:
+        result = payment_repo.get_payment_status(enrollment_id)
+        _snapshot_headers(response)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/enrollments/payment-status")
+async def get_payment_status_bulk(response: Response, ids: List[int] = Query(...)):
+    # e.g. /enrollments/payment-status?ids=1&ids=2&ids=3
+    try:
+        result = await payment_repo.get_payment_status_bulk_async(ids)
+        _snapshot_headers(response)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/programs/{program_id}/payment-status")
+async def get_program_payment_status(program_id: int, response: Response):
     try:
-        return payment_repo.get_payment_status(enrollment_id)
+        result = await payment_repo.get_program_payment_status_async(program_id)
+        _snapshot_headers(response)
+        return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -43,9 +119,52 @@ def get_student_payments(student_id: int):
     return payment_repo.get_student_payments(student_id)
 
 @router.get("/finance/stats")
-def get_finance_stats():
-    return payment_repo.get_finance_stats()
+async def get_finance_stats():
+    return await payment_repo.get_finance_stats_async()
+
+@router.get("/finance/aggregates/verify")
+def verify_finance_aggregates():
+    # Compares the in-memory running totals against a fresh scan of the DB
+    return payment_repo.verify_finance_aggregates()
+
+@router.post("/finance/aggregates/rebuild")
+def rebuild_finance_aggregates():
+    return payment_repo.rebuild_finance_aggregates()
 
 @router.get("/finance/programs")
-def get_program_finance_stats():
-    return payment_repo.get_program_finance_stats()
+async def get_program_finance_stats():
+    return await payment_repo.get_program_finance_stats_async()
+
+@router.get("/finance/batches")
+async def get_batch_finance_stats():
+    return await payment_repo.get_batch_finance_stats_async()
+
+@router.get("/finance/defaulters")
+def get_defaulters(
+    response: Response,
+    program_id: Optional[int] = None,
+    batch_id: Optional[int] = None,
+    bucket: Optional[str] = Query(None, description="0-30, 31-60, 61-90 or 90+"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    # Who owes money right now, most owed first, e.g. /finance/defaulters?batch_id=2&bucket=90%2B
+    try:
+        result = payment_repo.get_defaulters(program_id, batch_id, bucket, limit, cursor)
+        _snapshot_headers(response)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/finance/dues/snapshot")
+def get_dues_snapshot_status():
+    # Staleness indicator + the background jobs that keep the snapshot fresh
+    return payment_repo.get_dues_snapshot_status()
+
+@router.post("/finance/dues/refresh")
+def refresh_dues_snapshot():
+    # Manual refresh, e.g. after editing payments by hand in the Supabase dashboard
+    try:
+        return payment_repo.refresh_dues_snapshot()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from app.repositories.program_repository import ProgramRepository
 from app.schemas.program import ProgramCreate, BatchCreate
 
@@ -29,8 +30,40 @@ def get_programs():
     return repo.get_all_programs()
 
 @router.get("/programs/{program_id}")
-def get_program_details(program_id: int):
-    return repo.get_program_by_id(program_id)
+def get_program_details(program_id: int, include: Optional[str] = None):
+    # Light summary by default; e.g. ?include=enrollments,exams adds those sections
+    try:
+        return repo.get_program_by_id(program_id, include)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/programs/{program_id}/enrollments")
+def get_program_enrollments(program_id: int, limit: Optional[int] = Query(None, ge=1, le=500), cursor: Optional[str] = None):
+    try:
+        return repo.get_program_enrollments(program_id, limit, cursor)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/programs/{program_id}/payments")
+def get_program_payments(program_id: int, limit: Optional[int] = Query(None, ge=1, le=500), cursor: Optional[str] = None):
+    try:
+        return repo.get_program_payments(program_id, limit, cursor)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/programs/{program_id}/exams")
+def get_program_exams(program_id: int, limit: Optional[int] = Query(None, ge=1, le=500), cursor: Optional[str] = None):
+    try:
+        return repo.get_program_exams(program_id, limit, cursor)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/programs/{program_id}/teachers")
+def get_program_teachers(program_id: int, limit: Optional[int] = Query(None, ge=1, le=500), cursor: Optional[str] = None):
+    try:
+        return repo.get_program_teachers(program_id, limit, cursor)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/programs")
 def create_program(program: ProgramCreate):
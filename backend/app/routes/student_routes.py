@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from app.repositories.student_repository import StudentRepository
 from app.schemas.student import StudentCreate
 from app.repositories.enrollment_repository import EnrollmentRepository
@@ -15,14 +16,41 @@ enrollment_repo = EnrollmentRepository()
 # 3. Define the "Endpoints" (URL paths)
 
 @router.get("/students")
-def get_students():
-    return repo.get_all_students()
+def get_students(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    order_by: str = "student_id",
+    class_grade: Optional[int] = None,
+    school: Optional[str] = None,
+    program_id: Optional[int] = None,
+    name: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: Optional[str] = None,
+):
+    # No parameters at all -> the old behaviour (plain list of every student),
+    # so existing callers keep working.
+    # Any parameter -> one page: {"items": [...], "next_cursor": ..., "total": ...}
+    if all(v is None for v in (limit, cursor, class_grade, school, program_id, name, fields, count)) \
+            and order_by == "student_id":
+        return repo.get_all_students()
+    try:
+        return repo.get_students_page(
+            limit=limit, cursor=cursor, order_by=order_by, class_grade=class_grade, school=school,
+            program_id=program_id, name_prefix=name, fields=fields, count=count
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/students")
 def create_student(student: StudentCreate):
     # FastAPI automatically validates 'student' against your Pydantic rules here!
     return repo.enroll_new_student(student)
 
+# Must be declared BEFORE "/students/{student_id}", otherwise "search" is parsed as an ID
+@router.get("/students/search")
+def search_students(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100)):
+    return repo.search_students(q, limit)
+
 @router.get("/students/{student_id}")
 def get_student(student_id: int):
     return repo.get_student_by_id(student_id)
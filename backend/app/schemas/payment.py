@@ -28,3 +28,7 @@ class PaymentResponse(PaymentBase):
     student_name: str
     program_name: str
     roll_no: Optional[int] = None
+
+class PaymentEventAck(BaseModel):
+    # The last event_id the consumer has fully processed
+    offset: int
@@ -0,0 +1,198 @@
+# ==========================================
+# ATTENDANCE ANALYTICS (date ranges)
+# ==========================================
+# Monthly reports used to need one /attendance?date= call per day. Instead, one month of a
+# program's attendance is folded into a small "bitmap" document:
+#
+#   {
+#     "class_days": 0b1011...,              bit (day - 1) set = somebody was marked that day
+#     "enrollments": {"42": [P, A, L, E]},  one bitmask per status (Present/Absent/Late/Excused)
+#     "daily": {"5": [P, A, L, E]}          head counts per status for each class day
+#   }
+#
+# A date range is then answered by AND-ing the masks with a "days in range" mask and counting
+# bits, so a full year is 12 small documents no matter how many rows they came from.
+# Keys are strings because the document may be stored as JSON (the Redis cache backend).
+#
+# Rates:
+#   attended = Present + Late
+#   rate     = attended / days the student was marked (None if never marked)
+#   chronic absentee = marked on at least 'min_days' days and rate below 'min_rate'
+
+import calendar
+from datetime import date, timedelta
+
+STATUSES = ("Present", "Absent", "Late", "Excused")
+_STATUS_INDEX = {s.lower(): i for i, s in enumerate(STATUSES)}
+
+
+def popcount(mask: int) -> int:
+    # int.bit_count() needs Python 3.10+
+    return bin(mask).count("1")
+
+
+def parse_day(value) -> date:
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def months_between(start: date, end: date) -> list:
+    """[(year, month), ...] covering start..end inclusive."""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def month_bounds(year: int, month: int):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def build_month_bitmap(rows) -> dict:
+    """Folds one month of attendance rows (enrollment_id, date, status) into the bitmap document."""
+    class_days = 0
+    enrollments = {}
+    daily = {}
+    for row in rows:
+        index = _STATUS_INDEX.get(str(row.get('status') or '').lower())
+        if index is None:
+            continue  # unknown / empty status: treated as not marked
+        day = parse_day(row['date']).day
+        bit = 1 << (day - 1)
+        class_days |= bit
+
+        masks = enrollments.setdefault(str(row['enrollment_id']), [0, 0, 0, 0])
+        masks[index] |= bit
+        counts = daily.setdefault(str(day), [0, 0, 0, 0])
+        counts[index] += 1
+    return {"class_days": class_days, "enrollments": enrollments, "daily": daily}
+
+
+def _range_mask(year: int, month: int, start: date, end: date) -> int:
+    first, last = month_bounds(year, month)
+    lo = max(first, start).day
+    hi = min(last, end).day
+    if lo > hi:
+        return 0
+    # bits (lo - 1) .. (hi - 1)
+    return ((1 << hi) - 1) ^ ((1 << (lo - 1)) - 1)
+
+
+def summarize_range(months: dict, start: date, end: date, roster: list,
+                    min_rate: float = 0.8, min_days: int = 5) -> dict:
+    """
+    Args:
+        months: {(year, month): bitmap document} for every month in start..end.
+        roster: the program's enrollments [{"enrollment_id", "student": {...}}], so students
+                with no marks at all still show up.
+    """
+    totals = {}      # enrollment_id (str) -> [P, A, L, E]
+    daily = []
+    class_days = 0
+
+    for (year, month), bitmap in sorted(months.items()):
+        mask = _range_mask(year, month, start, end)
+        in_range = bitmap["class_days"] & mask
+        if not in_range:
+            continue
+        class_days += popcount(in_range)
+
+        for eid, masks in bitmap["enrollments"].items():
+            counts = totals.setdefault(eid, [0, 0, 0, 0])
+            for i in range(4):
+                counts[i] += popcount(masks[i] & mask)
+
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            if not in_range >> (day - 1) & 1:
+                continue
+            p, a, l, e = bitmap["daily"].get(str(day), [0, 0, 0, 0])
+            marked = p + a + l + e
+            daily.append({
+                "date": date(year, month, day).isoformat(),
+                "present": p, "absent": a, "late": l, "excused": e,
+                "marked": marked,
+                "rate": round((p + l) / marked, 4) if marked else None,
+            })
+
+    students = []
+    for env in roster:
+        student = env.get('student') or {}
+        p, a, l, e = totals.get(str(env['enrollment_id']), [0, 0, 0, 0])
+        marked = p + a + l + e
+        students.append({
+            "enrollment_id": env['enrollment_id'],
+            "student_id": student.get('student_id'),
+            "name": student.get('name'),
+            "roll_no": student.get('roll_no'),
+            "present": p, "absent": a, "late": l, "excused": e,
+            "marked": marked,
+            "unmarked": class_days - marked,
+            "rate": round((p + l) / marked, 4) if marked else None,
+        })
+    students.sort(key=lambda s: s.get('roll_no') or 999999)
+
+    chronic = [s for s in students if s["marked"] >= min_days and s["rate"] is not None and s["rate"] < min_rate]
+    chronic.sort(key=lambda s: s["rate"])
+
+    attended = sum(s["present"] + s["late"] for s in students)
+    marked = sum(s["marked"] for s in students)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "class_days": class_days,
+        "overall_rate": round(attended / marked, 4) if marked else None,
+        "daily": daily,
+        "students": students,
+        "chronic_absentees": chronic,
+        "criteria": {"min_rate": min_rate, "min_days": min_days},
+    }
+
+
+def attendance_streaks(months: dict, start: date, end: date, roster: list) -> list:
+    """
+    Streaks over each student's MARKED days in start..end, in date order.
+    attended = Present or Late; Excused days are skipped (they neither extend nor break a streak).
+    """
+    runs = {}   # enrollment_id (str) -> [current kind, current length, longest attended, longest absent]
+    for (year, month), bitmap in sorted(months.items()):
+        mask = _range_mask(year, month, start, end)
+        if not bitmap["class_days"] & mask:
+            continue
+        for eid, (p, a, l, _) in bitmap["enrollments"].items():
+            attended, absent = (p | l) & mask, a & mask
+            days = attended | absent
+            state = runs.setdefault(eid, [None, 0, 0, 0])
+            while days:
+                low = days & -days
+                kind = "attended" if attended & low else "absent"
+                state[1] = state[1] + 1 if state[0] == kind else 1
+                state[0] = kind
+                index = 2 if kind == "attended" else 3
+                state[index] = max(state[index], state[1])
+                days ^= low
+
+    result = []
+    for env in roster:
+        student = env.get('student') or {}
+        kind, length, best_attended, best_absent = runs.get(str(env['enrollment_id']), [None, 0, 0, 0])
+        result.append({
+            "enrollment_id": env['enrollment_id'],
+            "student_id": student.get('student_id'),
+            "name": student.get('name'),
+            "roll_no": student.get('roll_no'),
+            "current_streak": {"status": kind, "days": length},
+            "longest_attended_streak": best_attended,
+            "longest_absent_streak": best_absent,
+        })
+    result.sort(key=lambda s: s.get('roll_no') or 999999)
+    return result
+
+
+def validate_range(start: date, end: date, max_days: int = 731):
+    if end < start:
+        raise Exception("end must be on or after start")
+    if end - start > timedelta(days=max_days):
+        raise Exception(f"Date range is limited to {max_days} days")
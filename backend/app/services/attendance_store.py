@@ -0,0 +1,287 @@
+# ==========================================
+# COMPACT IN-MEMORY ATTENDANCE STORE (optional)
+# ==========================================
+# Enabled with ATTENDANCE_STORE=memory. Attendance is one row per student per day, and each
+# row fetched from Supabase becomes a Python dict of ~4 keys (several hundred bytes).
+# Here every enrollment instead keeps its days as STATUS CODES, 2 bits per day:
+#
+#     0 = not marked   1 = Present   2 = Absent   3 = Late
+#
+# packed 4 days per byte: a whole year is a 92-byte bytearray (366 days x 2 bits).
+# 'Excused' doesn't fit into 2 bits next to the other three; it is rare, so those days go into a
+# small per-enrollment set (None for the vast majority of students).
+# Records use __slots__, so an enrollment costs one small object instead of a dict per day.
+#
+# The store is loaded from the database by a background job (ATTENDANCE_STORE_JOB, see main.py),
+# updated by upsert_attendance, and answers:
+#   - daily(program, day)         -> the same rows as get_daily_attendance
+#   - month_bitmap(program, y, m) -> the document app/services/attendance_analytics.py works on,
+#                                    so range rates / chronic absentees / streaks run from memory
+#
+# Like the other in-process stores, each worker has its own copy; 'max_age_seconds'
+# bounds how long another worker's writes can go unseen.
+
+import threading
+import time
+from datetime import date
+
+from app.services.attendance_analytics import month_bounds, parse_day
+
+CODE_BY_STATUS = {"present": 1, "absent": 2, "late": 3}
+STATUS_BY_CODE = {1: "Present", 2: "Absent", 3: "Late"}
+EXCUSED = "Excused"
+# Index into the [P, A, L, E] lists of the month bitmap document
+_BITMAP_INDEX = {1: 0, 2: 1, 3: 2}
+
+YEAR_BYTES = 92  # ceil(366 days * 2 bits / 8)
+
+# byte value -> ((day offset 0..3, code), ...) for its non-zero codes, so decoding a month
+# walks ~8 bytes instead of ~30 individual days
+_BYTE_CODES = [
+    tuple((k, (value >> (k * 2)) & 3) for k in range(4) if (value >> (k * 2)) & 3)
+    for value in range(256)
+]
+
+
+def _slot(day: date):
+    # (byte position, bit shift) of a day inside its year's bytearray
+    index = day.timetuple().tm_yday - 1
+    return index >> 2, (index & 3) * 2
+
+
+class EnrollmentDays:
+    """All attendance of ONE enrollment, packed 2 bits per day."""
+    __slots__ = ("enrollment_id", "program_id", "student_id", "name", "roll_no", "years", "excused")
+
+    def __init__(self, enrollment_id: int, program_id=None, student=None):
+        self.enrollment_id = enrollment_id
+        self.program_id = program_id
+        student = student or {}
+        self.student_id = student.get('student_id')
+        self.name = student.get('name')
+        self.roll_no = student.get('roll_no')
+        self.years = {}       # year -> bytearray(YEAR_BYTES)
+        self.excused = None   # set of date ordinals, created on first 'Excused'
+
+    def get(self, day: date):
+        if self.excused and day.toordinal() in self.excused:
+            return EXCUSED
+        packed = self.years.get(day.year)
+        if packed is None:
+            return None
+        pos, shift = _slot(day)
+        return STATUS_BY_CODE.get((packed[pos] >> shift) & 3)
+
+    def set(self, day: date, status):
+        code = CODE_BY_STATUS.get(str(status or '').lower(), 0)
+        is_excused = str(status or '').lower() == EXCUSED.lower()
+
+        if is_excused:
+            if self.excused is None:
+                self.excused = set()
+            self.excused.add(day.toordinal())
+        elif self.excused:
+            self.excused.discard(day.toordinal())
+
+        packed = self.years.get(day.year)
+        if packed is None:
+            if not code:
+                return
+            packed = self.years[day.year] = bytearray(YEAR_BYTES)
+        pos, shift = _slot(day)
+        packed[pos] = (packed[pos] & ~(3 << shift) & 0xFF) | (code << shift)
+
+
+class AttendanceStore:
+    """
+    Thread-safe compact attendance for every enrollment.
+
+    Lifecycle:
+        1. begin_rebuild() + rebuild(enrollments, attendance_rows): full load from the DB
+           (abort_rebuild() if the load failed). Reads keep using the old copy until the swap.
+        2. apply(rows): called after every successful attendance upsert.
+        3. register_enrollment(...): called after a new enrollment is created.
+    """
+    def __init__(self, max_age_seconds: int = 600):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._enrollments = {}   # enrollment_id -> EnrollmentDays
+        self._by_program = {}    # program_id -> [enrollment_id, ...]
+        self._loaded = False
+        self._built_at = None    # None = stale (never loaded, or invalidated)
+        # Rows applied WHILE a rebuild scan is in flight: the scan may have read their page
+        # before the write, so they are replayed onto the new copy before it is swapped in.
+        self._replay = None
+        self._rebuilding = 0
+
+    def is_loaded(self) -> bool:
+        with self._lock:
+            return self._loaded
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            return self._built_at is None or (time.monotonic() - self._built_at) > self.max_age_seconds
+
+    def invalidate(self):
+        """Marks the store stale; the current copy is still served until it is reloaded."""
+        with self._lock:
+            self._built_at = None
+
+    def begin_rebuild(self):
+        """Call BEFORE the scan starts, so writes made during it are replayed by rebuild()."""
+        with self._lock:
+            if not self._rebuilding:
+                self._replay = []
+            self._rebuilding += 1
+
+    def _end_rebuild(self) -> list:
+        with self._lock:
+            replay = self._replay or []
+            if self._rebuilding:
+                self._rebuilding -= 1
+            if not self._rebuilding:
+                self._replay = None
+            return replay
+
+    def abort_rebuild(self):
+        self._end_rebuild()
+
+    def rebuild(self, enrollments, attendance_rows):
+        """
+        Args:
+            enrollments: rows with enrollment_id, program_id, student(student_id, name, roll_no).
+            attendance_rows: rows with enrollment_id, date, status.
+        """
+        fresh = {}
+        by_program = {}
+        for env in enrollments:
+            record = EnrollmentDays(env['enrollment_id'], env.get('program_id'), env.get('student'))
+            fresh[record.enrollment_id] = record
+            by_program.setdefault(record.program_id, []).append(record.enrollment_id)
+        for row in attendance_rows:
+            record = fresh.get(row['enrollment_id'])
+            if record is not None:
+                record.set(parse_day(row['date']), row.get('status'))
+
+        with self._lock:
+            for row in self._end_rebuild():
+                record = fresh.get(row['enrollment_id'])
+                if record is not None:
+                    record.set(parse_day(row['date']), row.get('status'))
+            self._enrollments = fresh
+            self._by_program = by_program
+            self._loaded = True
+            self._built_at = time.monotonic()
+
+    def apply(self, rows: list):
+        """Writes freshly upserted rows (enrollment_id, date, status) into the store."""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.extend(rows)
+            if not self._loaded:
+                return
+            for row in rows:
+                record = self._enrollments.get(row['enrollment_id'])
+                if record is None:
+                    # Enrollment created by another worker after our load: reload soon
+                    self._built_at = None
+                    continue
+                record.set(parse_day(row['date']), row.get('status'))
+
+    def register_enrollment(self, enrollment_id: int, program_id: int, student_id=None):
+        """Adds a new (still empty) enrollment. Its name is resolved on the next read."""
+        with self._lock:
+            if not self._loaded or enrollment_id in self._enrollments:
+                return
+            self._enrollments[enrollment_id] = EnrollmentDays(enrollment_id, program_id, {"student_id": student_id})
+            self._by_program.setdefault(program_id, []).append(enrollment_id)
+
+    def unresolved_student_ids(self, program_id: int) -> list:
+        with self._lock:
+            return [
+                r.student_id for r in self._program_records(program_id)
+                if r.name is None and r.student_id is not None
+            ]
+
+    def resolve_students(self, students: list):
+        by_id = {s['student_id']: s for s in students}
+        with self._lock:
+            for record in self._enrollments.values():
+                student = by_id.get(record.student_id)
+                if student and record.name is None:
+                    record.name = student.get('name')
+                    record.roll_no = student.get('roll_no')
+
+    def _program_records(self, program_id: int) -> list:
+        return [self._enrollments[eid] for eid in self._by_program.get(program_id, ())]
+
+    # ------------------------------------------
+    # Reads
+    # ------------------------------------------
+    def daily(self, program_id: int, date_str: str) -> list:
+        day = parse_day(date_str)
+        with self._lock:
+            result = [{
+                "enrollment_id": r.enrollment_id,
+                "student_id": r.student_id,
+                "name": r.name,
+                "roll_no": r.roll_no,
+                # Rows are keyed by (enrollment_id, date), the store doesn't keep attendance_id
+                "attendance_id": None,
+                "status": r.get(day),
+                "date": date_str
+            } for r in self._program_records(program_id)]
+        result.sort(key=lambda x: x.get('roll_no') or 999999)
+        return result
+
+    def roster(self, program_id: int) -> list:
+        with self._lock:
+            return [{
+                "enrollment_id": r.enrollment_id,
+                "student": {"student_id": r.student_id, "name": r.name, "roll_no": r.roll_no}
+            } for r in self._program_records(program_id)]
+
+    def month_bitmap(self, program_id: int, year: int, month: int) -> dict:
+        """Same document as attendance_analytics.build_month_bitmap, built from the packed codes."""
+        first, last = month_bounds(year, month)
+        first_index = first.timetuple().tm_yday - 1
+        last_index = last.timetuple().tm_yday - 1
+        days = last.day
+        first_ordinal = first.toordinal()
+
+        class_days = 0
+        enrollments = {}
+        counts = [[0, 0, 0, 0] for _ in range(days + 1)]   # per day of month, [P, A, L, E]
+        with self._lock:
+            for r in self._program_records(program_id):
+                packed = r.years.get(year)
+                masks = None
+                if packed is not None:
+                    for pos in range(first_index >> 2, (last_index >> 2) + 1):
+                        for k, code in _BYTE_CODES[packed[pos]]:
+                            day = pos * 4 + k - first_index + 1
+                            if 1 <= day <= days:
+                                if masks is None:
+                                    masks = [0, 0, 0, 0]
+                                i = _BITMAP_INDEX[code]
+                                masks[i] |= 1 << (day - 1)
+                                counts[day][i] += 1
+                if r.excused:
+                    for ordinal in r.excused:
+                        day = ordinal - first_ordinal + 1
+                        if 1 <= day <= days:
+                            if masks is None:
+                                masks = [0, 0, 0, 0]
+                            masks[3] |= 1 << (day - 1)
+                            counts[day][3] += 1
+                if masks is None:
+                    continue
+                enrollments[str(r.enrollment_id)] = masks
+                class_days |= masks[0] | masks[1] | masks[2] | masks[3]
+
+        daily = {str(day): c for day, c in enumerate(counts) if any(c)}
+        return {"class_days": class_days, "enrollments": enrollments, "daily": daily}
+
+
+# One shared store per process
+attendance_store = AttendanceStore()
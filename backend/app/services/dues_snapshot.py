@@ -0,0 +1,518 @@
+# ==========================================
+# DUES SNAPSHOT
+# ==========================================
+# What every student owes changes only when:
+#   1. a payment lands, or
+#   2. the month rolls over (a new month's fee becomes due).
+# Yet '/finance/stats', '/payment-status' and '/programs/{id}/payment-status' used to
+# recompute dues against date.today() (and re-query the payment table) on every page view.
+#
+# This store MATERIALIZES the dues per enrollment "as of" one month:
+#     fee, start month, paid per tagged month  -> the inputs
+#     arrears, due this month                  -> precomputed figures
+# plus running sums for the whole center and per program, so '/finance/stats' is a lookup
+# (revenue included: lifetime paid per enrollment and cash received per calendar month).
+# The month-by-month ledger is rendered from the stored per-month payments, without the DB.
+#
+# It is kept fresh by:
+#   - apply_payments()  right after 'create_bulk_payment' (payment events), only the affected
+#                       enrollments are recomputed
+#   - roll_over()       at month boundaries (no DB access, the inputs don't change)
+#   - finish_refresh()  periodic full reload from the DB, which also picks up other workers'
+#                       writes; run by the background scheduler (app/core/scheduler.py)
+#
+# status() tells how old the snapshot is, which is shown as the staleness indicator.
+#
+# defaulters() ranks every enrollment that owes money in one pass over the snapshot, with the
+# age of the debt bucketed 0-30 / 31-60 / 61-90 / 90+ days (see oldest_unpaid()).
+
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from app.core.pagination import build_page, decode_cursor
+from app.services.finance_aggregates import EnrollmentTotals, _parse_date
+from app.services.payment_ledger import build_ledger, month_from_index, month_index
+
+# (label, first day, last day) of each arrears age bucket
+AGING_BUCKETS = (("0-30", 0, 30), ("31-60", 31, 60), ("61-90", 61, 90), ("90+", 91, None))
+
+
+def aging_bucket(days: int) -> str:
+    for label, low, high in AGING_BUCKETS:
+        if days >= low and (high is None or days <= high):
+            return label
+    return AGING_BUCKETS[0][0]
+
+
+class EnrollmentDues(EnrollmentTotals):
+    """EnrollmentTotals plus who the student is and the dues precomputed for the snapshot month."""
+    def __init__(self, enrollment_id: int, program_id=None, enrollment_date=None, student=None):
+        super().__init__(enrollment_id, program_id, enrollment_date)
+        self.set_student(student)
+        self.program_name = None
+        self.batch_id = None
+        self.arrears = 0.0     # max(0, expected - paid): the '/finance/stats' definition
+        self.month_due = 0.0
+        # Cash received by the calendar month it arrived in (payment_date), for '/finance/programs'.
+        # Kept per month: a future-dated payment must not hide this month's receipts.
+        self.received_by_month = {}  # {(2024, 5): 1500.0}
+
+    def set_student(self, student):
+        student = student or {}
+        self.student_id = student.get('student_id')
+        self.name = student.get('name')
+        self.roll_no = student.get('roll_no')
+
+    def set_program(self, program):
+        """Fee, name and batch from the embedded program(monthly_fee, program_name, batch_id)."""
+        self.monthly_fee = float(program.get('monthly_fee') or 0) if program else 0.0
+        self.program_name = program.get('program_name') if program else None
+        self.batch_id = program.get('batch_id') if program else None
+
+    def oldest_unpaid(self, as_of: date):
+        """
+        The day the oldest unpaid fee became due. Payments are allocated to months oldest first
+        (the same lifetime-paid vs expected-fee view as the arrears), so with 3 months' worth
+        paid the 4th month since joining is the oldest one owed. None if nothing is owed.
+        """
+        if self.arrears <= 0 or not self.monthly_fee or not self.start:
+            return None
+        covered = int((self.lifetime_paid + 0.005) // self.monthly_fee)
+        year, month = month_from_index(month_index(self.start.year, self.start.month) + covered)
+        # Fees are due from the 1st of the month, the first one from the day the student joined
+        return self.start if covered == 0 else date(year, month, 1)
+
+    def add_receipt(self, amount: float, payment_date):
+        day = _parse_date(payment_date)
+        if day is None:
+            return
+        key = (day.year, day.month)
+        self.received_by_month[key] = self.received_by_month.get(key, 0.0) + amount
+
+    def received_in(self, as_of: date) -> float:
+        return self.received_by_month.get((as_of.year, as_of.month), 0.0)
+
+    def payment_rows(self) -> list:
+        return [{"year": y, "month": m, "paid_amount": amount} for (y, m), amount in self.paid_by_month.items()]
+
+    def ledger(self, as_of: date) -> dict:
+        if not self.start:
+            return None
+        return build_ledger(self.start, self.monthly_fee or 0.0, self.payment_rows(), as_of)
+
+    def recompute(self, as_of: date):
+        self.arrears = self.due_total(as_of)
+        self.month_due = self.due_this_month(as_of)
+
+
+class DuesSnapshot:
+    """
+    Thread-safe dues per enrollment, materialized as of one month.
+
+    Lifecycle:
+        1. begin_refresh() / finish_refresh(enrollments, payments, generation): full load from the DB
+           (abort_refresh() if the load failed).
+        2. apply_payments(rows): after every successful payment insert.
+        3. register_enrollment(...) / resolve_enrollments(...): enrollments created since the load.
+        4. roll_over(): when the calendar month changes.
+    """
+    def __init__(self, max_age_seconds: int = 900):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._enrollments = {}       # enrollment_id -> EnrollmentDues
+        self._as_of = None           # the date the figures were computed for
+        self._refreshed_at = None    # wall clock of the last full load (shown to users)
+        self._built_at = None        # monotonic clock of the last full load (for max_age)
+        self._updated_at = None      # wall clock of the last change of any kind
+        self._totals = {"revenue": 0.0, "received": 0.0, "arrears": 0.0, "month_due": 0.0}
+        self._by_program = {}        # program_id -> {"collected", "due"}
+        # Payments applied WHILE a refresh scan is in flight. The scan may or may not contain
+        # them, so the ones it missed are replayed onto it (matched by payment_id).
+        self._refresh_replay = None
+        # Refreshes overlap (the scheduler's job vs. a cold-start read, sync vs. async routes).
+        # The replay list is only reset when the first one starts and dropped when the last one
+        # ends, so a payment during either is replayed onto both. Each refresh gets a generation
+        # number when it starts; a scan older than the one already swapped in is thrown away.
+        self._refreshing = 0
+        self._generation = 0         # of the latest begin_refresh()
+        self._installed = 0          # of the load currently swapped in
+
+    # ------------------------------------------
+    # Loading
+    # ------------------------------------------
+    def is_loaded(self) -> bool:
+        with self._lock:
+            return self._built_at is not None
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            return self._built_at is None or (time.monotonic() - self._built_at) > self.max_age_seconds
+
+    def needs_roll_over(self, today: date = None) -> bool:
+        today = today or date.today()
+        with self._lock:
+            return self._as_of is not None and (self._as_of.year, self._as_of.month) != (today.year, today.month)
+
+    def begin_refresh(self) -> int:
+        """Call BEFORE the scan starts. Returns the refresh's generation, for finish_refresh()."""
+        with self._lock:
+            if not self._refreshing:
+                self._refresh_replay = []
+            self._refreshing += 1
+            self._generation += 1
+            return self._generation
+
+    def _end_refresh(self) -> list:
+        if self._refreshing <= 1:
+            self._refreshing = 0
+            replay, self._refresh_replay = self._refresh_replay, None
+            return replay or []
+        self._refreshing -= 1
+        return list(self._refresh_replay)
+
+    def abort_refresh(self):
+        with self._lock:
+            self._end_refresh()
+
+    def finish_refresh(self, enrollments: list, payments: list, today: date = None, generation: int = None) -> bool:
+        """
+        Swaps in a fresh load. Returns False (and keeps the current figures) if a refresh that
+        started later has already been swapped in.
+
+        Args:
+            enrollments: rows with enrollment_id, program_id, enrollment_date,
+                         program(monthly_fee, program_name, batch_id), student(student_id, name, roll_no).
+            payments: rows with payment_id, enrollment_id, paid_amount, payment_date, month, year.
+            generation: what begin_refresh() returned (None: a standalone load, always swapped in).
+        """
+        today = today or date.today()
+        fresh = {}
+        for env in enrollments:
+            record = EnrollmentDues(env['enrollment_id'], env.get('program_id'), env.get('enrollment_date'),
+                                    env.get('student'))
+            record.set_program(env.get('program'))
+            fresh[record.enrollment_id] = record
+        self._add_payments(fresh, payments)
+        for record in fresh.values():
+            record.recompute(today)
+
+        with self._lock:
+            replay = self._end_refresh()
+            if generation is None:
+                generation = self._generation
+            elif generation < self._installed:
+                return False
+            if replay:
+                seen = {p.get('payment_id') for p in payments}
+                for eid in self._add_payments(fresh, [p for p in replay if p.get('payment_id') not in seen]):
+                    fresh[eid].recompute(today)
+            self._enrollments = fresh
+            self._as_of = today
+            self._built_at = time.monotonic()
+            self._refreshed_at = self._updated_at = datetime.now(timezone.utc)
+            self._installed = generation
+            self._resum()
+            return True
+
+    @staticmethod
+    def _add_payments(records: dict, payments) -> set:
+        touched = set()
+        for p in payments:
+            eid = p.get('enrollment_id')
+            record = records.get(eid)
+            if record is None:
+                # Enrollment created after the load; fee and start date are resolved on the next read
+                record = records[eid] = EnrollmentDues(eid)
+            amount = float(p.get('paid_amount') or 0)
+            record.add_payment(amount, p.get('month'), p.get('year'))
+            record.add_receipt(amount, p.get('payment_date'))
+            touched.add(eid)
+        return touched
+
+    def _resum(self):
+        totals = {"revenue": 0.0, "received": 0.0, "arrears": 0.0, "month_due": 0.0}
+        by_program = {}
+        for record in self._enrollments.values():
+            totals["revenue"] += record.lifetime_paid
+            totals["received"] += record.received_in(self._as_of)
+            totals["arrears"] += record.arrears
+            totals["month_due"] += record.month_due
+            program = by_program.setdefault(record.program_id, {"collected": 0.0, "due": 0.0})
+            program["collected"] += record.lifetime_paid
+            program["due"] += record.arrears
+        self._totals = totals
+        self._by_program = by_program
+
+    def _take_out(self, record: EnrollmentDues):
+        program = self._by_program.setdefault(record.program_id, {"collected": 0.0, "due": 0.0})
+        self._totals["revenue"] -= record.lifetime_paid
+        self._totals["received"] -= record.received_in(self._as_of)
+        self._totals["arrears"] -= record.arrears
+        self._totals["month_due"] -= record.month_due
+        program["due"] -= record.arrears
+        program["collected"] -= record.lifetime_paid
+
+    def _put_back(self, record: EnrollmentDues):
+        program = self._by_program.setdefault(record.program_id, {"collected": 0.0, "due": 0.0})
+        self._totals["revenue"] += record.lifetime_paid
+        self._totals["received"] += record.received_in(self._as_of)
+        self._totals["arrears"] += record.arrears
+        self._totals["month_due"] += record.month_due
+        program["due"] += record.arrears
+        program["collected"] += record.lifetime_paid
+
+    # ------------------------------------------
+    # Events
+    # ------------------------------------------
+    def apply_payments(self, payments: list):
+        """Payment event: recomputes only the enrollments these rows belong to."""
+        with self._lock:
+            if self._refresh_replay is not None:
+                self._refresh_replay.extend(payments)
+            if self._built_at is None:
+                return
+            # The running sums swap each touched enrollment's old figures for its new ones
+            for eid in {p.get('enrollment_id') for p in payments}:
+                if eid in self._enrollments:
+                    self._take_out(self._enrollments[eid])
+            for eid in self._add_payments(self._enrollments, payments):
+                record = self._enrollments[eid]
+                record.recompute(self._as_of)
+                self._put_back(record)
+            self._updated_at = datetime.now(timezone.utc)
+
+    def register_enrollment(self, enrollment_id: int, enrollment_date=None, program_id=None, student_id=None):
+        """A new enrollment starts accruing dues. Fee and student details are resolved on the next read."""
+        with self._lock:
+            if self._built_at is None or enrollment_id in self._enrollments:
+                return
+            self._enrollments[enrollment_id] = EnrollmentDues(
+                enrollment_id, program_id, enrollment_date, {"student_id": student_id})
+
+    def pending_enrollment_ids(self) -> list:
+        with self._lock:
+            return [eid for eid, r in self._enrollments.items() if r.monthly_fee is None]
+
+    def resolve_enrollments(self, enrollments: list, requested_ids: list):
+        """Fills in fee, start date and student for pending enrollments (gone ones get a fee of 0)."""
+        rows = {e['enrollment_id']: e for e in enrollments}
+        with self._lock:
+            for eid in requested_ids:
+                record = self._enrollments.get(eid)
+                if record is None:
+                    continue
+                env = rows.get(eid)
+                self._take_out(record)
+                if env is None:
+                    record.monthly_fee = 0.0
+                else:
+                    record.program_id = env.get('program_id')
+                    record.start = _parse_date(env.get('enrollment_date'))
+                    record.set_student(env.get('student'))
+                    record.set_program(env.get('program'))
+                record.recompute(self._as_of)
+                self._put_back(record)
+
+    def roll_over(self, today: date = None) -> bool:
+        """Month boundary: recomputes every enrollment as of the new month. Returns True if it did."""
+        today = today or date.today()
+        with self._lock:
+            if self._as_of is None:
+                return False
+            if (self._as_of.year, self._as_of.month) == (today.year, today.month):
+                self._as_of = today
+                return False
+            self._as_of = today
+            for record in self._enrollments.values():
+                record.recompute(today)
+            self._resum()
+            self._updated_at = datetime.now(timezone.utc)
+            return True
+
+    # ------------------------------------------
+    # Reads
+    # ------------------------------------------
+    def ledger(self, enrollment_id: int):
+        """The '/payment-status' document, or None if the enrollment isn't in the snapshot."""
+        with self._lock:
+            record = self._enrollments.get(enrollment_id)
+            if record is None or record.monthly_fee is None:
+                return None
+            return record.ledger(self._as_of)
+
+    def program_status(self, program_id: int) -> list:
+        """Same rows as PaymentRepository.get_program_payment_status, from the snapshot."""
+        with self._lock:
+            result = []
+            for record in self._enrollments.values():
+                if record.program_id != program_id or record.monthly_fee is None:
+                    continue
+                ledger = record.ledger(self._as_of)
+                if ledger is None:
+                    continue
+                result.append({
+                    "enrollment_id": record.enrollment_id,
+                    "student_id": record.student_id,
+                    "name": record.name,
+                    "roll_no": record.roll_no,
+                    **ledger
+                })
+        result.sort(key=lambda x: x.get('roll_no') or 999999)
+        return result
+
+    def stats(self) -> dict:
+        """The '/finance/stats' figures: revenue (lifetime, and by payment_date this month) and dues."""
+        with self._lock:
+            return {
+                "total_revenue": self._totals["revenue"],
+                "revenue_this_month": self._totals["received"],
+                "due_total": self._totals["arrears"],
+                "due_this_month": self._totals["month_due"]
+            }
+
+    def program_totals(self, program_id: int) -> dict:
+        with self._lock:
+            totals = self._by_program.get(program_id) or {"collected": 0.0, "due": 0.0}
+            return {"collected": totals["collected"], "due": totals["due"]}
+
+    def program_finance(self) -> dict:
+        """
+        program_id -> {"collected", "received_this_month", "enrollments"}: the '/finance/programs'
+        figures (lifetime revenue, revenue by payment_date this month, enrolled students).
+        """
+        with self._lock:
+            as_of = self._as_of or date.today()
+            result = {}
+            for record in self._enrollments.values():
+                if record.program_id is None:
+                    continue
+                totals = result.get(record.program_id)
+                if totals is None:
+                    totals = result[record.program_id] = {"collected": 0.0, "received_this_month": 0.0,
+                                                          "enrollments": 0}
+                totals["collected"] += record.lifetime_paid
+                totals["received_this_month"] += record.received_in(as_of)
+                totals["enrollments"] += 1
+            return result
+
+    def defaulters(self, program_id: int = None, batch_id: int = None, bucket: str = None,
+                   limit: int = 50, cursor: str = None) -> dict:
+        """
+        Everyone who owes money, most owed first (ties by enrollment_id), one page at a time.
+        The summary (count and amount per aging bucket) covers ALL matching rows, not just the page.
+        Keyset cursor: {"due": amount, "id": enrollment_id} of the last row returned.
+        """
+        if bucket is not None and bucket not in {b[0] for b in AGING_BUCKETS}:
+            raise Exception(f"Unknown bucket '{bucket}', expected one of: {', '.join(b[0] for b in AGING_BUCKETS)}")
+
+        buckets = {label: {"count": 0, "amount": 0.0} for label, _, _ in AGING_BUCKETS}
+        rows = []
+        with self._lock:
+            as_of = self._as_of
+            for r in self._enrollments.values():
+                if r.arrears <= 0.005:
+                    continue
+                if program_id is not None and r.program_id != program_id:
+                    continue
+                if batch_id is not None and r.batch_id != batch_id:
+                    continue
+                since = r.oldest_unpaid(as_of)
+                days = max(0, (as_of - since).days) if since else 0
+                label = aging_bucket(days)
+                buckets[label]["count"] += 1
+                buckets[label]["amount"] += r.arrears
+                if bucket is not None and label != bucket:
+                    continue
+                rows.append((r, since, days, label))
+
+        rows.sort(key=lambda x: (-x[0].arrears, x[0].enrollment_id))
+        total = len(rows)
+        if cursor:
+            key = decode_cursor(cursor)
+            after = (-float(key["due"]), int(key["id"]))
+            rows = [x for x in rows if (-x[0].arrears, x[0].enrollment_id) > after]
+
+        items = [{
+            "enrollment_id": r.enrollment_id,
+            "student_id": r.student_id,
+            "name": r.name,
+            "roll_no": r.roll_no,
+            "program_id": r.program_id,
+            "program_name": r.program_name,
+            "batch_id": r.batch_id,
+            "monthly_fee": r.monthly_fee,
+            "due": r.arrears,
+            "months_due": round(r.arrears / r.monthly_fee, 2) if r.monthly_fee else None,
+            "oldest_unpaid": since.isoformat() if since else None,
+            "days_overdue": days,
+            "bucket": label
+        } for r, since, days, label in rows[:limit + 1]]
+
+        page = build_page(items, limit, lambda row: {"due": row["due"], "id": row["enrollment_id"]}, total)
+        page["summary"] = {
+            "as_of": as_of.isoformat() if as_of else None,
+            "defaulters": sum(b["count"] for b in buckets.values()),
+            "total_due": sum(b["amount"] for b in buckets.values()),
+            "buckets": buckets
+        }
+        return page
+
+    def diff(self, other: "DuesSnapshot", tolerance: float = 0.01) -> dict:
+        """
+        Compares this (live) snapshot against a freshly loaded one and reports any drift
+        (e.g. rows edited by hand in the Supabase dashboard).
+        """
+        drifted = []
+        with self._lock:
+            ids = set(self._enrollments) | set(other._enrollments)
+            for eid in sorted(ids, key=lambda x: (x is None, x)):
+                live = self._enrollments.get(eid)
+                fresh = other._enrollments.get(eid)
+                live_paid = live.lifetime_paid if live else 0.0
+                fresh_paid = fresh.lifetime_paid if fresh else 0.0
+                live_months = live.paid_by_month if live else {}
+                fresh_months = fresh.paid_by_month if fresh else {}
+                month_drift = any(
+                    abs(live_months.get(k, 0.0) - fresh_months.get(k, 0.0)) > tolerance
+                    for k in set(live_months) | set(fresh_months)
+                )
+                if abs(live_paid - fresh_paid) > tolerance or month_drift:
+                    drifted.append({
+                        "enrollment_id": eid,
+                        "live_paid": live_paid,
+                        "db_paid": fresh_paid
+                    })
+
+            live_stats = self.stats()
+        db_stats = other.stats()
+        in_sync = not drifted and all(
+            abs(live_stats[k] - db_stats[k]) <= tolerance for k in live_stats
+        )
+        return {
+            "in_sync": in_sync,
+            "live": live_stats,
+            "database": db_stats,
+            "drifted_enrollments": drifted
+        }
+
+    def status(self, today: date = None) -> dict:
+        """Staleness indicator."""
+        today = today or date.today()
+        with self._lock:
+            if self._built_at is None:
+                return {"loaded": False, "stale": True}
+            return {
+                "loaded": True,
+                "as_of": self._as_of.isoformat(),
+                "refreshed_at": self._refreshed_at.isoformat(),
+                "updated_at": self._updated_at.isoformat(),
+                "age_seconds": round(time.monotonic() - self._built_at, 1),
+                "stale": self.is_stale() or self.needs_roll_over(today),
+                "enrollments": len(self._enrollments),
+                "pending_enrollments": sum(1 for r in self._enrollments.values() if r.monthly_fee is None),
+            }
+
+
+# One shared snapshot per process
+dues_snapshot = DuesSnapshot()
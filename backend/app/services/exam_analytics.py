@@ -0,0 +1,109 @@
+# ==========================================
+# EXAM ANALYTICS
+# ==========================================
+# Summary statistics for one exam's marks:
+#   - per component (written / mcq / total): average, highest, lowest, median,
+#     standard deviation, 25th / 75th / 90th percentiles
+#   - pass mark, pass count and pass rate (pass mark = pass_ratio x exam total_marks)
+#   - a score histogram over 0 .. total_marks
+#
+# The same numbers can be computed by the 'exam_analytics' SQL function in database_setup.sql
+# (EXAM_ANALYTICS_BACKEND=database). This module is the in-Python version, run over a
+# minimal two-column projection, and mirrors the SQL definitions:
+#   percentiles  = percentile_cont (linear interpolation)
+#   std_dev      = stddev_pop
+#   histogram    = width_bucket(total, 0, total_marks, bins), clamped into the first/last bin
+
+import math
+
+COMPONENTS = ("written", "mcq", "total")
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Linear-interpolated percentile, same as Postgres percentile_cont(p)."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * p
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def component_stats(values: list) -> dict:
+    values = sorted(values)
+    n = len(values)
+    mean = sum(values) / n
+    variance = sum((v - mean) ** 2 for v in values) / n
+
+    def r(x):
+        return round(x, 2) if x is not None else None
+
+    return {
+        "average": r(mean),
+        "highest": values[-1],
+        "lowest": values[0],
+        "median": r(percentile(values, 0.5)),
+        "std_dev": r(math.sqrt(variance)),
+        "p25": r(percentile(values, 0.25)),
+        "p75": r(percentile(values, 0.75)),
+        "p90": r(percentile(values, 0.90)),
+    }
+
+
+def histogram(totals: list, total_marks: float, bins: int) -> list:
+    if not total_marks or total_marks <= 0:
+        return []
+    counts = [0] * bins
+    for t in totals:
+        bucket = int(t * bins // total_marks)
+        counts[min(max(bucket, 0), bins - 1)] += 1
+    width = total_marks / bins
+    return [
+        {"from": round(i * width, 2), "to": round((i + 1) * width, 2), "count": counts[i]}
+        for i in range(bins)
+    ]
+
+
+def compute_exam_analytics(rows: list, total_marks: float, pass_ratio: float = 0.4, bins: int = 10):
+    """
+    Args:
+        rows: [{"written_marks": .., "mcq_marks": ..}, ...]
+        total_marks: the exam's full marks.
+    Returns:
+        The analytics dict, or None if nobody has a result yet.
+    """
+    if not rows:
+        return None
+
+    written = [float(r.get('written_marks') or 0) for r in rows]
+    mcq = [float(r.get('mcq_marks') or 0) for r in rows]
+    # Calculate total manually to ensure consistency
+    totals = [w + m for w, m in zip(written, mcq)]
+
+    total_marks = float(total_marks or 0)
+    pass_mark = round(total_marks * pass_ratio, 2)
+    pass_count = sum(1 for t in totals if t >= pass_mark)
+
+    return with_summary_fields({
+        "total_students": len(rows),
+        "total_marks": total_marks,
+        "components": {
+            "written": component_stats(written),
+            "mcq": component_stats(mcq),
+            "total": component_stats(totals),
+        },
+        "pass_mark": pass_mark,
+        "pass_count": pass_count,
+        "pass_rate": round(pass_count / len(rows), 4),
+        "histogram": histogram(totals, total_marks, bins),
+    })
+
+
+def with_summary_fields(analytics: dict) -> dict:
+    """Adds the original 'averages' / 'highest' blocks the Exam Details page already reads."""
+    components = analytics["components"]
+    analytics["averages"] = {c: components[c]["average"] for c in COMPONENTS}
+    analytics["highest"] = {c: components[c]["highest"] for c in COMPONENTS}
+    return analytics
@@ -0,0 +1,77 @@
+# ==========================================
+# STREAMING EXPORTERS (CSV / XLSX)
+# ==========================================
+# Turn an ITERATOR of rows into file bytes, a chunk at a time, so a FastAPI
+# StreamingResponse can send the file while the rows are still being fetched.
+# Memory stays flat no matter how many rows the export has.
+#
+#   CSV : rows are written into a small text buffer which is flushed every 'flush_every' rows.
+#   XLSX: an .xlsx file is a ZIP archive, which can't be produced truly "on the wire".
+#         openpyxl's write-only mode keeps only the current row in memory and writes into a
+#         SpooledTemporaryFile (RAM up to a few MB, then disk), which we then stream out.
+
+import csv
+import io
+import tempfile
+
+CSV_MEDIA_TYPE = "text/csv"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def stream_csv(header: list, rows, flush_every: int = 500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # UTF-8 BOM so Excel opens Bangla names correctly
+    buffer.write("\ufeff")
+    writer.writerow(header)
+
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % flush_every == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(header: list, rows, sheet_title: str = "Export", chunk_size: int = 64 * 1024):
+    # Optional dependency: only needed for Excel exports
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise Exception("XLSX export requires the 'openpyxl' package (pip install openpyxl)")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title[:31])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    workbook.save(spool)
+    spool.seek(0)
+
+    def chunks():
+        try:
+            while True:
+                chunk = spool.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            spool.close()
+
+    return chunks()
+
+
+def export_stream(fmt: str, header: list, rows, sheet_title: str = "Export"):
+    """
+    Returns (byte_iterator, media_type, file_extension) for the requested format.
+    """
+    if fmt == "csv":
+        return stream_csv(header, rows), CSV_MEDIA_TYPE, "csv"
+    if fmt == "xlsx":
+        return stream_xlsx(header, rows, sheet_title), XLSX_MEDIA_TYPE, "xlsx"
+    raise Exception("format must be 'csv' or 'xlsx'")
@@ -0,0 +1,64 @@
+# ==========================================
+# FINANCE AGGREGATES (per enrollment)
+# ==========================================
+# '/finance/stats' used to download EVERY payment and EVERY enrollment on each call
+# and add them up again in Python. The numbers only change when a payment lands
+# (or the month rolls over), so we keep running totals in memory instead:
+#
+#   - Per enrollment: lifetime paid, paid per tagged month/year, expected monthly fee.
+#
+# EnrollmentTotals is that per-enrollment record. The dues snapshot
+# (app/services/dues_snapshot.py) keeps one per enrollment, warms them from the database,
+# updates them whenever a payment is inserted, and serves '/finance/stats' from their sums.
+
+from datetime import datetime, date
+
+
+def _parse_date(value):
+    # Supabase returns DATE columns as "YYYY-MM-DD" strings
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], "%Y-%m-%d").date()
+
+
+class EnrollmentTotals:
+    """
+    Running payment totals for ONE enrollment (one student in one program).
+    """
+    def __init__(self, enrollment_id: int, program_id=None, enrollment_date=None):
+        self.enrollment_id = enrollment_id
+        self.program_id = program_id
+        self.start = _parse_date(enrollment_date)
+        # The fee lives on the program. It is unknown (None) until resolved from the DB,
+        # which happens for enrollments created after the last rebuild.
+        self.monthly_fee = None
+        self.lifetime_paid = 0.0
+        # Payments TAGGED for a month (the 'month'/'year' columns), not the day the cash arrived.
+        self.paid_by_month = {}  # {(2024, 5): 1500.0}
+        self.paid_by_year = {}   # {2024: 9000.0}
+
+    def add_payment(self, amount: float, month, year):
+        self.lifetime_paid += amount
+        if month and year:
+            key = (int(year), int(month))
+            self.paid_by_month[key] = self.paid_by_month.get(key, 0.0) + amount
+            self.paid_by_year[int(year)] = self.paid_by_year.get(int(year), 0.0) + amount
+
+    def expected_fee(self, today: date) -> float:
+        """Total fee this student SHOULD have paid from joining up to (and including) this month."""
+        if not self.monthly_fee or not self.start:
+            return 0.0
+        months_passed = (today.year - self.start.year) * 12 + (today.month - self.start.month) + 1
+        return max(0, months_passed) * self.monthly_fee
+
+    def due_total(self, today: date) -> float:
+        # max(0, ...) so an advance payment doesn't show up as negative due
+        return max(0, self.expected_fee(today) - self.lifetime_paid)
+
+    def due_this_month(self, today: date) -> float:
+        if not self.monthly_fee or not self.start or self.start > today:
+            return 0.0
+        paid = self.paid_by_month.get((today.year, today.month), 0.0)
+        return max(0, self.monthly_fee - paid)
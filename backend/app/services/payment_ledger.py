@@ -0,0 +1,106 @@
+# ==========================================
+# MONTH LEDGER ENGINE
+# ==========================================
+# Builds the month-by-month "Paid / Partial / Unpaid" ledger for an enrollment.
+#
+# The old loop re-filtered the WHOLE payment list for every month it visited:
+#     O(months x payments)
+# Here we bucket payments by month ONCE into a dictionary keyed by a "month offset"
+# (year * 12 + month - 1), then walk the month range with O(1) lookups:
+#     O(months + payments)
+#
+# Because the work is now cheap and needs no per-enrollment query, the same function
+# also powers the batch API that returns ledgers for a whole class at once.
+
+from datetime import datetime, date
+
+
+def month_index(year: int, month: int) -> int:
+    # January 2024 -> 24288, February 2024 -> 24289, ... (consecutive months are consecutive ints)
+    return year * 12 + (month - 1)
+
+
+def month_from_index(index: int):
+    year, month0 = divmod(index, 12)
+    return year, month0 + 1
+
+
+def bucket_payments(payments: list) -> dict:
+    """Sums payments by the month they were TAGGED for: {month_index: paid_amount}."""
+    buckets = {}
+    for p in payments:
+        if not p.get('month') or not p.get('year'):
+            continue
+        key = month_index(int(p['year']), int(p['month']))
+        buckets[key] = buckets.get(key, 0) + (p['paid_amount'] or 0)
+    return buckets
+
+
+def build_ledger(enrollment_date, monthly_fee: float, payments: list, today: date = None) -> dict:
+    """
+    Calculates the payment ledger for ONE enrollment.
+
+    Args:
+        enrollment_date: "YYYY-MM-DD" string (or date) the student joined.
+        monthly_fee: the program's monthly fee.
+        payments: rows with month, year, paid_amount.
+
+    Returns:
+        {"total_due", "paid_up_to", "ledger": [...]} - the '/payment-status' response shape.
+    """
+    today = today or date.today()
+    if isinstance(enrollment_date, date):
+        start_date = enrollment_date
+    else:
+        start_date = datetime.strptime(enrollment_date, "%Y-%m-%d").date()
+
+    # 1. Bucket payments once
+    paid_by_month = bucket_payments(payments)
+
+    # 2. Determine the range: from the enrollment month up to the later of
+    #    THIS month or the month AFTER the latest paid month (so advance payments show up).
+    first = month_index(start_date.year, start_date.month)
+    current = month_index(today.year, today.month)
+    last = current
+    if paid_by_month:
+        last = max(last, max(paid_by_month) + 1)
+
+    # 3. Single pass over the month range
+    ledger = []
+    total_due = 0
+    paid_up_to = None
+
+    for idx in range(first, last + 1):
+        year, month = month_from_index(idx)
+        paid_sum = paid_by_month.get(idx, 0)
+
+        is_past_or_present = idx <= current
+
+        if paid_sum >= monthly_fee:
+            status = 'Paid'
+            # "Paid Up To" = latest fully paid month (gaps are not checked)
+            paid_up_to = (year, month)
+        elif paid_sum > 0:
+            status = 'Partial'
+        else:
+            status = 'Unpaid'
+
+        # Only months in the past/present are actually DUE
+        due_for_month = max(0, monthly_fee - paid_sum) if is_past_or_present else 0
+
+        ledger.append({
+            "month": month,
+            "year": year,
+            "fee": monthly_fee,
+            "paid": paid_sum,
+            "due": due_for_month,
+            "status": status,
+            "is_future": not is_past_or_present
+        })
+        total_due += due_for_month
+
+    return {
+        "total_due": total_due,
+        "paid_up_to": date(paid_up_to[0], paid_up_to[1], 1).strftime("%B %Y") if paid_up_to else "None",
+        "ledger": ledger  # Frontend can use this to disable dropdowns
+    }
@@ -0,0 +1,153 @@
+# ==========================================
+# PAYMENT OUTBOX CONSUMER (in-process)
+# ==========================================
+# Every payment insert appends a 'payments.created' event to the payment_event table
+# (trigger in database_setup.sql). OutboxConsumer walks that log from an offset and hands
+# each event to a handler:
+#
+#     consumer = OutboxConsumer("finance_stores")
+#     consumer.seek(head)                                  # start after what we already have
+#     consumer.run_once(event_repo.read, handler)          # periodically (scheduler job)
+#
+# Delivery is at-least-once: the offset only moves past an event AFTER its handler returned.
+# If the handler raises, the run stops and that event is delivered again on the next run,
+# so handlers must tolerate duplicates (see AppliedPayments below).
+#
+# The offset lives in memory, next to the in-memory stores it describes: when the process
+# restarts, the stores are rebuilt from the DB and the consumer starts again from the head.
+# External consumers keep their offsets in the DB instead (PaymentEventRepository.poll/ack).
+#
+# 'read' is any function (after, limit) -> events, so this runs the same against Supabase,
+# the fake backend or a plain list.
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class OutboxConsumer:
+    def __init__(self, name: str, batch_size: int = 200):
+        self.name = name
+        self.batch_size = batch_size
+        # None = not positioned yet; run_once() does nothing until seek() is called
+        self.offset = None
+        self.delivered = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_run = None
+        self._lock = threading.Lock()
+
+    def seek(self, offset: int):
+        """Moves the offset forward to 'offset' (never back)."""
+        with self._lock:
+            self.offset = offset if self.offset is None else max(self.offset, offset)
+
+    def run_once(self, read, handler) -> int:
+        """Delivers every event after the offset, in order. Returns how many were handled."""
+        # One run at a time: two overlapping runs would deliver the same events twice
+        if not self._lock.acquire(blocking=False):
+            return 0
+        handled = 0
+        try:
+            if self.offset is None:
+                return 0
+            self.last_run = datetime.now(timezone.utc)
+            while True:
+                events = read(self.offset, self.batch_size)
+                for event in events:
+                    try:
+                        handler(event)
+                    except Exception as e:
+                        self.failures += 1
+                        self.last_error = f"event {event['event_id']}: {e}"
+                        print(f"Outbox consumer '{self.name}' failed on event {event['event_id']}: {e}")
+                        return handled
+                    self.offset = event['event_id']
+                    self.delivered += 1
+                    handled += 1
+                if len(events) < self.batch_size:
+                    self.last_error = None
+                    return handled
+        finally:
+            self._lock.release()
+
+    def status(self) -> dict:
+        return {
+            "consumer": self.name,
+            "offset": self.offset,
+            "delivered": self.delivered,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+class AppliedPayments:
+    """
+    Remembers which payments this process's stores already contain, so an event is applied
+    to them at most once even though it may be delivered more than once:
+      - the payment_ids loaded by the last full rebuild, for the events that may overlap it
+      - the transaction groups this process inserted itself (applied right after the insert)
+
+    Why ids and not "payment_id <= highest loaded id": payment_ids are assigned at INSERT but
+    transactions commit in any order, so a payment with a LOWER id can commit after the
+    rebuild read higher ones. Its event must still be applied.
+
+    Which events can overlap a rebuild: those committed while its scan ran, i.e. up to the
+    event head read right AFTER the scan ('loaded_until'). Everything before the head read
+    BEFORE the scan is skipped by the consumer's seek; everything after 'loaded_until' was
+    committed after the scan and is applied as is. The id set is dropped as soon as the
+    consumer moves past 'loaded_until', so it is only held for a few seconds (if the head
+    couldn't be read, loaded_until=None, it is kept until the next rebuild replaces it).
+    """
+    def __init__(self, max_groups: int = 10000):
+        self.max_groups = max_groups
+        self._loaded_ids = None
+        self._loaded_until = None
+        self._loaded_generation = 0
+        self._groups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def loaded(self, payments: list, loaded_until: int, generation: int = None):
+        """
+        Call after a full rebuild's scan with the payment rows it loaded. With overlapping
+        rebuilds, a scan older ('generation', see DuesSnapshot.begin_refresh) than the one
+        already recorded is ignored: its rows won't be swapped in either.
+        """
+        with self._lock:
+            if generation is not None:
+                if generation < self._loaded_generation:
+                    return
+                self._loaded_generation = generation
+            self._loaded_ids = {p.get('payment_id') for p in payments}
+            self._loaded_until = loaded_until
+
+    def mark(self, group_id: str):
+        with self._lock:
+            self._groups[group_id] = time.monotonic()
+            self._groups.move_to_end(group_id)
+            while len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+
+    def unseen(self, event: dict) -> list:
+        """The payment rows of 'event' not yet in the stores (marking them as applied)."""
+        group_id = event.get('transaction_group_id')
+        rows = (event.get('payload') or {}).get('payments', [])
+        with self._lock:
+            if group_id is not None and group_id in self._groups:
+                return []
+            if self._loaded_ids is not None:
+                if self._loaded_until is None or event['event_id'] <= self._loaded_until:
+                    rows = [p for p in rows if p.get('payment_id') not in self._loaded_ids]
+                else:
+                    # Past the rebuild: events are delivered in order, nothing later can overlap it
+                    self._loaded_ids = self._loaded_until = None
+        if group_id is not None:
+            self.mark(group_id)
+        return rows
+
+
+# One consumer + bookkeeping per process, feeding dues_snapshot
+finance_events_consumer = OutboxConsumer("finance_stores")
+applied_payments = AppliedPayments()
@@ -0,0 +1,311 @@
+# ==========================================
+# STUDENT PERFORMANCE ENGINE (cross-exam)
+# ==========================================
+# One exam at a time is easy (merit list, analytics). A student's TREND needs every exam
+# of the program: rank in each, percentile, score as a share of the full marks, and a
+# moving average that smooths out one bad day.
+#
+# Per program we materialize, in memory:
+#   - every exam (name, date, total_marks)
+#   - every score: {exam_id: {enrollment_id: written + mcq}}
+#   - who each enrollment is (student_id, name, roll_no)
+#
+# It is loaded with two set-based queries (the program's exams, then all their results),
+# then refreshed INCREMENTALLY: saving results for one exam only replaces that exam's scores
+# and re-ranks that exam. Timelines / leaderboard are derived lazily and cached until the
+# program changes again.
+#
+# Definitions:
+#   rank        = competition rank ("1, 2, 2, 4") by total score, highest first
+#   percentile  = 100 x (1 - PERCENT_RANK()): share of the other candidates ranked below you;
+#                 the topper is 100, the last is 0, a single candidate is 100
+#   normalized  = total score / exam total_marks (0..1, None if total_marks is missing)
+#   moving_avg  = mean of the last 'window' normalized scores (the student's own exams, by date)
+#
+# Like the dues snapshot, each worker process has its own copy; 'max_age_seconds'
+# bounds how long another worker's writes can go unseen.
+
+import threading
+import time
+
+
+def _total(row: dict) -> float:
+    return float(row.get('written_marks') or 0) + float(row.get('mcq_marks') or 0)
+
+
+class ExamScores:
+    """All totals of ONE exam, with a lazily computed ranking."""
+    def __init__(self, exam: dict):
+        self.exam_id = exam['exam_id']
+        self.update_info(exam)
+        self.scores = {}        # enrollment_id -> total score
+        self._ranking = None    # enrollment_id -> (rank, percentile), None = needs re-ranking
+
+    def update_info(self, exam: dict):
+        self.exam_name = exam.get('exam_name')
+        self.exam_date = exam.get('exam_date')
+        self.total_marks = float(exam['total_marks']) if exam.get('total_marks') else None
+
+    def set_scores(self, rows):
+        for row in rows:
+            self.scores[row['enrollment_id']] = _total(row)
+        self._ranking = None
+
+    def ranking(self) -> dict:
+        if self._ranking is None:
+            ordered = sorted(self.scores.items(), key=lambda kv: kv[1], reverse=True)
+            n = len(ordered)
+            ranking = {}
+            rank = 0
+            previous = None
+            for position, (eid, score) in enumerate(ordered, start=1):
+                if score != previous:
+                    rank, previous = position, score
+                percentile = 100.0 if n == 1 else round(100 * (n - rank) / (n - 1), 2)
+                ranking[eid] = (rank, percentile)
+            self._ranking = ranking
+        return self._ranking
+
+    def sort_key(self):
+        # Chronological; exams without a date go last, exam_id breaks ties
+        return (self.exam_date is None, str(self.exam_date or ""), self.exam_id)
+
+
+class ProgramPerformance:
+    """Materialized scores of one program plus derived timelines / leaderboard."""
+    def __init__(self, program_id: int):
+        self.program_id = program_id
+        self.exams = {}        # exam_id -> ExamScores
+        self.students = {}     # enrollment_id -> {"student_id", "name", "roll_no"}
+        self.unresolved = set()  # enrollment_ids with scores but no identity yet (enrolled after the load)
+        self.built_at = None
+        self._derived = {}     # ("timeline", eid, window) / ("leaderboard", window) -> result
+
+    def load(self, exams: list, results: list):
+        for exam in exams:
+            self.exams[exam['exam_id']] = ExamScores(exam)
+        by_exam = {}
+        for row in results:
+            by_exam.setdefault(row['exam_id'], []).append(row)
+            student = (row.get('enrollment') or {}).get('student') or {}
+            if not student and row['enrollment_id'] in self.students:
+                continue
+            self.students[row['enrollment_id']] = {
+                "student_id": student.get('student_id'),
+                "name": student.get('name'),
+                "roll_no": student.get('roll_no'),
+            }
+        for exam_id, rows in by_exam.items():
+            if exam_id in self.exams:
+                self.exams[exam_id].set_scores(rows)
+        self.built_at = time.monotonic()
+
+    def add_students(self, enrollment_ids):
+        for eid in enrollment_ids:
+            if eid not in self.students:
+                self.students[eid] = {"student_id": None, "name": None, "roll_no": None}
+                self.unresolved.add(eid)
+
+    def resolve_students(self, enrollments: list):
+        """enrollments: rows with enrollment_id and student(student_id, name, roll_no)."""
+        for row in enrollments:
+            eid = row['enrollment_id']
+            if eid not in self.unresolved:
+                continue
+            student = row.get('student') or {}
+            self.students[eid] = {
+                "student_id": student.get('student_id'),
+                "name": student.get('name'),
+                "roll_no": student.get('roll_no'),
+            }
+            self.unresolved.discard(eid)
+        self.changed()
+
+    def changed(self):
+        self._derived.clear()
+
+    def _ordered_exams(self) -> list:
+        return sorted(self.exams.values(), key=ExamScores.sort_key)
+
+    def timeline(self, enrollment_id: int, window: int) -> list:
+        key = ("timeline", enrollment_id, window)
+        if key not in self._derived:
+            entries = []
+            recent = []
+            for exam in self._ordered_exams():
+                score = exam.scores.get(enrollment_id)
+                if score is None:
+                    continue  # absent from this exam
+                rank, percentile = exam.ranking()[enrollment_id]
+                normalized = round(score / exam.total_marks, 4) if exam.total_marks else None
+                if normalized is not None:
+                    recent.append(normalized)
+                    recent = recent[-window:]
+                entries.append({
+                    "exam_id": exam.exam_id,
+                    "exam_name": exam.exam_name,
+                    "exam_date": exam.exam_date,
+                    "total_marks": exam.total_marks,
+                    "score": score,
+                    "normalized": normalized,
+                    "rank": rank,
+                    "candidates": len(exam.scores),
+                    "percentile": percentile,
+                    "moving_avg": round(sum(recent) / len(recent), 4) if recent else None,
+                })
+            self._derived[key] = entries
+        return self._derived[key]
+
+    def leaderboard(self, window: int) -> list:
+        key = ("leaderboard", window)
+        if key not in self._derived:
+            enrollment_ids = set()
+            for exam in self.exams.values():
+                enrollment_ids.update(exam.scores)
+
+            rows = []
+            for eid in enrollment_ids:
+                timeline = self.timeline(eid, window)
+                normalized = [e["normalized"] for e in timeline if e["normalized"] is not None]
+                moving = [e["moving_avg"] for e in timeline if e["moving_avg"] is not None]
+                rows.append({
+                    "enrollment_id": eid,
+                    **self.students.get(eid, {"student_id": None, "name": None, "roll_no": None}),
+                    "exams_taken": len(timeline),
+                    "average_normalized": round(sum(normalized) / len(normalized), 4) if normalized else None,
+                    "average_percentile": round(sum(e["percentile"] for e in timeline) / len(timeline), 2),
+                    "best_rank": min(e["rank"] for e in timeline),
+                    "latest_rank": timeline[-1]["rank"],
+                    "moving_avg": moving[-1] if moving else None,
+                    # Positive = improving compared to the previous exam's moving average
+                    "trend": round(moving[-1] - moving[-2], 4) if len(moving) >= 2 else None,
+                })
+
+            rows.sort(key=lambda r: (r["average_normalized"] is None, -(r["average_normalized"] or 0), r["enrollment_id"]))
+            for position, row in enumerate(rows, start=1):
+                row["overall_rank"] = position
+            self._derived[key] = rows
+        return self._derived[key]
+
+
+class PerformanceStore:
+    """
+    Thread-safe cache of ProgramPerformance objects.
+
+    Lifecycle (per program):
+        1. begin_load(program_id) / finish_load(program_id, exams, results): full load from the DB
+           (abort_load(program_id) if the load failed).
+        2. apply_results(exam, rows): called after results are saved for an exam.
+           Students enrolled after the load are added without a name; the repository resolves
+           them on the next read (unresolved_enrollment_ids / resolve_students).
+        3. remove_exam(exam_id): called after an exam is deleted.
+    """
+    def __init__(self, max_age_seconds: int = 600):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._programs = {}
+        # program_id -> [(exam, rows), ...] saved while that program is being loaded.
+        # Setting a score is idempotent, so everything is simply replayed on top of the load.
+        self._replay = {}
+        # program_id -> number of loads in flight. Two requests can load the same program at
+        # once; the replay list is only reset when the first starts and dropped when the last
+        # ends, so a save during either load is replayed onto both.
+        self._loading = {}
+
+    def is_stale(self, program_id: int) -> bool:
+        with self._lock:
+            program = self._programs.get(program_id)
+            if program is None:
+                return True
+            return (time.monotonic() - program.built_at) > self.max_age_seconds
+
+    def invalidate(self, program_id: int = None):
+        with self._lock:
+            if program_id is None:
+                self._programs.clear()
+            else:
+                self._programs.pop(program_id, None)
+
+    def begin_load(self, program_id: int):
+        with self._lock:
+            if not self._loading.get(program_id):
+                self._replay[program_id] = []
+            self._loading[program_id] = self._loading.get(program_id, 0) + 1
+
+    def _end_load(self, program_id: int) -> list:
+        remaining = self._loading.get(program_id, 1) - 1
+        if remaining > 0:
+            self._loading[program_id] = remaining
+            return list(self._replay.get(program_id, []))
+        self._loading.pop(program_id, None)
+        return self._replay.pop(program_id, None) or []
+
+    def finish_load(self, program_id: int, exams: list, results: list):
+        fresh = ProgramPerformance(program_id)
+        fresh.load(exams, results)
+        with self._lock:
+            for exam, rows in self._end_load(program_id):
+                self._apply(fresh, exam, rows)
+            self._programs[program_id] = fresh
+
+    def abort_load(self, program_id: int):
+        with self._lock:
+            self._end_load(program_id)
+
+    def _apply(self, program: ProgramPerformance, exam: dict, rows: list):
+        scores = program.exams.get(exam['exam_id'])
+        if scores is None:
+            scores = program.exams[exam['exam_id']] = ExamScores(exam)
+        else:
+            scores.update_info(exam)
+        program.add_students(r['enrollment_id'] for r in rows)
+        scores.set_scores(rows)
+        program.changed()
+
+    def apply_results(self, exam: dict, rows: list):
+        """
+        Incremental refresh after results were saved.
+
+        Args:
+            exam: the exam row (exam_id, program_id, exam_name, exam_date, total_marks).
+            rows: the saved rows (enrollment_id, written_marks, mcq_marks).
+        """
+        program_id = exam.get('program_id')
+        with self._lock:
+            if program_id in self._replay:
+                self._replay[program_id].append((exam, rows))
+            program = self._programs.get(program_id)
+            if program is None:
+                return  # not loaded yet, the first read loads it from the DB
+            self._apply(program, exam, rows)
+
+    def unresolved_enrollment_ids(self, program_id: int) -> list:
+        with self._lock:
+            program = self._programs.get(program_id)
+            return sorted(program.unresolved) if program else []
+
+    def resolve_students(self, program_id: int, enrollments: list):
+        with self._lock:
+            program = self._programs.get(program_id)
+            if program is not None:
+                program.resolve_students(enrollments)
+
+    def remove_exam(self, exam_id: int):
+        with self._lock:
+            for program in self._programs.values():
+                if program.exams.pop(exam_id, None) is not None:
+                    program.changed()
+
+    def program_leaderboard(self, program_id: int, window: int = 3) -> list:
+        with self._lock:
+            program = self._programs.get(program_id)
+            return program.leaderboard(window) if program else []
+
+    def student_timeline(self, program_id: int, enrollment_id: int, window: int = 3) -> list:
+        with self._lock:
+            program = self._programs.get(program_id)
+            return program.timeline(enrollment_id, window) if program else []
+
+
+# One shared store per process
+performance_store = PerformanceStore()
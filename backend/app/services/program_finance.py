@@ -0,0 +1,52 @@
+# ==========================================
+# GROUPED FINANCE REPORT (per Program / per Batch)
+# ==========================================
+# The old report looped over every program, built a LIST of its enrollment IDs and then
+# checked 'enrollment_id in that_list' for EVERY payment:
+#     O(programs x payments x enrollments_per_program)
+#
+# The per-program sums now come from the dues snapshot (app/services/dues_snapshot.py), which
+# keeps them per enrollment. This module only shapes them into the report rows:
+#     program_id -> one row per program
+#     batch_id   -> rolled-up totals (one pass over programs)
+
+def shape_program_finance(programs: list, revenue_overall: dict, revenue_month: dict, students_per_program: dict):
+    """
+    Final shaping: one row per program, rolled up into their batch.
+
+    Returns:
+        (program_stats, batch_stats) - two lists of dicts.
+        program_stats keeps the exact shape '/finance/programs' has always returned.
+    """
+    program_stats = []
+    batches = {}
+    for prog in programs:
+        pid = prog['program_id']
+        batch = prog.get('batch') or {}
+        stat = {
+            "program_id": pid,
+            "program_name": f"{prog['program_name']} ({batch.get('batch_name')})",
+            "total_revenue": revenue_overall.get(pid, 0),
+            "revenue_this_month": revenue_month.get(pid, 0),
+            "active_students": students_per_program.get(pid, 0)
+        }
+        program_stats.append(stat)
+
+        batch_id = prog.get('batch_id')
+        rollup = batches.get(batch_id)
+        if rollup is None:
+            rollup = {
+                "batch_id": batch_id,
+                "batch_name": batch.get('batch_name'),
+                "program_count": 0,
+                "total_revenue": 0,
+                "revenue_this_month": 0,
+                "active_students": 0
+            }
+            batches[batch_id] = rollup
+        rollup["program_count"] += 1
+        rollup["total_revenue"] += stat["total_revenue"]
+        rollup["revenue_this_month"] += stat["revenue_this_month"]
+        rollup["active_students"] += stat["active_students"]
+
+    return program_stats, list(batches.values())
@@ -0,0 +1,122 @@
+# ==========================================
+# RESULT IMPORT (CSV / XLSX parsing)
+# ==========================================
+# Reads an uploaded marks sheet ROW BY ROW (a generator), so a big file is never loaded
+# into memory as a whole, and validates each row on its own: one bad row is reported
+# instead of failing the entire upload.
+#
+# Expected columns (header names are case/space-insensitive):
+#     student_id | written_marks (or "written") | mcq_marks (or "mcq")
+
+import csv
+import io
+import math
+
+# Accepted header spellings -> our field names
+HEADER_ALIASES = {
+    "student_id": "student_id",
+    "studentid": "student_id",
+    "id": "student_id",
+    "written_marks": "written_marks",
+    "written": "written_marks",
+    "mcq_marks": "mcq_marks",
+    "mcq": "mcq_marks",
+}
+
+# The mark columns are DECIMAL(5,2): anything above this can't be stored
+MAX_MARK_VALUE = 999.99
+
+
+def _normalize_header(value) -> str:
+    key = str(value or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return HEADER_ALIASES.get(key, key)
+
+
+def iter_csv_rows(binary_file):
+    """Yields (row_number, {column: value}) from a CSV file object opened in binary mode."""
+    # utf-8-sig swallows the BOM Excel puts at the start of "CSV UTF-8" files
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        return
+    columns = [_normalize_header(h) for h in header]
+    # Row 1 is the header, so data starts at row 2 (matches what the user sees in Excel)
+    for row_number, values in enumerate(reader, start=2):
+        if not any(v.strip() for v in values):
+            continue
+        yield row_number, dict(zip(columns, values))
+
+
+def iter_xlsx_rows(binary_file):
+    """Yields (row_number, {column: value}) from the first sheet of an .xlsx file."""
+    # Optional dependency: only needed for Excel uploads
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise Exception("XLSX import requires the 'openpyxl' package (pip install openpyxl)")
+
+    # read_only=True streams rows from the file instead of building the whole workbook
+    workbook = load_workbook(binary_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        columns = [_normalize_header(h) for h in header]
+        for row_number, values in enumerate(rows, start=2):
+            if all(v is None or str(v).strip() == "" for v in values):
+                continue
+            yield row_number, dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def iter_upload_rows(binary_file, filename: str):
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        return iter_xlsx_rows(binary_file)
+    if name.endswith(".csv"):
+        return iter_csv_rows(binary_file)
+    raise Exception("Only .csv and .xlsx files are supported")
+
+
+def _to_number(value, field: str, required: bool):
+    if value is None or str(value).strip() == "":
+        if required:
+            raise ValueError(f"{field} is missing")
+        return 0.0
+    try:
+        number = float(str(value).strip())
+    except (ValueError, OverflowError):
+        raise ValueError(f"{field} is not a number: {value!r}")
+    # float() happily parses "nan", "inf" and "1e400"; none of them is a usable value
+    if not math.isfinite(number):
+        raise ValueError(f"{field} is not a number: {value!r}")
+    return number
+
+
+def validate_row(raw: dict, total_marks=None):
+    """
+    Checks one parsed row. With 'total_marks' (the exam's), written + mcq may not exceed it.
+
+    Returns:
+        (item, None) for a valid row, where item = {"student_id", "written_marks", "mcq_marks"}
+        (None, "reason") for an invalid one.
+    """
+    try:
+        student_id = _to_number(raw.get("student_id"), "student_id", required=True)
+        if student_id != int(student_id) or student_id <= 0:
+            raise ValueError(f"student_id must be a positive whole number: {raw.get('student_id')!r}")
+        written = _to_number(raw.get("written_marks"), "written_marks", required=False)
+        mcq = _to_number(raw.get("mcq_marks"), "mcq_marks", required=False)
+        if written < 0 or mcq < 0:
+            raise ValueError("marks cannot be negative")
+        if written > MAX_MARK_VALUE or mcq > MAX_MARK_VALUE:
+            raise ValueError(f"marks cannot be more than {MAX_MARK_VALUE}")
+        if total_marks and written + mcq > float(total_marks):
+            raise ValueError(f"written + mcq ({written + mcq:g}) is more than the exam's total marks ({total_marks})")
+    except (ValueError, OverflowError) as e:
+        return None, str(e)
+
+    return {"student_id": int(student_id), "written_marks": written, "mcq_marks": mcq}, None
@@ -0,0 +1,207 @@
+# ==========================================
+# STUDENT SEARCH INDEX (in-process)
+# ==========================================
+# Front-desk lookups: partial name, father's name, roll number or phone number.
+#
+# How it works:
+#   - Names are split into "trigrams" (3-letter chunks), the same idea as Postgres' pg_trgm:
+#       "rahim" -> "  r", " ra", "rah", "ahi", "him", "im "
+#     For every trigram we keep a "postings list" of the students whose name contains it.
+#   - A query is split the same way. Students sharing many trigrams with the query are
+#     candidates; we then score only those candidates (never the whole table).
+#   - Roll numbers use an exact-match dictionary, phone numbers a sorted list for prefix search.
+#
+# Ranking (highest first):
+#     exact roll no  >  phone prefix  >  name prefix  >  trigram similarity (name, then father's name)
+#
+# The index is warmed from the DB on first use and kept in sync by StudentRepository
+# (enroll_new_student / update_student). Like the dues snapshot, each worker process
+# has its own copy, so it is rebuilt after 'max_age_seconds' to pick up other workers' writes.
+
+import bisect
+import re
+import threading
+import time
+
+_NON_ALNUM = re.compile(r"[^0-9a-z ]+")
+
+# Fields kept per student (what the search endpoint returns)
+RESULT_FIELDS = ("student_id", "name", "fathers_name", "roll_no", "contact", "school", "class")
+
+
+def normalize(text) -> str:
+    if not text:
+        return ""
+    return " ".join(_NON_ALNUM.sub(" ", str(text).lower()).split())
+
+
+def trigrams(text: str, partial_last_word: bool = False) -> set:
+    """
+    pg_trgm style trigrams: every word is padded with two spaces in front and one behind.
+    For queries the last word may be half-typed ("rah" for "rahim"), so we don't pad its end.
+    """
+    grams = set()
+    words = text.split()
+    for i, word in enumerate(words):
+        padded = "  " + word
+        if not (partial_last_word and i == len(words) - 1):
+            padded += " "
+        for j in range(len(padded) - 2):
+            grams.add(padded[j:j + 3])
+    return grams
+
+
+def similarity(query_grams: set, text: str) -> float:
+    if not query_grams or not text:
+        return 0.0
+    grams = trigrams(text)
+    shared = len(query_grams & grams)
+    # Share of the QUERY found in the text: a short query fully inside a long name scores 1.0
+    return shared / len(query_grams)
+
+
+def _digits(text) -> str:
+    return re.sub(r"\D", "", str(text or ""))
+
+
+class StudentSearchIndex:
+    def __init__(self, max_age_seconds: int = 600, candidate_limit: int = 300):
+        self.max_age_seconds = max_age_seconds
+        self.candidate_limit = candidate_limit
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._docs = {}          # student_id -> tuple of RESULT_FIELDS values
+        self._norm = {}          # student_id -> (normalized name, normalized father's name)
+        self._postings = {}      # trigram -> [student_id, ...]
+        self._by_roll = {}       # roll_no -> {student_id, ...}
+        self._contacts = []      # sorted [(digits, student_id), ...]
+        self._built_at = None
+
+    # ------------------------------------------
+    # Building / syncing
+    # ------------------------------------------
+    def is_stale(self) -> bool:
+        with self._lock:
+            return self._built_at is None or (time.monotonic() - self._built_at) > self.max_age_seconds
+
+    def rebuild(self, students):
+        with self._lock:
+            self._clear()
+            for s in students:
+                self._add(s, keep_sorted=False)
+            self._contacts.sort()
+            self._built_at = time.monotonic()
+
+    def _add(self, student: dict, keep_sorted: bool = True):
+        sid = student['student_id']
+        self._docs[sid] = tuple(student.get(f) for f in RESULT_FIELDS)
+        name, fathers = normalize(student.get('name')), normalize(student.get('fathers_name'))
+        self._norm[sid] = (name, fathers)
+        for gram in trigrams(name) | trigrams(fathers):
+            self._postings.setdefault(gram, []).append(sid)
+        if student.get('roll_no') is not None:
+            self._by_roll.setdefault(int(student['roll_no']), set()).add(sid)
+        digits = _digits(student.get('contact'))
+        if digits:
+            if keep_sorted:
+                bisect.insort(self._contacts, (digits, sid))
+            else:
+                self._contacts.append((digits, sid))
+
+    def _remove(self, sid):
+        doc = self._docs.pop(sid, None)
+        if doc is None:
+            return
+        name, fathers = self._norm.pop(sid)
+        for gram in trigrams(name) | trigrams(fathers):
+            posting = self._postings.get(gram)
+            if posting:
+                posting.remove(sid)
+        row = dict(zip(RESULT_FIELDS, doc))
+        if row['roll_no'] is not None:
+            self._by_roll.get(int(row['roll_no']), set()).discard(sid)
+        digits = _digits(row['contact'])
+        if digits:
+            i = bisect.bisect_left(self._contacts, (digits, sid))
+            if i < len(self._contacts) and self._contacts[i] == (digits, sid):
+                self._contacts.pop(i)
+
+    def upsert(self, student: dict):
+        """Adds a new student or re-indexes an updated one (partial updates are merged)."""
+        with self._lock:
+            if self._built_at is None:
+                return  # not warmed yet, the first search loads everything from the DB
+            sid = student['student_id']
+            existing = self._docs.get(sid)
+            merged = dict(zip(RESULT_FIELDS, existing)) if existing else {}
+            merged.update({k: v for k, v in student.items() if k in RESULT_FIELDS})
+            self._remove(sid)
+            self._add(merged)
+
+    # ------------------------------------------
+    # Searching
+    # ------------------------------------------
+    def search(self, q: str, limit: int = 20) -> list:
+        query = normalize(q)
+        if not query:
+            return []
+        digits = query.replace(" ", "") if query.replace(" ", "").isdigit() else None
+
+        with self._lock:
+            scores = {}
+
+            if digits:
+                # Exact roll number
+                for sid in self._by_roll.get(int(digits), ()):
+                    scores[sid] = 3.0
+                # Phone number prefix
+                if len(digits) >= 3:
+                    i = bisect.bisect_left(self._contacts, (digits,))
+                    while i < len(self._contacts) and self._contacts[i][0].startswith(digits):
+                        sid = self._contacts[i][1]
+                        scores[sid] = max(scores.get(sid, 0), 2.0)
+                        i += 1
+                        if len(scores) >= self.candidate_limit:
+                            break
+
+            query_grams = trigrams(query, partial_last_word=True)
+            if query_grams and not digits:
+                # Candidate generation: count shared trigrams, starting from the RAREST ones.
+                # Very common trigrams (e.g. "  a") would touch a large part of the table,
+                # so they're skipped once rarer ones have produced enough candidates.
+                grams = sorted(query_grams, key=lambda g: len(self._postings.get(g, ())))
+                hits = {}
+                for gram in grams:
+                    posting = self._postings.get(gram)
+                    if not posting:
+                        continue
+                    if len(hits) >= self.candidate_limit and len(posting) > self.candidate_limit:
+                        break
+                    for sid in posting:
+                        hits[sid] = hits.get(sid, 0) + 1
+
+                # Keep the best candidates by raw overlap, then score them properly
+                if len(hits) > self.candidate_limit:
+                    best = sorted(hits, key=hits.get, reverse=True)[:self.candidate_limit]
+                else:
+                    best = hits
+
+                for sid in best:
+                    name, fathers = self._norm[sid]
+                    score = max(similarity(query_grams, name), 0.6 * similarity(query_grams, fathers))
+                    if name.startswith(query):
+                        score += 1.0
+                    if score >= 0.3:
+                        scores[sid] = max(scores.get(sid, 0), score)
+
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self._norm[kv[0]][0]))[:limit]
+            return [
+                {**dict(zip(RESULT_FIELDS, self._docs[sid])), "score": round(score, 3)}
+                for sid, score in ranked
+            ]
+
+
+# One shared index per process
+student_search_index = StudentSearchIndex()
@@ -0,0 +1,92 @@
+# ==========================================
+# BENCHMARK: compact attendance store vs list of dicts
+# ==========================================
+# Run from the 'backend' folder:
+#     python -m benchmarks.bench_attendance_memory                (10k enrollments x 300 days)
+#     python -m benchmarks.bench_attendance_memory 20000 300
+#
+# Measures (with tracemalloc) the memory held by:
+#   1. the rows as Supabase returns them: a list of {"attendance_id", "enrollment_id", "date", "status"}
+#   2. the same attendance in AttendanceStore (2-bit codes per day, __slots__ records)
+# and times the reads the store answers: a daily sheet and a full-range summary for one program.
+
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from app.services.attendance_analytics import build_month_bitmap, months_between, summarize_range
+from app.services.attendance_store import AttendanceStore
+
+STATUSES = ["Present"] * 16 + ["Absent"] * 2 + ["Late", "Excused"]
+ENROLLMENTS_PER_PROGRAM = 500
+
+
+def make_data(n_enrollments: int, n_days: int, seed: int = 7):
+    rng = random.Random(seed)
+    enrollments = [{
+        "enrollment_id": eid,
+        "program_id": (eid - 1) // ENROLLMENTS_PER_PROGRAM + 1,
+        "student": {"student_id": eid, "name": f"Student {eid}", "roll_no": eid},
+    } for eid in range(1, n_enrollments + 1)]
+
+    days = [date(2024, 1, 1) + timedelta(days=i) for i in range(n_days)]
+    day_strings = [d.isoformat() for d in days]
+    rows = []
+    attendance_id = 0
+    for eid in range(1, n_enrollments + 1):
+        for d in day_strings:
+            attendance_id += 1
+            rows.append({"attendance_id": attendance_id, "enrollment_id": eid, "date": d,
+                         "status": rng.choice(STATUSES)})
+    return enrollments, rows, days
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def main(n_enrollments: int, n_days: int):
+    print(f"{n_enrollments:,} enrollments x {n_days} days = {n_enrollments * n_days:,} attendance rows")
+
+    # 1. List of dicts (what every read re-fetches today)
+    (enrollments, rows, days), dict_bytes = measure(lambda: make_data(n_enrollments, n_days))
+
+    # 2. Compact store
+    store = AttendanceStore()
+    _, store_bytes = measure(lambda: store.rebuild(enrollments, rows))
+    # Timed again without tracemalloc, which slows allocation-heavy code down a lot
+    started = time.perf_counter()
+    store.rebuild(enrollments, rows)
+    load_seconds = time.perf_counter() - started
+
+    print(f"list of dicts : {dict_bytes / 1024 / 1024:8.1f} MB")
+    print(f"compact store : {store_bytes / 1024 / 1024:8.1f} MB  ({dict_bytes / max(store_bytes, 1):.0f}x smaller, "
+          f"loaded in {load_seconds:.1f}s)")
+
+    # Correctness: the store's month bitmap equals the one built from raw rows
+    program_rows = [r for r in rows if r["enrollment_id"] <= ENROLLMENTS_PER_PROGRAM]
+    first = days[0]
+    month_rows = [r for r in program_rows if r["date"].startswith(first.strftime("%Y-%m"))]
+    assert store.month_bitmap(1, first.year, first.month) == build_month_bitmap(month_rows)
+
+    # Timings for one program
+    started = time.perf_counter()
+    store.daily(1, days[len(days) // 2].isoformat())
+    print(f"daily sheet ({ENROLLMENTS_PER_PROGRAM} students) : {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    started = time.perf_counter()
+    months = {ym: store.month_bitmap(1, *ym) for ym in months_between(days[0], days[-1])}
+    summarize_range(months, days[0], days[-1], store.roster(1))
+    print(f"full-range summary ({len(months)} months)     : {(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 10_000, args[1] if len(args) > 1 else 300)
@@ -0,0 +1,102 @@
+# ==========================================
+# BENCHMARK: defaulter list on the dues snapshot
+# ==========================================
+# Run from the 'backend' folder:
+#     python -m benchmarks.bench_defaulters                  (~50k enrollments)
+#     python -m benchmarks.bench_defaulters 60000            (students, ~1.8 enrollments each)
+#
+# Builds the dues snapshot from a synthetic tuition center (benchmarks/synthetic_data.py,
+# no database needed) and times the '/finance/defaulters' work:
+#   1. loading the snapshot (what the background refresh job does)
+#   2. the first page, unfiltered (rank + bucket every enrollment)
+#   3. one batch, one program, one aging bucket
+#   4. a page deep into the list (keyset cursor)
+# The old way, one build_ledger() per enrollment like '/payment-status', is timed for comparison.
+
+import sys
+import time
+from datetime import date
+
+from app.services.dues_snapshot import DuesSnapshot
+from app.services.payment_ledger import build_ledger
+from benchmarks.synthetic_data import generate
+
+REPEATS = 5
+TARGET_MS = 1000
+
+
+def timed(fn, repeats: int = REPEATS):
+    best, result = None, None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def make_snapshot_rows(students: int):
+    data = generate(batches=10, programs_per_batch=6, students=students, years=3,
+                    exams_per_program=0, attendance_days=0)
+    programs = {p["program_id"]: p for p in data["program"]}
+    people = {s["student_id"]: s for s in data["student"]}
+    # Same shape as the '_finance_queries' enrollment rows
+    enrollments = [{
+        **e,
+        "program": {k: programs[e["program_id"]][k] for k in ("monthly_fee", "program_name", "batch_id")},
+        "student": {k: people[e["student_id"]][k] for k in ("student_id", "name", "roll_no")},
+    } for e in data["enrollment"]]
+    return enrollments, data["payment"]
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 28000
+    today = date.today()
+
+    enrollments, payments = make_snapshot_rows(students)
+    print(f"{len(enrollments):,} enrollments, {len(payments):,} payments\n")
+
+    snapshot = DuesSnapshot()
+    load_ms, _ = timed(lambda: (snapshot.begin_refresh(), snapshot.finish_refresh(enrollments, payments, today)),
+                       repeats=1)
+
+    first_ms, first = timed(lambda: snapshot.defaulters(limit=50))
+    batch_ms, _ = timed(lambda: snapshot.defaulters(batch_id=1, limit=50))
+    program_ms, _ = timed(lambda: snapshot.defaulters(program_id=1, limit=50))
+    bucket_ms, _ = timed(lambda: snapshot.defaulters(bucket="90+", limit=50))
+
+    # Walk ~half the list, then time the next page from there
+    cursor = first["next_cursor"]
+    for _ in range(first["total"] // 100):
+        cursor = snapshot.defaulters(limit=50, cursor=cursor)["next_cursor"]
+    deep_ms, _ = timed(lambda: snapshot.defaulters(limit=50, cursor=cursor))
+
+    # The old way: a ledger per enrollment (timed on a sample, scaled up)
+    sample = enrollments[:5000]
+    by_enrollment = {}
+    for p in payments:
+        by_enrollment.setdefault(p["enrollment_id"], []).append(p)
+    sample_ms, _ = timed(lambda: [build_ledger(e["enrollment_date"], e["program"]["monthly_fee"],
+                                               by_enrollment.get(e["enrollment_id"], []), today)
+                                  for e in sample], repeats=1)
+    ledgers_ms = sample_ms * len(enrollments) / len(sample)
+
+    summary = first["summary"]
+    print(f"{summary['defaulters']:,} defaulters owing {summary['total_due']:,.0f}")
+    for label, b in summary["buckets"].items():
+        print(f"  {label:>6} days: {b['count']:>6,}  {b['amount']:>14,.0f}")
+    print()
+    print(f"{'snapshot load (background job)':<40} {load_ms:>9.1f} ms")
+    print(f"{'first page, all enrollments':<40} {first_ms:>9.1f} ms")
+    print(f"{'first page, one batch':<40} {batch_ms:>9.1f} ms")
+    print(f"{'first page, one program':<40} {program_ms:>9.1f} ms")
+    print(f"{'first page, 90+ days bucket':<40} {bucket_ms:>9.1f} ms")
+    print(f"{'page in the middle (cursor)':<40} {deep_ms:>9.1f} ms")
+    print(f"{'one ledger per enrollment (estimated)':<40} {ledgers_ms:>9.1f} ms")
+
+    slowest = max(first_ms, batch_ms, program_ms, bucket_ms, deep_ms)
+    print(f"\nslowest query {slowest:.1f} ms - {'OK' if slowest < TARGET_MS else 'OVER'} (target < {TARGET_MS} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# ==========================================
+# END-TO-END BENCHMARK SUITE
+# ==========================================
+# Run from the 'backend' folder:
+#     python -m benchmarks.bench_e2e                                  (small dataset, 200 requests per route)
+#     python -m benchmarks.bench_e2e --scale medium --requests 500 --concurrency 20 --latency-ms 15
+#     python -m benchmarks.bench_e2e --compare benchmarks/results/e2e-small-20250301-101500.json
+#     python -m benchmarks.bench_e2e --only finance --only attendance
+#
+# What it does:
+#   1. Generates a synthetic tuition center (benchmarks/synthetic_data.py) and loads it into the
+#      in-memory fake Supabase (SUPABASE_BACKEND=fake, app/core/fake_supabase.py). Each query
+#      can be given a simulated network latency with --latency-ms.
+#   2. Drives the REAL FastAPI app in-process (httpx + ASGI transport, middleware included)
+#      through every main route, --concurrency requests in flight at a time.
+#   3. Reports per route: p50 / p95 / p99 latency, throughput, DB calls per request (read from
+#      the Server-Timing header the instrumentation middleware adds) and peak Python memory
+#      allocated while serving (a separate short tracemalloc pass, so it doesn't skew timings).
+#   4. Saves everything to benchmarks/results/e2e-<scale>-<timestamp>.json. With --compare, routes
+#      whose p95 or DB calls got worse than the older run by more than --threshold are flagged
+#      and the exit code is 1 (usable in CI).
+#
+# Write routes (/payments/bulk, /attendance/bulk, /results/bulk) really write to the fake
+# database, so run the suite on a fresh process each time (it always is: data is regenerated).
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from benchmarks.synthetic_data import SCALES, describe, generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+_DB_CALLS = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries')
+MEMORY_PASS_REQUESTS = 20
+# p95 changes smaller than this are noise, whatever the percentage
+NOISE_FLOOR_MS = 1.0
+
+
+# ------------------------------------------
+# Scenarios
+# ------------------------------------------
+class Scenario:
+    """One route: 'make()' returns (method, url, json_body) for the next request."""
+    def __init__(self, name: str, group: str, make):
+        self.name = name
+        self.group = group
+        self.make = make
+
+
+def build_scenarios(data: dict, rng: random.Random) -> list:
+    today = date.today()
+    programs = [p["program_id"] for p in data["program"]]
+    exams = [e["exam_id"] for e in data["exam"]]
+    students = [s["student_id"] for s in data["student"]]
+    enrollments = data["enrollment"]
+    by_program = {}
+    for e in enrollments:
+        by_program.setdefault(e["program_id"], []).append(e)
+    exam_program = {e["exam_id"]: e["program_id"] for e in data["exam"]}
+    attendance_days = sorted({a["date"] for a in data["attendance"]}) or [today.isoformat()]
+    names = [s["name"].split()[0] for s in data["student"][:200]]
+
+    def get(url_fn):
+        return lambda: ("GET", url_fn(), None)
+
+    def bulk_payment():
+        e = rng.choice(enrollments)
+        year = today.year + 1
+        return "POST", "/payments/bulk", [{
+            "student_id": e["student_id"], "program_id": e["program_id"], "paid_amount": 1500,
+            "payment_date": today.isoformat(), "month": m, "year": year, "payment_method": "Cash",
+        } for m in range(1, rng.randint(2, 4))]
+
+    def bulk_attendance():
+        pid = rng.choice(programs)
+        day = (today - timedelta(days=rng.randint(0, 30))).isoformat()
+        return "POST", "/attendance/bulk", {
+            "program_id": pid, "date": day,
+            "records": [{"enrollment_id": e["enrollment_id"], "status": rng.choice(["Present", "Present", "Absent"]),
+                         "date": day} for e in by_program.get(pid, [])],
+        }
+
+    def bulk_results():
+        eid = rng.choice(exams)
+        return "POST", "/results/bulk", {
+            "exam_id": eid,
+            "results": [{"student_id": e["student_id"], "written_marks": rng.randint(10, 60),
+                         "mcq_marks": rng.randint(5, 30)} for e in by_program.get(exam_program[eid], [])],
+        }
+
+    window_start = attendance_days[0]
+    window_end = attendance_days[-1]
+
+    return [
+        # Finance dashboard
+        Scenario("GET /finance/stats", "finance", get(lambda: "/finance/stats")),
+        Scenario("GET /finance/programs", "finance", get(lambda: "/finance/programs")),
+        Scenario("GET /finance/batches", "finance", get(lambda: "/finance/batches")),
+        Scenario("GET /payments/recent", "finance", get(lambda: "/payments/recent")),
+        Scenario("GET /programs/{id}/payment-status", "finance",
+                 get(lambda: f"/programs/{rng.choice(programs)}/payment-status")),
+        Scenario("GET /enrollments/{id}/payment-status", "finance",
+                 get(lambda: f"/enrollments/{rng.choice(enrollments)['enrollment_id']}/payment-status")),
+        Scenario("GET /students/{id}/payments", "finance",
+                 get(lambda: f"/students/{rng.choice(students)}/payments")),
+        # Programs & students
+        Scenario("GET /programs", "programs", get(lambda: "/programs")),
+        Scenario("GET /programs/{id}", "programs",
+                 get(lambda: f"/programs/{rng.choice(programs)}?include=enrollments,payments,exams,teachers")),
+        Scenario("GET /programs/{id}/enrollments", "programs",
+                 get(lambda: f"/programs/{rng.choice(programs)}/enrollments?limit=50")),
+        Scenario("GET /students/search", "programs", get(lambda: f"/students/search?q={rng.choice(names)}")),
+        Scenario("GET /students/{id}", "programs", get(lambda: f"/students/{rng.choice(students)}")),
+        # Exams
+        Scenario("GET /exams/{id}/results", "exams", get(lambda: f"/exams/{rng.choice(exams)}/results")),
+        Scenario("GET /exams/{id}/analytics", "exams", get(lambda: f"/exams/{rng.choice(exams)}/analytics")),
+        Scenario("GET /exams/{id}/candidates", "exams", get(lambda: f"/exams/{rng.choice(exams)}/candidates")),
+        Scenario("GET /programs/{id}/performance", "exams",
+                 get(lambda: f"/programs/{rng.choice(programs)}/performance")),
+        # Attendance
+        Scenario("GET /programs/{id}/attendance", "attendance",
+                 get(lambda: f"/programs/{rng.choice(programs)}/attendance?date={rng.choice(attendance_days)}")),
+        Scenario("GET /programs/{id}/attendance/summary", "attendance",
+                 get(lambda: f"/programs/{rng.choice(programs)}/attendance/summary?start={window_start}&end={window_end}")),
+        Scenario("GET /programs/{id}/attendance/streaks", "attendance",
+                 get(lambda: f"/programs/{rng.choice(programs)}/attendance/streaks?start={window_start}&end={window_end}")),
+        # Writes (last, so the read numbers above are taken on the generated data)
+        Scenario("POST /payments/bulk", "writes", bulk_payment),
+        Scenario("POST /attendance/bulk", "writes", bulk_attendance),
+        Scenario("POST /results/bulk", "writes", bulk_results),
+    ]
+
+
+# ------------------------------------------
+# Driving the app
+# ------------------------------------------
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, scenario: Scenario, n_requests: int, concurrency: int, warmup: int) -> dict:
+    # Warm-up fills the in-process caches/stores, like a server that has been up for a while
+    for _ in range(warmup):
+        method, url, body = scenario.make()
+        await client.request(method, url, json=body)
+
+    latencies, db_calls = [], []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        method, url, body = scenario.make()
+        async with sem:
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+        match = _DB_CALLS.search(response.headers.get("server-timing", ""))
+        if match:
+            db_calls.append(int(match.group(1)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_requests)))
+    elapsed = time.perf_counter() - started
+
+    # Memory pass: a few sequential requests under tracemalloc
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for _ in range(min(MEMORY_PASS_REQUESTS, n_requests)):
+        method, url, body = scenario.make()
+        await client.request(method, url, json=body)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "group": scenario.group,
+        "requests": n_requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "throughput_rps": round(n_requests / elapsed, 1),
+        "db_calls_per_request": round(sum(db_calls) / len(db_calls), 2) if db_calls else None,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+async def run_suite(app, scenarios: list, args) -> dict:
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    # The lifespan (startup/shutdown) isn't run by the ASGI transport, so enter it here
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for scenario in scenarios:
+                result = await run_scenario(client, scenario, args.requests, args.concurrency, args.warmup)
+                results[scenario.name] = result
+                print(f"{scenario.name:<42} p50 {result['p50_ms']:>8.1f}  p95 {result['p95_ms']:>8.1f}  "
+                      f"p99 {result['p99_ms']:>8.1f} ms  {result['throughput_rps']:>8.1f} req/s  "
+                      f"db {result['db_calls_per_request'] if result['db_calls_per_request'] is not None else '-':>5}  "
+                      f"mem {result['peak_memory_kb']:>9.1f} KB"
+                      + (f"  ERRORS {result['errors']}" if result["errors"] else ""))
+    return results
+
+
+# ------------------------------------------
+# Results & regressions
+# ------------------------------------------
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Returns human-readable regressions of 'current' against 'baseline'."""
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        if now["p95_ms"] - before["p95_ms"] > NOISE_FLOOR_MS and now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if now["db_calls_per_request"] is not None and before.get("db_calls_per_request") is not None \
+                and now["db_calls_per_request"] > before["db_calls_per_request"] + 0.5:
+            regressions.append(f"{name}: DB calls/request {before['db_calls_per_request']} -> {now['db_calls_per_request']}")
+        if now["errors"] > before.get("errors", 0):
+            regressions.append(f"{name}: errors {before.get('errors', 0)} -> {now['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end route benchmarks on synthetic data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--students", type=int, help="override the scale's student count")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated latency per DB call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", action="append", help="run only these groups (finance, programs, exams, attendance, writes)")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/e2e-<scale>-<timestamp>.json)")
+    parser.add_argument("--compare", help="older results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    # Configure the fake backend BEFORE the app (and its shared clients) is imported
+    os.environ["SUPABASE_BACKEND"] = "fake"
+    os.environ["FAKE_SUPABASE_LATENCY_MS"] = str(args.latency_ms)
+    os.environ.pop("FAKE_SUPABASE_DATA", None)
+
+    params = dict(SCALES[args.scale])
+    if args.students:
+        params["students"] = args.students
+    started = time.perf_counter()
+    data = generate(seed=args.seed, **params)
+    print(f"generated {describe(data)} in {time.perf_counter() - started:.1f}s")
+
+    from app.core.fake_supabase import get_fake_database
+    get_fake_database().load(data)
+    from main import app
+
+    scenarios = build_scenarios(data, random.Random(args.seed))
+    if args.only:
+        scenarios = [s for s in scenarios if s.group in args.only]
+    del data
+
+    results = asyncio.run(run_suite(app, scenarios, args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "scale": args.scale,
+            "dataset": params,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+        "scenarios": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"e2e-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"peak RSS {report['meta']['peak_rss_mb']} MB, results saved to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("dataset") != params or baseline["meta"].get("latency_ms") != args.latency_ms:
+            print("warning: baseline was run with a different dataset or latency, numbers may not be comparable")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSIONS against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# ==========================================
+# BENCHMARK: per-program finance grouping
+# ==========================================
+# Run from the 'backend' folder:
+#     python -m benchmarks.bench_program_finance
+#
+# Generates synthetic programs/enrollments/payments in memory (no database needed)
+# and times the single-pass grouping over raw rows (group_program_finance below; the app
+# itself now reads these sums from the dues snapshot) at 10k, 100k and 1M payments.
+# If the algorithm is linear, the "ns / payment" column stays roughly flat.
+# The old nested-scan version is timed at the smallest size for comparison.
+
+import random
+import sys
+import time
+from datetime import date
+
+from app.services.program_finance import shape_program_finance
+
+
+def make_dataset(n_payments: int, n_programs: int = 200, payments_per_enrollment: int = 12, seed: int = 42):
+    rng = random.Random(seed)
+    programs = [
+        {
+            "program_id": pid,
+            "program_name": f"Program {pid}",
+            "monthly_fee": 1500,
+            "batch_id": pid % 10,
+            "batch": {"batch_name": f"Batch {pid % 10}"}
+        }
+        for pid in range(1, n_programs + 1)
+    ]
+    n_enrollments = max(1, n_payments // payments_per_enrollment)
+    enrollments = [
+        {"enrollment_id": eid, "program_id": rng.randint(1, n_programs)}
+        for eid in range(1, n_enrollments + 1)
+    ]
+    payments = []
+    for _ in range(n_payments):
+        year = rng.choice((2023, 2024, 2025))
+        month = rng.randint(1, 12)
+        payments.append({
+            "enrollment_id": rng.randint(1, n_enrollments),
+            "paid_amount": 1500.0,
+            "payment_date": f"{year}-{month:02d}-{rng.randint(1, 28):02d}"
+        })
+    return programs, enrollments, payments
+
+
+def group_program_finance(programs: list, enrollments: list, payments: list, today: date = None):
+    """
+    Aggregates revenue and enrollment counts by program and by batch.
+
+    Args:
+        programs: rows with program_id, program_name, batch_id, batch(batch_name).
+        enrollments: rows with enrollment_id, program_id.
+        payments: rows with enrollment_id, paid_amount, payment_date.
+
+    Returns:
+        (program_stats, batch_stats) - two lists of dicts.
+        program_stats keeps the exact shape '/finance/programs' returns.
+    """
+    today = today or date.today()
+    this_month = f"{today.year}-{today.month:02d}"
+
+    # Index 1: which program does each enrollment belong to?
+    enrollment_to_program = {}
+    students_per_program = {}
+    for e in enrollments:
+        pid = e['program_id']
+        enrollment_to_program[e['enrollment_id']] = pid
+        students_per_program[pid] = students_per_program.get(pid, 0) + 1
+
+    # Index 2: revenue per program, in ONE pass over payments
+    revenue_overall = {}
+    revenue_month = {}
+    for p in payments:
+        pid = enrollment_to_program.get(p['enrollment_id'])
+        if pid is None:
+            continue
+        amount = p['paid_amount'] or 0
+        revenue_overall[pid] = revenue_overall.get(pid, 0) + amount
+        payment_date = p.get('payment_date')
+        if payment_date and payment_date.startswith(this_month):
+            revenue_month[pid] = revenue_month.get(pid, 0) + amount
+
+    return shape_program_finance(programs, revenue_overall, revenue_month, students_per_program)
+
+
+def legacy_group(programs, enrollments, payments, today):
+    # The previous implementation, kept here only as a baseline
+    stats = []
+    for prog in programs:
+        pid = prog['program_id']
+        prog_enrollments = [e['enrollment_id'] for e in enrollments if e['program_id'] == pid]
+        prog_payments = [p for p in payments if p['enrollment_id'] in prog_enrollments]
+        stats.append({
+            "program_id": pid,
+            "total_revenue": sum(p['paid_amount'] for p in prog_payments),
+            "revenue_this_month": sum(p['paid_amount'] for p in prog_payments if p['payment_date'].startswith(f"{today.year}-{today.month:02d}")),
+            "active_students": len(prog_enrollments)
+        })
+    return stats
+
+
+def time_it(fn, *args, repeat: int = 3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(sizes=(10_000, 100_000, 1_000_000)):
+    today = date(2025, 3, 15)
+    print(f"{'payments':>10} {'grouped (s)':>12} {'ns/payment':>11} {'batches':>8}")
+    for n in sizes:
+        programs, enrollments, payments = make_dataset(n)
+        seconds, (program_stats, batch_stats) = time_it(group_program_finance, programs, enrollments, payments, today)
+        print(f"{n:>10} {seconds:>12.4f} {seconds / n * 1e9:>11.0f} {len(batch_stats):>8}")
+
+        if n == sizes[0]:
+            legacy_seconds, legacy = time_it(legacy_group, programs, enrollments, payments, today, repeat=1)
+            same = all(
+                a["total_revenue"] == b["total_revenue"] and a["active_students"] == b["active_students"]
+                for a, b in zip(program_stats, legacy)
+            )
+            print(f"{'':>10} legacy nested scan: {legacy_seconds:.4f}s (results match: {same})")
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(s) for s in sys.argv[1:]) or (10_000, 100_000, 1_000_000)
+    main(sizes)
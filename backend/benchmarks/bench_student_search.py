@@ -0,0 +1,77 @@
+# ==========================================
+# BENCHMARK: student search index
+# ==========================================
+# Run from the 'backend' folder:
+#     python -m benchmarks.bench_student_search            (100k students)
+#     python -m benchmarks.bench_student_search 250000
+#
+# Builds the in-process search index over synthetic students and measures query latency
+# for the kinds of lookups the front desk does: partial names, father's names,
+# roll numbers and phone number prefixes. Target: p95 under 50 ms at 100k students.
+
+import random
+import sys
+import time
+
+from app.services.student_search import StudentSearchIndex
+
+FIRST = ["Rahim", "Karim", "Abdul", "Nusrat", "Farhana", "Tanvir", "Sadia", "Mehedi", "Arif", "Jannat",
+         "Rafiq", "Shirin", "Imran", "Tasnim", "Habib", "Nadia", "Sakib", "Ayesha", "Fahim", "Mim"]
+LAST = ["Hossain", "Rahman", "Islam", "Ahmed", "Chowdhury", "Khan", "Uddin", "Akter", "Begum", "Sarkar",
+        "Talukder", "Miah", "Haque", "Alam", "Siddique", "Mollah", "Bhuiyan", "Karim", "Das", "Roy"]
+
+
+def make_students(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    students = []
+    for sid in range(1, n + 1):
+        students.append({
+            "student_id": sid,
+            "name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+            "fathers_name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+            "roll_no": sid,
+            "contact": f"01{rng.randint(3, 9)}{rng.randint(10000000, 99999999)}",
+            "school": "Model School",
+            "class": rng.randint(6, 12),
+        })
+    return students
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def main(n: int = 100_000, n_queries: int = 500):
+    students = make_students(n)
+    index = StudentSearchIndex()
+
+    t0 = time.perf_counter()
+    index.rebuild(students)
+    print(f"indexed {n} students in {time.perf_counter() - t0:.2f}s")
+
+    rng = random.Random(1)
+    queries = []
+    for _ in range(n_queries):
+        s = rng.choice(students)
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(s["name"][:rng.randint(3, 6)])                 # partial first name
+        elif kind == 1:
+            queries.append(s["fathers_name"].split()[1][:5])              # partial surname
+        elif kind == 2:
+            queries.append(str(s["roll_no"]))                             # roll number
+        else:
+            queries.append(s["contact"][:rng.randint(5, 8)])              # phone prefix
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q, limit=20)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    print(f"{n_queries} queries: p50 {percentile(latencies, 0.50):.2f} ms, "
+          f"p95 {percentile(latencies, 0.95):.2f} ms, p99 {percentile(latencies, 0.99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,218 @@
+# ==========================================
+# SYNTHETIC TUITION-CENTER DATA
+# ==========================================
+# Run from the 'backend' folder:
+#     python -m benchmarks.synthetic_data --scale small --out /tmp/moniem_small.json
+#     python -m benchmarks.synthetic_data --scale large --students 20000 --out /tmp/moniem_20k.json
+#
+# Generates a reproducible (seeded) dataset shaped like a real coaching center:
+#   - batches ("HSC 2025", ...) with several subject programs each, monthly fees 800-3000
+#   - students enrolled in 1-3 programs of their batch
+#   - monthly payments from the enrollment month up to today: most students pay on time,
+#     some pay a few months in advance, some fall behind and stop paying (defaulters)
+#   - weekly/monthly exams per program with written + MCQ marks for most enrollments
+#   - daily attendance on 3 class days a week for the last 'attendance_days' days
+#
+# The output is a {"table": [rows]} document: load it into the fake backend with
+# FAKE_SUPABASE_DATA=/path/to/file.json (see app/core/fake_supabase.py), or call generate()
+# directly as benchmarks/bench_e2e.py does.
+
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+SCALES = {
+    "small":  {"batches": 3,  "programs_per_batch": 4, "students": 600,    "years": 2, "exams_per_program": 8,  "attendance_days": 60},
+    "medium": {"batches": 6,  "programs_per_batch": 5, "students": 3000,   "years": 3, "exams_per_program": 16, "attendance_days": 120},
+    "large":  {"batches": 10, "programs_per_batch": 6, "students": 15000,  "years": 3, "exams_per_program": 24, "attendance_days": 180},
+}
+
+SUBJECTS = ["Physics", "Chemistry", "Mathematics", "Higher Math", "Biology", "English", "ICT", "Bangla"]
+FIRST_NAMES = ["Rahim", "Karim", "Fatima", "Ayesha", "Tanvir", "Nusrat", "Sabbir", "Mim", "Arif", "Sadia",
+               "Rakib", "Jannat", "Imran", "Tasnim", "Hasan", "Lamia", "Fahim", "Riya", "Shuvo", "Anika"]
+LAST_NAMES = ["Hossain", "Rahman", "Islam", "Ahmed", "Chowdhury", "Khan", "Uddin", "Akter", "Sarker", "Das"]
+SCHOOLS = ["Dhaka College", "Notre Dame College", "Viqarunnisa Noon", "Ideal School", "Rajuk College",
+           "Holy Cross College", "Adamjee Cantonment", "City College"]
+EXAM_TYPES = ["Weekly", "Weekly", "Weekly", "Monthly", "Term"]
+# Weekday numbers (Mon=0) a program holds class on
+CLASS_DAYS = [(0, 2, 4), (1, 3, 5), (5, 0, 3)]
+
+
+def _months(start: date, end: date):
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        yield y, m
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+def generate(batches: int = 3, programs_per_batch: int = 4, students: int = 600, years: int = 2,
+             exams_per_program: int = 8, attendance_days: int = 60, seed: int = 42, today: date = None) -> dict:
+    """Returns {"table": [rows]} following database_setup.sql."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = date(today.year - years, today.month, 1)
+
+    data = {"batch": [], "program": [], "student": [], "enrollment": [], "exam": [],
+            "student_individual_result": [], "attendance": [], "payment": []}
+
+    # 1. Batches and their programs
+    programs_by_batch = {}
+    for b in range(1, batches + 1):
+        data["batch"].append({"batch_id": b, "batch_name": f"HSC {today.year + (b - 1) % 2} - Group {b}"})
+        subjects = rng.sample(SUBJECTS, min(programs_per_batch, len(SUBJECTS)))
+        for subject in subjects:
+            pid = len(data["program"]) + 1
+            data["program"].append({
+                "program_id": pid,
+                "program_name": f"{subject} ({data['batch'][-1]['batch_name']})",
+                "batch_id": b,
+                "monthly_fee": rng.choice([800, 1000, 1200, 1500, 2000, 2500, 3000]),
+                "start_date": first_day.isoformat(),
+                "end_date": None,
+            })
+            programs_by_batch.setdefault(b, []).append(pid)
+
+    # 2. Students, each enrolled in 1-3 programs of one batch
+    span_days = (today - first_day).days
+    for sid in range(1, students + 1):
+        data["student"].append({
+            "student_id": sid,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "fathers_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "school": rng.choice(SCHOOLS),
+            "contact": f"01{rng.randint(3, 9)}{rng.randint(0, 99999999):08d}",
+            "roll_no": sid if rng.random() > 0.02 else None,
+            "class": rng.choice([11, 12]),
+        })
+        batch_programs = programs_by_batch[rng.randint(1, batches)]
+        joined = first_day + timedelta(days=int(span_days * rng.random() ** 1.5))
+        for pid in rng.sample(batch_programs, min(len(batch_programs), rng.choice([1, 1, 2, 2, 3]))):
+            data["enrollment"].append({
+                "enrollment_id": len(data["enrollment"]) + 1,
+                "student_id": sid,
+                "program_id": pid,
+                "enrollment_date": joined.isoformat(),
+            })
+
+    fees = {p["program_id"]: p["monthly_fee"] for p in data["program"]}
+    enrollments_by_program = {}
+    for e in data["enrollment"]:
+        enrollments_by_program.setdefault(e["program_id"], []).append(e)
+
+    # 3. Payments: one row per paid month, grouped per visit (transaction_group_id)
+    for e in data["enrollment"]:
+        behaviour = rng.random()
+        months = list(_months(date.fromisoformat(e["enrollment_date"]), today))
+        if behaviour < 0.12:
+            # Defaulter: stopped paying somewhere along the way
+            months = months[:rng.randint(0, max(0, len(months) - 2))]
+        elif behaviour > 0.9:
+            # Pays a few months in advance
+            last = months[-1]
+            months += list(_months(date(*last, 1) + timedelta(days=32), date(*last, 1) + timedelta(days=31 * rng.randint(1, 3))))
+        i = 0
+        while i < len(months):
+            visit = months[i:i + rng.choice([1, 1, 1, 2, 3])]
+            group = str(uuid.UUID(int=rng.getrandbits(128)))
+            paid_on = min(today, date(*visit[0], rng.randint(1, 15)))
+            for year, month in visit:
+                data["payment"].append({
+                    "payment_id": len(data["payment"]) + 1,
+                    "enrollment_id": e["enrollment_id"],
+                    "paid_amount": fees[e["program_id"]],
+                    "month": month,
+                    "year": year,
+                    "transaction_group_id": group,
+                    "status": "Paid",
+                    "payment_date": paid_on.isoformat(),
+                    "payment_method": rng.choice(["Cash", "Cash", "bKash", "Nagad", "Bank"]),
+                    "remarks": None,
+                })
+            i += len(visit)
+
+    # 4. Exams and results (a few students miss each exam)
+    for program in data["program"]:
+        pid = program["program_id"]
+        enrolled = enrollments_by_program.get(pid, [])
+        for k in range(exams_per_program):
+            exam_day = first_day + timedelta(days=int(span_days * (k + 1) / (exams_per_program + 1)))
+            exam_id = len(data["exam"]) + 1
+            total_marks = rng.choice([50, 100, 100])
+            data["exam"].append({
+                "exam_id": exam_id,
+                "program_id": pid,
+                "exam_name": f"Exam {k + 1}",
+                "exam_date": exam_day.isoformat(),
+                "exam_type": rng.choice(EXAM_TYPES),
+                "subject": program["program_name"].split(" (")[0],
+                "total_marks": total_marks,
+            })
+            for e in enrolled:
+                if e["enrollment_date"] > exam_day.isoformat() or rng.random() < 0.08:
+                    continue
+                share = min(1.0, max(0.0, rng.gauss(0.62, 0.17)))
+                mcq = round(total_marks * 0.3 * min(1.0, share + rng.uniform(-0.1, 0.1)))
+                written = round(total_marks * 0.7 * share)
+                data["student_individual_result"].append({
+                    "result_id": len(data["student_individual_result"]) + 1,
+                    "enrollment_id": e["enrollment_id"],
+                    "exam_id": exam_id,
+                    "written_marks": max(0, written),
+                    "mcq_marks": max(0, mcq),
+                })
+
+    # 5. Attendance on class days; every student has their own absence rate
+    absence = {e["enrollment_id"]: rng.choice([0.03, 0.05, 0.08, 0.12, 0.3]) for e in data["enrollment"]}
+    for program in data["program"]:
+        pid = program["program_id"]
+        weekdays = CLASS_DAYS[pid % len(CLASS_DAYS)]
+        for offset in range(attendance_days, 0, -1):
+            day = today - timedelta(days=offset)
+            if day.weekday() not in weekdays:
+                continue
+            day_str = day.isoformat()
+            for e in enrollments_by_program.get(pid, []):
+                if e["enrollment_date"] > day_str:
+                    continue
+                roll = rng.random()
+                rate = absence[e["enrollment_id"]]
+                status = "Absent" if roll < rate else "Late" if roll < rate + 0.05 else \
+                    "Excused" if roll < rate + 0.06 else "Present"
+                data["attendance"].append({
+                    "attendance_id": len(data["attendance"]) + 1,
+                    "enrollment_id": e["enrollment_id"],
+                    "status": status,
+                    "date": day_str,
+                })
+
+    return data
+
+
+def describe(data: dict) -> str:
+    return ", ".join(f"{len(rows):,} {table}" for table, rows in data.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Moniem dataset as JSON")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--students", type=int, help="override the scale's student count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    params = dict(SCALES[args.scale])
+    if args.students:
+        params["students"] = args.students
+
+    started = time.perf_counter()
+    data = generate(seed=args.seed, **params)
+    with open(args.out, "w") as f:
+        json.dump(data, f)
+    print(f"{describe(data)} -> {args.out} ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,46 @@
 # This file is where the application starts. 
 # When you run the server, it looks for 'app' inside this file.
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.routes.student_routes import router as student_router
+from app.core.supabase_async import close_async_supabase
+from app.core.scheduler import scheduler
+
+# 0. Lifespan (Opening & Closing Time)
+#    Code before 'yield' runs once when the server starts,
+#    code after 'yield' runs once when it shuts down.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background jobs (app/core/scheduler.py): keep the dues snapshot fresh so the finance
+    # pages read precomputed dues instead of recalculating them on every view.
+    from app.routes.payment_routes import payment_repo
+    from app.repositories.payment_repository import DUES_SNAPSHOT_JOB, DUES_SNAPSHOT_REFRESH_SECONDS, \
+        PAYMENT_EVENTS_JOB, PAYMENT_EVENTS_POLL_SECONDS
+    from app.services.dues_snapshot import dues_snapshot
+    scheduler.add_job(DUES_SNAPSHOT_JOB, payment_repo.rebuild_finance_aggregates,
+                      every_seconds=DUES_SNAPSHOT_REFRESH_SECONDS, run_at_start=True)
+    # ... and in step with payments taken by the other workers (payment event log)
+    scheduler.add_job(PAYMENT_EVENTS_JOB, payment_repo.consume_payment_events,
+                      every_seconds=PAYMENT_EVENTS_POLL_SECONDS)
+    scheduler.add_job("dues_roll_over", dues_snapshot.roll_over, at_month_start=True)
+    # The in-memory attendance store (ATTENDANCE_STORE=memory) is reloaded the same way,
+    # instead of by the first request after it went stale
+    from app.routes.attendance_routes import attendance_repo
+    from app.repositories.attendance_repository import ATTENDANCE_STORE, ATTENDANCE_STORE_JOB, \
+        ATTENDANCE_STORE_REFRESH_SECONDS
+    if ATTENDANCE_STORE == "memory":
+        scheduler.add_job(ATTENDANCE_STORE_JOB, attendance_repo.rebuild_attendance_store,
+                          every_seconds=ATTENDANCE_STORE_REFRESH_SECONDS, run_at_start=True)
+    await scheduler.start()
+    yield
+    await scheduler.stop()
+    # Close the pooled connections of the async Supabase client
+    await close_async_supabase()
 
 # 1. Initialize the Application
 #    This creates the main object that will receive ALL web requests.
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # ==========================================
 # 4. CORS Details (Security Gate)
@@ -27,6 +61,12 @@ app.add_middleware(
     allow_headers=["*"], # Allow all headers
 )
 
+# Timing + query counting for every request (Server-Timing header, /metrics below)
+from app.core.instrumentation import instrumentation_middleware, metrics
+from fastapi.responses import PlainTextResponse
+
+app.middleware("http")(instrumentation_middleware)
+
 # 2. Base Endpoint (Health Check)
 #    This is a simple sanity check. If you go to http://localhost:8000/,
 #    and see this message, you know the server is alive.
@@ -34,6 +74,32 @@ app.add_middleware(
 def read_root():
     return {"status": "Backend is running!"}
 
+# Hit/miss counters of the reference-data cache (programs, batches, exams)
+from app.core.cache import cache
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return cache.stats()
+
+# Idempotency-Key store of the write endpoints: stored keys, replays, coalesced duplicates
+from app.core.idempotency import idempotency
+
+@app.get("/idempotency/stats")
+def get_idempotency_stats():
+    return idempotency.stats()
+
+# Single-flight: how many concurrent identical reads shared one DB call
+from app.core.single_flight import single_flight
+
+@app.get("/coalescing/stats")
+def get_coalescing_stats():
+    return single_flight.stats()
+
+# Prometheus scrape endpoint: request latency, queries per request, per-query latency and bytes
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # 3. Register the Routers (Departments)
 #    We built the 'student_router' in another file. 
 #    Now we plug it into the main app.
@@ -50,4 +116,7 @@ from app.routes.attendance_routes import router as attendance_router
 app.include_router(attendance_router)
 
 from app.routes.payment_routes import router as payment_router
-app.include_router(payment_router)
\ No newline at end of file
+app.include_router(payment_router)
+
+from app.routes.export_routes import router as export_router
+app.include_router(export_router)
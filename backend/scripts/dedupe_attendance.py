@@ -0,0 +1,39 @@
+# ==========================================
+# TOOL: remove duplicate attendance rows
+# ==========================================
+# Run from the 'backend' folder:
+#     python -m scripts.dedupe_attendance            (dry run: only reports)
+#     python -m scripts.dedupe_attendance --apply    (deletes the duplicates)
+#
+# Before the unique (enrollment_id, date) constraint, saving the same day twice inserted a
+# second row. This keeps the newest row of every (enrollment_id, date) and deletes the rest.
+# Safe to run while the app is online. Afterwards, run the "Attendance uniqueness" section
+# of database_setup.sql to add the constraint so duplicates can't come back.
+
+import sys
+import time
+
+from app.repositories.attendance_repository import AttendanceRepository
+
+
+def main(apply: bool):
+    repo = AttendanceRepository()
+
+    started = time.perf_counter()
+    losers, duplicated_keys = repo.find_duplicate_attendance()
+    print(f"Scanned attendance in {time.perf_counter() - started:.1f}s")
+    print(f"{duplicated_keys} (enrollment, date) pairs have duplicates, {len(losers)} extra rows")
+
+    if not losers:
+        print("Nothing to do.")
+        return
+    if not apply:
+        print("Dry run - re-run with --apply to delete them.")
+        return
+
+    deleted = repo.delete_attendance_ids(losers)
+    print(f"Deleted {deleted} duplicate rows.")
+
+
+if __name__ == "__main__":
+    main(apply="--apply" in sys.argv[1:])
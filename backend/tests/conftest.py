@@ -0,0 +1,51 @@
+import os
+
+# Run the repositories against the in-memory PostgREST stand-in (app/core/fake_supabase.py).
+# Must be set before anything imports app.core.supabase.
+os.environ.setdefault("SUPABASE_BACKEND", "fake")
+
+from datetime import date
+
+import pytest
+
+from app.core.fake_supabase import get_fake_database
+from app.repositories import payment_repository
+from app.services.dues_snapshot import DuesSnapshot
+
+
+@pytest.fixture
+def fake_db():
+    db = get_fake_database()
+    db.reset()
+    max_rows = db.max_rows
+    yield db
+    db.reset()
+    db.max_rows = max_rows
+
+
+# Payments in the load_class fixture are for last year, so every month of them is already due
+LAST_YEAR = date.today().year - 1
+
+
+@pytest.fixture
+def load_class(fake_db):
+    """load_class(students, months): one program, each student enrolled and paid for January..'months' of last year."""
+    def load(students: int = 4, months: int = 5):
+        fake_db.load({
+            "program": [{"program_id": 1, "program_name": "Physics", "monthly_fee": 1000}],
+            "student": [{"student_id": s, "name": f"Student {s}", "roll_no": s} for s in range(1, students + 1)],
+            "enrollment": [{"enrollment_id": s, "student_id": s, "program_id": 1,
+                            "enrollment_date": f"{LAST_YEAR}-01-01"} for s in range(1, students + 1)],
+            "payment": [{"enrollment_id": s, "paid_amount": 1000, "month": m, "year": LAST_YEAR,
+                         "payment_date": f"{LAST_YEAR}-{m:02d}-05"}
+                        for s in range(1, students + 1) for m in range(1, months + 1)],
+        })
+    return load
+
+
+@pytest.fixture
+def dues(monkeypatch):
+    """A fresh, empty dues snapshot for the payment repository (the process-wide one stays untouched)."""
+    snapshot = DuesSnapshot()
+    monkeypatch.setattr(payment_repository, "dues_snapshot", snapshot)
+    return snapshot
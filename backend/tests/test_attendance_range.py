@@ -0,0 +1,37 @@
+import pytest
+
+from app.core.cache import cache
+from app.repositories import attendance_repository
+from app.repositories.attendance_repository import AttendanceRepository
+from app.services.attendance_store import attendance_store
+
+MARKS = {
+    1: {"2026-01-29": "Absent", "2026-01-30": "Present", "2026-01-31": "Late",
+        "2026-02-01": "Present", "2026-02-02": "Present"},
+    2: {"2026-01-30": "Absent", "2026-01-31": "Absent", "2026-02-01": "Present", "2026-02-02": "Excused"},
+    3: {},
+}
+
+
+@pytest.mark.parametrize("store", ["database", "memory"])
+def test_range_rates_span_a_month_boundary(fake_db, load_class, monkeypatch, store):
+    load_class(students=3, months=1)
+    fake_db.load({"attendance": [{"enrollment_id": e, "date": day, "status": status}
+                                 for e, days in MARKS.items() for day, status in days.items()]})
+    monkeypatch.setattr(attendance_repository, "ATTENDANCE_STORE", store)
+    # Month bitmaps / the store may hold another test's database
+    cache.invalidate("attendance:1:2026-01", "attendance:1:2026-02")
+    attendance_store.invalidate()
+
+    summary = AttendanceRepository().get_attendance_summary(1, "2026-01-30", "2026-02-02", min_rate=0.8, min_days=3)
+
+    # Jan 29 is outside the range; the other four days were marked for somebody
+    assert summary["class_days"] == 4
+    assert [(s["enrollment_id"], s["marked"], s["unmarked"], s["rate"]) for s in summary["students"]] == [
+        (1, 4, 0, 1.0), (2, 4, 0, 0.25), (3, 0, 4, None)
+    ]
+    assert summary["overall_rate"] == 0.625   # (4 + 1) attended of 8 marked days
+    assert [s["enrollment_id"] for s in summary["chronic_absentees"]] == [2]
+    assert [(d["date"], d["rate"]) for d in summary["daily"]] == [
+        ("2026-01-30", 0.5), ("2026-01-31", 0.5), ("2026-02-01", 1.0), ("2026-02-02", 0.5)
+    ]
@@ -0,0 +1,46 @@
+from app.repositories import attendance_repository
+from app.repositories.attendance_repository import ATTENDANCE_STORE_JOB, AttendanceRepository
+from app.services.attendance_store import AttendanceStore, attendance_store
+
+
+def test_stale_store_is_served_while_the_scheduler_reloads_it(fake_db, load_class, monkeypatch):
+    load_class(students=2, months=1)
+    fake_db.load({"attendance": [{"enrollment_id": 1, "date": "2026-03-02", "status": "Present"}]})
+    monkeypatch.setattr(attendance_repository, "ATTENDANCE_STORE", "memory")
+    repo = AttendanceRepository()
+    attendance_store.invalidate()
+    repo._ensure_store(1)   # no scheduler running: the first load happens inline
+
+    triggered = []
+    monkeypatch.setattr(attendance_repository.scheduler, "trigger", lambda name: triggered.append(name) or True)
+    # Written by another worker, then the store goes stale
+    fake_db.load({"attendance": [{"enrollment_id": 2, "date": "2026-03-02", "status": "Absent"}]})
+    attendance_store.invalidate()
+
+    rows = repo.get_daily_attendance(1, "2026-03-02")
+
+    # The old copy answers; the reload is left to the background job
+    assert [row["status"] for row in rows] == ["Present", None]
+    assert triggered == [ATTENDANCE_STORE_JOB]
+
+    repo.rebuild_attendance_store()
+    assert [row["status"] for row in attendance_store.daily(1, "2026-03-02")] == ["Present", "Absent"]
+
+
+def test_writes_during_a_rebuild_survive_the_swap():
+    store = AttendanceStore()
+    enrollments = [{"enrollment_id": 1, "program_id": 1, "student": {"student_id": 1, "name": "A", "roll_no": 1}}]
+    store.begin_rebuild()
+    store.rebuild(enrollments, [])
+
+    store.begin_rebuild()
+    # Saved after the scan read its page: the scan's rows don't have it
+    store.apply([{"enrollment_id": 1, "date": "2026-03-02", "status": "Late"}])
+    store.rebuild(enrollments, [{"enrollment_id": 1, "date": "2026-03-02", "status": "Present"}])
+
+    assert [row["status"] for row in store.daily(1, "2026-03-02")] == ["Late"]
+
+    # Once the rebuild is over nothing is recorded for replay any more
+    store.apply([{"enrollment_id": 1, "date": "2026-03-03", "status": "Absent"}])
+    store.rebuild(enrollments, [])
+    assert [row["status"] for row in store.daily(1, "2026-03-03")] == [None]
@@ -0,0 +1,19 @@
+from app.repositories.result_repository import ResultRepository
+
+
+def test_analytics_count_every_result_past_the_row_cap(fake_db):
+    students = 1500  # more than one PostgREST response (fake_db caps at 1000 rows like Supabase)
+    fake_db.load({
+        "program": [{"program_id": 1, "program_name": "Physics", "monthly_fee": 1000}],
+        "student": [{"student_id": s, "name": f"Student {s}"} for s in range(1, students + 1)],
+        "enrollment": [{"enrollment_id": s, "student_id": s, "program_id": 1} for s in range(1, students + 1)],
+        "exam": [{"exam_id": 1, "program_id": 1, "exam_name": "Term 1", "total_marks": 100}],
+        "student_individual_result": [{"enrollment_id": s, "exam_id": 1, "written_marks": s % 60, "mcq_marks": 20}
+                                      for s in range(1, students + 1)],
+    })
+    assert fake_db.max_rows == 1000
+
+    analytics = ResultRepository()._compute_exam_analytics(1)
+
+    assert analytics["total_students"] == students
+    assert sum(b["count"] for b in analytics["histogram"]) == students
@@ -0,0 +1,19 @@
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def test_bulk_results_for_unknown_exam_is_a_bad_request(fake_db):
+    response = client.post("/results/bulk", json={"exam_id": 999, "results": []})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Exam not found"
+
+
+def test_bulk_results_with_too_long_idempotency_key_is_a_bad_request(fake_db):
+    response = client.post("/results/bulk", json={"exam_id": 999, "results": []},
+                           headers={"Idempotency-Key": "k" * 256})
+
+    assert response.status_code == 400
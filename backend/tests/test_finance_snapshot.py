@@ -0,0 +1,101 @@
+from datetime import date
+
+from app.repositories.payment_repository import PaymentRepository
+from app.services.dues_snapshot import DuesSnapshot
+from conftest import LAST_YEAR
+
+
+def test_rebuild_pages_through_every_payment(fake_db, load_class, dues):
+    load_class(students=4, months=5)
+    fake_db.max_rows = 3
+    repo = PaymentRepository()
+    repo.page_size = 3
+
+    repo.rebuild_finance_aggregates()
+
+    assert repo._finance_stats()["total_revenue"] == 20000.0
+    assert repo.get_program_totals(1)["collected"] == 20000.0
+    assert all(row["paid_up_to"] == f"May {LAST_YEAR}" for row in repo.get_program_payment_status(1))
+
+
+def test_defaulters_see_every_payment_past_the_row_cap(fake_db, load_class, dues):
+    load_class(students=4, months=5)
+    fake_db.max_rows = 3
+    repo = PaymentRepository()
+    repo.page_size = 3
+
+    page = repo.get_defaulters()
+
+    # Everyone paid January-May of last year, so they all owe the same months since June
+    assert len({row["due"] for row in page["items"]}) == 1
+    assert {row["oldest_unpaid"] for row in page["items"]} == {f"{LAST_YEAR}-06-01"}
+
+
+def test_future_dated_payment_keeps_this_months_receipts():
+    today = date(2025, 3, 15)
+    snapshot = DuesSnapshot()
+    snapshot.begin_refresh()
+    snapshot.finish_refresh(
+        [{"enrollment_id": 1, "program_id": 1, "enrollment_date": "2025-01-01", "program": {"monthly_fee": 1000}}],
+        [{"payment_id": 1, "enrollment_id": 1, "paid_amount": 1000, "payment_date": "2025-03-02", "month": 3, "year": 2025}],
+        today)
+
+    snapshot.apply_payments([{"payment_id": 2, "enrollment_id": 1, "paid_amount": 1000,
+                              "payment_date": "2025-04-01", "month": 4, "year": 2025}])
+
+    assert snapshot.program_finance()[1]["received_this_month"] == 1000.0
+
+
+def test_finance_stats_follow_new_payments(load_class, dues):
+    load_class(students=2, months=3)
+    repo = PaymentRepository()
+    before = repo.get_finance_stats()
+
+    repo.create_bulk_payment([{"enrollment_id": 1, "paid_amount": 1000, "payment_date": date.today().isoformat(),
+                               "month": 4, "year": LAST_YEAR}])
+    after = repo.get_finance_stats()
+
+    assert after["total_revenue"] == before["total_revenue"] + 1000
+    assert after["revenue_this_month"] == before["revenue_this_month"] + 1000
+    assert after["due_total"] == before["due_total"] - 1000
+    assert repo.verify_finance_aggregates()["in_sync"]
+
+
+ENROLLMENTS = [{"enrollment_id": 1, "program_id": 1, "enrollment_date": "2025-01-01", "program": {"monthly_fee": 1000}}]
+PAYMENT = {"payment_id": 7, "enrollment_id": 1, "paid_amount": 1000, "payment_date": "2025-03-02", "month": 1, "year": 2025}
+
+
+def test_overlapping_refreshes_keep_payments_made_during_either():
+    today = date(2025, 3, 15)
+    snapshot = DuesSnapshot()
+    first = snapshot.begin_refresh()
+    second = snapshot.begin_refresh()
+    snapshot.apply_payments([PAYMENT])   # neither scan contains it
+
+    assert snapshot.finish_refresh(ENROLLMENTS, [], today, generation=first)
+    assert snapshot.stats()["total_revenue"] == 1000.0
+    assert snapshot.finish_refresh(ENROLLMENTS, [], today, generation=second)
+    assert snapshot.stats()["total_revenue"] == 1000.0
+
+
+def test_older_refresh_finishing_last_is_dropped():
+    today = date(2025, 3, 15)
+    snapshot = DuesSnapshot()
+    older = snapshot.begin_refresh()
+    newer = snapshot.begin_refresh()
+
+    assert snapshot.finish_refresh(ENROLLMENTS, [PAYMENT], today, generation=newer)
+    assert not snapshot.finish_refresh(ENROLLMENTS, [], today, generation=older)
+    assert snapshot.stats()["total_revenue"] == 1000.0
+
+
+def test_aborted_refresh_does_not_end_the_replay_of_another():
+    today = date(2025, 3, 15)
+    snapshot = DuesSnapshot()
+    snapshot.begin_refresh()             # fails below
+    running = snapshot.begin_refresh()
+    snapshot.apply_payments([PAYMENT])
+    snapshot.abort_refresh()
+
+    assert snapshot.finish_refresh(ENROLLMENTS, [], today, generation=running)
+    assert snapshot.stats()["total_revenue"] == 1000.0
@@ -0,0 +1,87 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app.core.idempotency import idempotency
+from app.routes import payment_routes
+from conftest import LAST_YEAR
+from main import app
+
+client = TestClient(app)
+
+
+def payment(month: int, amount: float = 1000) -> dict:
+    return {"student_id": 1, "program_id": 1, "paid_amount": amount, "payment_date": f"{LAST_YEAR}-{month:02d}-05",
+            "month": month, "year": LAST_YEAR, "payment_method": "Cash"}
+
+
+def payment_rows(fake_db) -> int:
+    return len(fake_db.tables["payment"].rows)
+
+
+def test_retry_with_the_same_key_replays_the_first_response(fake_db, load_class, dues):
+    load_class(students=1, months=5)
+    key = str(uuid.uuid4())
+    before = payment_rows(fake_db)
+
+    first = client.post("/payments/bulk", json=[payment(6)], headers={"Idempotency-Key": key})
+    retry = client.post("/payments/bulk", json=[payment(6)], headers={"Idempotency-Key": key})
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert payment_rows(fake_db) == before + 1
+
+
+def test_same_key_with_another_body_is_rejected(fake_db, load_class, dues):
+    load_class(students=1, months=5)
+    key = str(uuid.uuid4())
+    client.post("/payments/bulk", json=[payment(6)], headers={"Idempotency-Key": key})
+    before = payment_rows(fake_db)
+
+    reused = client.post("/payments/bulk", json=[payment(6, amount=500)], headers={"Idempotency-Key": key})
+
+    assert reused.status_code == 422
+    assert payment_rows(fake_db) == before
+
+
+def test_concurrent_requests_with_one_key_record_one_payment(fake_db, load_class, dues, monkeypatch):
+    load_class(students=1, months=5)
+    key = str(uuid.uuid4())
+    before = payment_rows(fake_db)
+    requests = 5
+
+    # Hold the first request inside the repository until every duplicate is waiting for its key
+    release = threading.Event()
+    calls = []
+    create = payment_routes.payment_repo.create_bulk_payment
+
+    def slow_create(data):
+        calls.append(data)
+        release.wait(5)
+        return create(data)
+
+    monkeypatch.setattr(payment_routes.payment_repo, "create_bulk_payment", slow_create)
+
+    def waiting_for_key() -> int:
+        slot = idempotency._key_locks.get(f"POST /payments/bulk:{key}")
+        return slot[1] if slot else 0
+
+    with ThreadPoolExecutor(requests) as pool:
+        futures = [pool.submit(client.post, "/payments/bulk", json=[payment(6)], headers={"Idempotency-Key": key})
+                   for _ in range(requests)]
+        deadline = time.monotonic() + 5
+        while waiting_for_key() < requests and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        responses = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r.status_code == 200 for r in responses)
+    assert len({str(r.json()) for r in responses}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == requests - 1
+    assert payment_rows(fake_db) == before + 1
@@ -0,0 +1,38 @@
+import pytest
+
+from app.repositories.payment_event_repository import PaymentEventRepository
+
+
+def test_ack_only_moves_forward_and_stops_at_the_head(fake_db):
+    fake_db.load({"payment_event": [{"event_id": e, "payload": {}} for e in range(1, 6)]})
+    events = PaymentEventRepository()
+
+    assert events.ack("receipts", 3) == {"consumer": "receipts", "offset": 3}   # first ack creates the row
+    assert events.ack("receipts", 2) == {"consumer": "receipts", "offset": 3}   # older ack is ignored
+    assert events.ack("receipts", 5) == {"consumer": "receipts", "offset": 5}
+    with pytest.raises(Exception, match="past the newest event"):
+        events.ack("receipts", 6)
+    with pytest.raises(Exception, match="past the newest event"):
+        events.ack("mailer", 6)
+
+    assert [(c["consumer"], c["last_event_id"]) for c in events.get_consumers()] == [("receipts", 5)]
+    assert events.poll("receipts")["events"] == []
+
+
+def test_ack_of_a_new_consumer_does_not_overwrite_a_newer_row(fake_db, monkeypatch):
+    fake_db.load({"payment_event": [{"event_id": e, "payload": {}} for e in range(1, 6)]})
+    events = PaymentEventRepository()
+    move_offset = events._move_offset
+
+    def racing_move_offset(consumer, values):
+        # Another worker acks 4 right after our conditional update found no row
+        if not fake_db.tables["payment_event_consumer"].rows:
+            moved = move_offset(consumer, values)
+            PaymentEventRepository().ack(consumer, 4)
+            return moved
+        return move_offset(consumer, values)
+
+    monkeypatch.setattr(events, "_move_offset", racing_move_offset)
+
+    assert events.ack("receipts", 2) == {"consumer": "receipts", "offset": 4}
+    assert events.get_offset("receipts") == 4
@@ -0,0 +1,56 @@
+import asyncio
+
+from app.core.supabase import supabase
+from app.repositories.payment_repository import PaymentRepository
+from conftest import LAST_YEAR
+
+
+def paid_months(ledger: dict) -> int:
+    return sum(1 for month in ledger["ledger"] if month["status"] == "Paid")
+
+
+def test_program_status_pages_past_one_response(fake_db, load_class, dues):
+    load_class()
+    fake_db.max_rows = 3  # like Supabase's 1000-row cap, on 20 payments and 4 enrollments
+    repo = PaymentRepository()
+    repo.page_size = 3
+
+    rows = repo.get_program_payment_status(1)
+    rows_async = asyncio.run(repo.get_program_payment_status_async(1))
+
+    assert [r["enrollment_id"] for r in rows] == [1, 2, 3, 4]
+    assert [paid_months(r) for r in rows] == [5, 5, 5, 5]
+    assert all(r["paid_up_to"] == f"May {LAST_YEAR}" for r in rows)
+    assert rows_async == rows
+
+
+def test_bulk_status_pages_past_one_response(fake_db, load_class, dues):
+    load_class()
+    fake_db.max_rows = 3
+    repo = PaymentRepository()
+    repo.page_size = 3
+
+    rows = repo.get_payment_status_bulk([1, 2, 3, 4])
+    rows_async = asyncio.run(repo.get_payment_status_bulk_async([1, 2, 3, 4]))
+
+    assert [r["enrollment_id"] for r in rows] == [1, 2, 3, 4]
+    assert [paid_months(r) for r in rows] == [5, 5, 5, 5]
+    assert rows_async == rows
+
+
+def test_fetch_all_stops_on_a_short_page(load_class):
+    load_class(students=1, months=6)
+    repo = PaymentRepository()
+    repo.page_size = 3
+
+    payments = repo._fetch_all(lambda: supabase.table("payment").select("payment_id"), "payment_id")
+
+    assert [p["payment_id"] for p in payments] == [1, 2, 3, 4, 5, 6]
+
+
+def test_fake_backend_caps_one_response(fake_db, load_class):
+    load_class(students=1, months=6)
+    fake_db.max_rows = 4
+
+    assert len(supabase.table("payment").select("payment_id").execute().data) == 4
+    assert len(supabase.table("payment").select("payment_id").limit(2).execute().data) == 2
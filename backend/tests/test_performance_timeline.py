@@ -0,0 +1,26 @@
+from app.repositories.result_repository import ResultRepository
+from app.services.performance_engine import performance_store
+
+
+def test_timeline_gives_tied_scores_the_same_rank(fake_db, load_class):
+    load_class(students=4, months=1)
+    fake_db.load({
+        "exam": [{"exam_id": 1, "program_id": 1, "exam_name": "Weekly 1", "exam_date": "2026-01-10", "total_marks": 50},
+                 {"exam_id": 2, "program_id": 1, "exam_name": "Weekly 2", "exam_date": "2026-01-17", "total_marks": 50}],
+        "student_individual_result": [
+            {"enrollment_id": e, "exam_id": 1, "written_marks": marks, "mcq_marks": 0}
+            for e, marks in {1: 40, 2: 30, 3: 30, 4: 10}.items()
+        ] + [{"enrollment_id": e, "exam_id": 2, "written_marks": 25, "mcq_marks": 0} for e in range(1, 5)],
+    })
+    performance_store.invalidate()  # forget programs loaded from another test's database
+    repo = ResultRepository()
+
+    def timeline(student_id):
+        (program,) = repo.get_student_performance(student_id)["programs"]
+        return [(e["exam_id"], e["rank"], e["percentile"]) for e in program["timeline"]]
+
+    # Competition ranking ("1, 2, 2, 4"): the two 30s share 2nd place and nobody is 3rd
+    assert timeline(1) == [(1, 1, 100.0), (2, 1, 100.0)]
+    assert timeline(2) == [(1, 2, 66.67), (2, 1, 100.0)]
+    assert timeline(3) == [(1, 2, 66.67), (2, 1, 100.0)]
+    assert timeline(4) == [(1, 4, 0.0), (2, 1, 100.0)]
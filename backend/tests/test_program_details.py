@@ -0,0 +1,46 @@
+from app.repositories.program_repository import ProgramRepository
+
+
+def test_summary_does_not_load_the_dues_snapshot(fake_db, load_class, dues):
+    load_class()
+    repo = ProgramRepository()
+
+    # Cold snapshot: no totals rather than a scan of the payment table inside the request
+    program = repo.get_program_by_id(1)
+    assert program["totals"] is None
+    assert not dues.is_loaded()
+
+    # Once the background job has loaded it, the summary reads the totals from memory
+    repo.payment_repo.rebuild_finance_aggregates()
+    totals = repo.get_program_by_id(1)["totals"]
+    assert totals["collected"] == 20000.0
+    assert totals["stale"] is False
+
+
+def test_exam_and_teacher_sections_are_paged(fake_db, dues):
+    fake_db.load({
+        "program": [{"program_id": 1, "program_name": "Physics", "monthly_fee": 1000}],
+        "exam": [{"exam_id": e, "program_id": 1, "exam_name": f"Weekly {e}", "total_marks": 50} for e in range(1, 6)],
+        "teacher": [{"teacher_id": t, "full_name": f"Teacher {t}"} for t in range(1, 4)],
+        "teacher_program_enrollment": [{"teacher_id": t, "program_id": 1, "field": "Physics"} for t in range(1, 4)],
+    })
+    repo = ProgramRepository()
+
+    program = repo.get_program_by_id(1, include="exams,teachers")
+    assert program["counts"]["exams"] == 5
+    assert [e["exam_id"] for e in program["exams"]["items"]] == [5, 4, 3, 2, 1]
+    assert [t["teacher"]["full_name"] for t in program["teachers"]["items"]] == ["Teacher 1", "Teacher 2", "Teacher 3"]
+
+    exams, cursor = [], None
+    while True:
+        page = repo.get_program_exams(1, limit=2, cursor=cursor)
+        exams += [e["exam_id"] for e in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert exams == [5, 4, 3, 2, 1]
+
+    first = repo.get_program_teachers(1, limit=2)
+    rest = repo.get_program_teachers(1, limit=2, cursor=first["next_cursor"])
+    assert [t["teacher_id"] for t in first["items"] + rest["items"]] == [1, 2, 3]
+    assert rest["next_cursor"] is None
@@ -0,0 +1,46 @@
+import pytest
+
+from app.core.query_detector import NPlusOneError, detect_n_plus_one
+from app.core.supabase import supabase
+from app.repositories.attendance_repository import AttendanceRepository
+from app.repositories.student_repository import StudentRepository
+
+
+def load_students(db, count: int = 20):
+    db.load({
+        "program": [{"program_id": 1, "program_name": "Physics", "monthly_fee": 1000}],
+        "student": [{"student_id": s, "name": f"Student {s}", "roll_no": s} for s in range(1, count + 1)],
+        "enrollment": [{"enrollment_id": s, "student_id": s, "program_id": 1} for s in range(1, count + 1)],
+    })
+
+
+def test_keyset_paging_is_not_reported(fake_db):
+    load_students(fake_db)
+
+    with detect_n_plus_one(threshold=3):
+        rows = list(StudentRepository()._iter_search_rows(page_size=2))   # 11 pages
+        AttendanceRepository().rebuild_attendance_store(page_size=2)
+
+    assert len(rows) == 20
+
+
+def test_query_per_item_is_reported(fake_db):
+    load_students(fake_db)
+
+    with pytest.raises(NPlusOneError) as error:
+        with detect_n_plus_one(threshold=3):
+            for student_id in range(1, 6):
+                supabase.table("enrollment").select("*").eq("student_id", student_id).execute()
+
+    assert "5x  GET enrollment" in str(error.value)
+
+
+def test_restarting_a_paged_loop_per_item_is_reported(fake_db):
+    load_students(fake_db)
+    repo = StudentRepository()
+
+    # Each walk's first page has no cursor, so walking the table once per item still counts
+    with pytest.raises(NPlusOneError):
+        with detect_n_plus_one(threshold=3):
+            for _ in range(4):
+                list(repo._iter_search_rows(page_size=5))
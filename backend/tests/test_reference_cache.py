@@ -0,0 +1,39 @@
+from app.core.cache import cache
+from app.repositories.exam_repository import ExamRepository
+from app.repositories.program_repository import ProgramRepository
+from app.schemas.exam import ExamCreate
+from app.schemas.program import BatchCreate, ProgramCreate
+
+
+def test_program_list_is_cached_until_a_program_is_created(fake_db):
+    fake_db.load({"program": [{"program_id": 1, "program_name": "Physics", "monthly_fee": 1000}]})
+    repo = ProgramRepository()
+    # Start from a fresh generation: other tests may have cached a list for another database
+    cache.invalidate("programs")
+
+    assert [p["program_name"] for p in repo.get_all_programs()] == ["Physics"]
+
+    # A row written behind the repository's back is not seen: the list comes from memory
+    fake_db.load({"program": [{"program_id": 2, "program_name": "Chemistry", "monthly_fee": 900}]})
+    assert [p["program_name"] for p in repo.get_all_programs()] == ["Physics"]
+
+    # Writing through the repository invalidates the namespace, so the next read goes to the DB
+    repo.create_program(ProgramCreate(program_name="Biology", monthly_fee=800))
+    assert sorted(p["program_name"] for p in repo.get_all_programs()) == ["Biology", "Chemistry", "Physics"]
+
+
+def test_batch_and_exam_writes_invalidate_their_lists(fake_db):
+    fake_db.load({"program": [{"program_id": 1, "program_name": "Physics", "monthly_fee": 1000}]})
+    programs, exams = ProgramRepository(), ExamRepository()
+    cache.invalidate("batches", "exams")
+
+    assert programs.get_all_batches() == []
+    programs.create_batch(BatchCreate(batch_name="HSC 2026"))
+    assert [b["batch_name"] for b in programs.get_all_batches()] == ["HSC 2026"]
+
+    assert exams.get_exams_by_program(1) == []
+    exam = exams.create_exam(ExamCreate(program_id=1, exam_name="Weekly 1", total_marks=50))
+    assert [e["exam_name"] for e in exams.get_exams_by_program(1)] == ["Weekly 1"]
+
+    exams.delete_exam(exam["exam_id"])
+    assert exams.get_exams_by_program(1) == []
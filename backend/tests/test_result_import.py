@@ -0,0 +1,30 @@
+from app.core.supabase import supabase
+from app.repositories.result_repository import ResultRepository
+
+
+def test_import_reports_every_row(fake_db, load_class):
+    load_class(students=4, months=1)
+    fake_db.load({"exam": [{"exam_id": 1, "program_id": 1, "exam_name": "Weekly 1", "total_marks": 50}]})
+    rows = enumerate([
+        {"student_id": 1, "written_marks": 30, "mcq_marks": 10},
+        {"student_id": 2, "written_marks": 45, "mcq_marks": 10},    # more than the total marks
+        {"student_id": 99, "written_marks": 20, "mcq_marks": 5},    # not enrolled in the program
+        {"student_id": 3, "written_marks": 10, "mcq_marks": 5},
+        {"student_id": "x", "written_marks": 10, "mcq_marks": 5},   # not a student id
+        {"student_id": 3, "written_marks": 12, "mcq_marks": 6},     # replaces the earlier row of student 3
+        {"student_id": 4, "written_marks": 25, "mcq_marks": 15},
+    ], start=2)
+
+    report = ResultRepository().import_results(1, rows)
+
+    assert report["summary"] == {"total_rows": 7, "accepted": 3, "rejected": 3, "unmatched": 1, "failed": 0}
+    assert [(r["row"], r["student_id"], r["status"]) for r in report["rows"]] == [
+        (2, 1, "accepted"), (3, 2, "rejected"), (4, 99, "unmatched"), (5, 3, "rejected"),
+        (6, "x", "rejected"), (7, 3, "accepted"), (8, 4, "accepted"),
+    ]
+    assert report["rows"][3]["reason"] == "Superseded by row 7"
+
+    saved = supabase.table("student_individual_result").select("enrollment_id, total_score")\
+        .eq("exam_id", 1).order("enrollment_id").execute().data
+    assert saved == [{"enrollment_id": 1, "total_score": 40}, {"enrollment_id": 3, "total_score": 18},
+                     {"enrollment_id": 4, "total_score": 40}]
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def wait_for_followers(flight: SingleFlight, name: str, followers: int):
+    deadline = time.monotonic() + 5
+    while flight.stats()["calls"].get(name, {}).get("followers", 0) < followers:
+        assert time.monotonic() < deadline, "followers never arrived"
+        time.sleep(0.01)
+
+
+def make_repo(flight: SingleFlight, release, error: Exception = None):
+    class Repo:
+        calls = 0
+
+        @flight.coalesce("report")
+        def report(self, program_id):
+            Repo.calls += 1
+            release.wait(5)
+            if error:
+                raise error
+            return {"program_id": program_id}
+
+        @flight.coalesce("report_async")
+        async def report_async(self, program_id):
+            Repo.calls += 1
+            await release.wait()
+            if error:
+                raise error
+            return {"program_id": program_id}
+
+    return Repo
+
+
+def test_concurrent_threads_share_one_call():
+    flight, release = SingleFlight(enabled=True), threading.Event()
+    Repo = make_repo(flight, release)
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(Repo().report, 1) for _ in range(CALLERS)]
+        wait_for_followers(flight, "report", CALLERS - 1)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert Repo.calls == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats()["calls"]["report"] == {"leaders": 1, "followers": CALLERS - 1}
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_leader_error_reaches_every_thread():
+    flight, release = SingleFlight(enabled=True), threading.Event()
+    error = RuntimeError("database unavailable")
+    Repo = make_repo(flight, release, error)
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(Repo().report, 1) for _ in range(CALLERS)]
+        wait_for_followers(flight, "report", CALLERS - 1)
+        release.set()
+        errors = [f.exception(5) for f in futures]
+
+    assert Repo.calls == 1
+    assert all(e is error for e in errors)
+
+
+async def gather_callers(flight: SingleFlight, error: Exception = None):
+    release = asyncio.Event()
+    Repo = make_repo(flight, release, error)
+    tasks = [asyncio.ensure_future(Repo().report_async(1)) for _ in range(CALLERS)]
+    await asyncio.sleep(0)   # every caller reaches do_async before the leader may finish
+    release.set()
+    return Repo, await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_concurrent_coroutines_share_one_call():
+    flight = SingleFlight(enabled=True)
+
+    Repo, results = asyncio.run(gather_callers(flight))
+
+    assert Repo.calls == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats()["calls"]["report_async"] == {"leaders": 1, "followers": CALLERS - 1}
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_leader_error_reaches_every_coroutine():
+    flight = SingleFlight(enabled=True)
+    error = RuntimeError("database unavailable")
+
+    Repo, results = asyncio.run(gather_callers(flight, error))
+
+    assert Repo.calls == 1
+    assert all(r is error for r in results)
+
+
+def test_a_finished_call_is_not_reused():
+    flight, release = SingleFlight(enabled=True), threading.Event()
+    release.set()
+    Repo = make_repo(flight, release)
+
+    assert Repo().report(1) == Repo().report(1)
+    assert Repo.calls == 2
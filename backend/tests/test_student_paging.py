@@ -0,0 +1,22 @@
+from app.repositories.student_repository import StudentRepository
+from app.core.pagination import decode_cursor
+
+
+def test_roll_no_cursor_walks_into_students_without_a_roll_no(fake_db):
+    # Ties on roll_no (2) and a tail without one: order is roll_no, then student_id, NULLs last
+    rolls = {1: 3, 2: None, 3: 2, 4: 1, 5: None, 6: 2, 7: None}
+    fake_db.load({"student": [{"student_id": s, "name": f"Student {s}", "roll_no": r} for s, r in rolls.items()]})
+    repo = StudentRepository()
+
+    seen, cursors, cursor = [], [], None
+    while True:
+        page = repo.get_students_page(limit=2, cursor=cursor, order_by="roll_no", fields="name")
+        seen += [row["student_id"] for row in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+        cursors.append(decode_cursor(cursor))
+
+    assert seen == [4, 3, 6, 1, 2, 5, 7]
+    # One cursor stops on the roll_no tie, one on the last numbered student, one inside the NULL tail
+    assert cursors == [{"roll": 2, "id": 3}, {"roll": 3, "id": 1}, {"roll": None, "id": 5}]
@@ -0,0 +1,18 @@
+import asyncio
+
+from app.core.supabase_async import close_async_supabase, get_async_supabase
+
+
+async def clients_of_one_loop():
+    clients = await asyncio.gather(*(get_async_supabase() for _ in range(5)))
+    await close_async_supabase()
+    return clients
+
+
+def test_each_event_loop_gets_its_own_client():
+    first = asyncio.run(clients_of_one_loop())
+    second = asyncio.run(clients_of_one_loop())
+
+    assert len({id(c) for c in first}) == 1
+    assert len({id(c) for c in second}) == 1
+    assert first[0] is not second[0]
@@ -111,7 +111,8 @@ CREATE TABLE IF NOT EXISTS attendance (
     attendance_id SERIAL PRIMARY KEY,
     enrollment_id INTEGER REFERENCES enrollment(enrollment_id) ON DELETE CASCADE,
     status VARCHAR(20), -- e.g., 'Present', 'Absent', 'Late'
-    date DATE DEFAULT CURRENT_DATE
+    date DATE DEFAULT CURRENT_DATE,
+    UNIQUE(enrollment_id, date)
 );
 
 -- 12. Payment Table
@@ -142,3 +143,217 @@ CREATE TRIGGER update_student_modtime
     BEFORE UPDATE ON student
     FOR EACH ROW
     EXECUTE FUNCTION update_modified_column();
+
+
+-- ==========================================
+-- Student Search (pg_trgm)
+-- ==========================================
+-- Trigram indexes let Postgres answer "name contains / looks like ..." without scanning
+-- the whole student table. Used by the 'search_students' function below
+-- (GET /students/search with STUDENT_SEARCH_BACKEND=database).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_student_name_trgm ON student USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_student_fathers_name_trgm ON student USING GIN (fathers_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_student_contact_prefix ON student (contact text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_student_roll_no ON student (roll_no);
+
+-- Ranked search: exact roll no > contact prefix > name prefix > trigram similarity
+-- The roll no cast sits inside a CASE: 'AND' gives no evaluation order, so
+-- "q ~ digits AND roll_no = q::INTEGER" may still cast a name like 'Rahim' and fail.
+-- A non-numeric q turns into NULL, which matches no roll no.
+CREATE OR REPLACE FUNCTION search_students(q TEXT, max_results INTEGER DEFAULT 20)
+RETURNS TABLE (
+    student_id INTEGER,
+    name VARCHAR,
+    fathers_name VARCHAR,
+    roll_no INTEGER,
+    contact VARCHAR,
+    school VARCHAR,
+    "class" INTEGER,
+    score REAL
+) AS $$
+    SELECT s.student_id, s.name, s.fathers_name, s.roll_no, s.contact, s.school, s.class,
+           GREATEST(
+               CASE WHEN s.roll_no = CASE WHEN q ~ '^[0-9]{1,9}$' THEN q::INTEGER END THEN 3.0 ELSE 0 END,
+               CASE WHEN length(q) >= 3 AND s.contact LIKE q || '%' THEN 2.0 ELSE 0 END,
+               CASE WHEN s.name ILIKE q || '%' THEN 1.0 + word_similarity(q, s.name) ELSE 0 END,
+               word_similarity(q, s.name),
+               0.6 * word_similarity(q, COALESCE(s.fathers_name, ''))
+           )::REAL AS score
+    FROM student s
+    WHERE q <% s.name
+       OR q <% s.fathers_name
+       OR s.name ILIKE q || '%'
+       OR (length(q) >= 3 AND s.contact LIKE q || '%')
+       OR s.roll_no = CASE WHEN q ~ '^[0-9]{1,9}$' THEN q::INTEGER END
+    ORDER BY score DESC, s.name
+    LIMIT max_results;
+$$ LANGUAGE sql STABLE;
+
+-- ==========================================
+-- EXAM ANALYTICS
+-- ==========================================
+-- Summary statistics for one exam, computed inside Postgres so only a small JSON
+-- document is sent back (GET /exams/{id}/analytics with EXAM_ANALYTICS_BACKEND=database).
+-- Mirrors app/services/exam_analytics.py: percentile_cont percentiles, stddev_pop,
+-- a histogram of total scores over 0 .. total_marks, and pass rate at p_pass_ratio x total_marks.
+CREATE INDEX IF NOT EXISTS idx_result_exam ON student_individual_result (exam_id);
+
+CREATE OR REPLACE FUNCTION exam_analytics(
+    p_exam_id INTEGER,
+    p_pass_ratio NUMERIC DEFAULT 0.4,
+    p_bins INTEGER DEFAULT 10
+)
+RETURNS JSON AS $$
+    WITH r AS (
+        SELECT COALESCE(written_marks, 0)::NUMERIC AS written,
+               COALESCE(mcq_marks, 0)::NUMERIC AS mcq,
+               (COALESCE(written_marks, 0) + COALESCE(mcq_marks, 0))::NUMERIC AS total
+        FROM student_individual_result
+        WHERE exam_id = p_exam_id
+    ),
+    e AS (
+        SELECT COALESCE(total_marks, 0)::NUMERIC AS total_marks,
+               ROUND(COALESCE(total_marks, 0) * p_pass_ratio, 2) AS pass_mark
+        FROM exam
+        WHERE exam_id = p_exam_id
+    ),
+    comp AS (
+        SELECT c.component,
+               json_build_object(
+                   'average', ROUND(AVG(c.v), 2),
+                   'highest', MAX(c.v),
+                   'lowest', MIN(c.v),
+                   'median', ROUND((percentile_cont(0.5) WITHIN GROUP (ORDER BY c.v))::NUMERIC, 2),
+                   'std_dev', ROUND(stddev_pop(c.v), 2),
+                   'p25', ROUND((percentile_cont(0.25) WITHIN GROUP (ORDER BY c.v))::NUMERIC, 2),
+                   'p75', ROUND((percentile_cont(0.75) WITHIN GROUP (ORDER BY c.v))::NUMERIC, 2),
+                   'p90', ROUND((percentile_cont(0.90) WITHIN GROUP (ORDER BY c.v))::NUMERIC, 2)
+               ) AS stats
+        FROM r
+        CROSS JOIN LATERAL (VALUES ('written', r.written), ('mcq', r.mcq), ('total', r.total)) AS c(component, v)
+        GROUP BY c.component
+    ),
+    hist AS (
+        SELECT LEAST(GREATEST(width_bucket(r.total, 0, e.total_marks, p_bins), 1), p_bins) AS bucket,
+               COUNT(*) AS cnt
+        FROM r, e
+        WHERE e.total_marks > 0
+        GROUP BY 1
+    )
+    SELECT json_build_object(
+        'total_students', (SELECT COUNT(*) FROM r),
+        'total_marks', e.total_marks,
+        'components', (SELECT json_object_agg(component, stats) FROM comp),
+        'pass_mark', e.pass_mark,
+        'pass_count', (SELECT COUNT(*) FROM r WHERE r.total >= e.pass_mark),
+        'pass_rate', ROUND((SELECT COUNT(*) FILTER (WHERE r.total >= e.pass_mark)::NUMERIC
+                                   / NULLIF(COUNT(*), 0) FROM r), 4),
+        'histogram', COALESCE((
+            SELECT json_agg(json_build_object(
+                       'from', ROUND((b - 1) * e.total_marks / p_bins, 2),
+                       'to', ROUND(b * e.total_marks / p_bins, 2),
+                       'count', COALESCE(h.cnt, 0)
+                   ) ORDER BY b)
+            FROM generate_series(1, p_bins) AS b
+            LEFT JOIN hist h ON h.bucket = b
+            WHERE e.total_marks > 0
+        ), '[]'::JSON)
+    )
+    FROM e;
+$$ LANGUAGE sql STABLE;
+
+-- ==========================================
+-- Attendance uniqueness
+-- ==========================================
+-- One attendance row per student per day. Saves use
+-- "upsert ... on_conflict (enrollment_id, date)", which needs this constraint.
+--
+-- Existing databases may already contain duplicates. Remove them first, either with
+--     python -m scripts.dedupe_attendance --apply      (from the 'backend' folder)
+-- or directly in SQL (keeps the newest row of every enrollment/day):
+DELETE FROM attendance a
+USING attendance newer
+WHERE a.enrollment_id = newer.enrollment_id
+  AND a.date = newer.date
+  AND a.attendance_id < newer.attendance_id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'attendance_enrollment_id_date_key'
+    ) THEN
+        ALTER TABLE attendance
+            ADD CONSTRAINT attendance_enrollment_id_date_key UNIQUE (enrollment_id, date);
+    END IF;
+END $$;
+
+-- The unique constraint's index serves "this student's days"; this one serves date ranges
+-- across a program ("who was absent between ... and ...").
+CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date, enrollment_id);
+
+-- ==========================================
+-- Payment events (transactional outbox)
+-- ==========================================
+-- Every payment INSERT statement also appends one 'payments.created' event per
+-- transaction_group_id, IN THE SAME TRANSACTION (statement trigger below): an event exists
+-- if and only if its payments were committed, without the app writing twice.
+--
+-- Consumers read the log in event_id order from their own offset
+-- (GET /payments/events/consumers/{name}, then POST .../ack) - at-least-once delivery,
+-- so consumers must tolerate seeing an event again.
+--
+-- The log is append-only; old events can be removed with e.g.
+--     DELETE FROM payment_event WHERE created_at < now() - INTERVAL '90 days';
+CREATE TABLE IF NOT EXISTS payment_event (
+    event_id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(40) NOT NULL DEFAULT 'payments.created',
+    transaction_group_id UUID,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_payment_event_group ON payment_event (transaction_group_id);
+
+-- Committed offset of every named consumer
+CREATE TABLE IF NOT EXISTS payment_event_consumer (
+    consumer VARCHAR(100) PRIMARY KEY,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION record_payment_events()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Serialize writers until commit, so event_ids become visible in increasing order and
+    -- a consumer reading "after offset N" never skips an event committed late.
+    PERFORM pg_advisory_xact_lock(hashtext('payment_event'));
+
+    INSERT INTO payment_event (event_type, transaction_group_id, payload)
+    SELECT 'payments.created',
+           n.transaction_group_id,
+           jsonb_build_object(
+               'payments', jsonb_agg(jsonb_build_object(
+                   'payment_id', n.payment_id,
+                   'enrollment_id', n.enrollment_id,
+                   'paid_amount', n.paid_amount,
+                   'month', n.month,
+                   'year', n.year,
+                   'status', n.status,
+                   'payment_date', n.payment_date
+               ) ORDER BY n.payment_id),
+               'total', SUM(n.paid_amount)
+           )
+    FROM new_payments n
+    GROUP BY n.transaction_group_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS payment_outbox ON payment;
+CREATE TRIGGER payment_outbox
+    AFTER INSERT ON payment
+    REFERENCING NEW TABLE AS new_payments
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION record_payment_events();
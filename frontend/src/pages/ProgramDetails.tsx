@@ -14,6 +14,10 @@ const ProgramDetails: React.FC = () => {
     const [isExamModalOpen, setIsExamModalOpen] = useState(false);
     const [attendanceDate, setAttendanceDate] = useState(new Date().toISOString().split('T')[0]);
     const [attendanceData, setAttendanceData] = useState<any[]>([]);
+    // Students tab: the first page comes with the program, later pages are appended here
+    const [moreEnrollments, setMoreEnrollments] = useState<any[]>([]);
+    const [enrollmentCursor, setEnrollmentCursor] = useState<string | null>(null);
+    const [loadingEnrollments, setLoadingEnrollments] = useState(false);
     const queryClient = useQueryClient();
 
     const { data: program, isLoading } = useQuery({
@@ -22,6 +26,26 @@ const ProgramDetails: React.FC = () => {
         enabled: !!id
     });
 
+    // Start over from the first page whenever the program (re)loads
+    React.useEffect(() => {
+        setMoreEnrollments([]);
+        setEnrollmentCursor(program?.enrollments?.next_cursor || null);
+    }, [program]);
+
+    const loadMoreEnrollments = async () => {
+        if (!enrollmentCursor) return;
+        setLoadingEnrollments(true);
+        try {
+            const page = await ProgramRepository.getProgramEnrollments(id!, enrollmentCursor);
+            setMoreEnrollments(prev => [...prev, ...page.items]);
+            setEnrollmentCursor(page.next_cursor);
+        } catch (error) {
+            alert("Failed to load more students");
+        } finally {
+            setLoadingEnrollments(false);
+        }
+    };
+
     // Fetch Attendance when tab is active
     const { data: fetchedAttendance, refetch: refetchAttendance } = useQuery({
         queryKey: ['attendance', id, attendanceDate],
@@ -64,21 +88,14 @@ const ProgramDetails: React.FC = () => {
     if (!program) return <div className="p-8">Program not found</div>;
 
     // --- Statistics Calculation ---
-    const totalEnrolled = program.enrollment?.length || 0;
-    const teachersCount = program.teacher_program_enrollment?.length || 0;
-    const totalExams = program.exam?.length || 0;
+    const totalEnrolled = program.counts?.enrollments || 0;
+    const teachersCount = program.counts?.teachers || 0;
+    const totalExams = program.counts?.exams || 0;
+    const enrollments = [...(program.enrollments?.items || []), ...moreEnrollments];
 
-    // Calculate Fees
-    let totalCollected = 0;
-    let totalDue = 0; // This requires more complex logic, for now we sum known dues if available
-
-    // Iterate through enrollments to sum up payments (if loaded)
-    program.enrollment?.forEach((enroll: any) => {
-        enroll.payment?.forEach((pay: any) => {
-            // Assuming 'paid_amount' exists in payment table
-            totalCollected += Number(pay.paid_amount || 0);
-        });
-    });
+    // Fees are summed on the server (no need to download every payment).
+    // 'totals' is null until the server has loaded its dues snapshot.
+    const totalCollected = program.totals ? `৳${program.totals.collected}` : '—';
 
     return (
         <div className="space-y-6">
@@ -122,7 +139,7 @@ const ProgramDetails: React.FC = () => {
                         <p className="text-xs text-gray-500 uppercase font-semibold">Total Revenue</p>
                         <div className="flex items-center gap-2 mt-1">
                             <DollarSign size={20} className="text-green-500" />
-                            <span className="text-xl font-bold text-gray-900">৳{totalCollected}</span>
+                            <span className="text-xl font-bold text-gray-900">{totalCollected}</span>
                         </div>
                     </div>
                     <div className="p-3 bg-gray-50 rounded-lg">
@@ -190,7 +207,7 @@ const ProgramDetails: React.FC = () => {
                                     </tr>
                                 </thead>
                                 <tbody>
-                                    {program.enrollment?.map((enroll: any) => (
+                                    {enrollments.map((enroll: any) => (
                                         <tr key={enroll.enrollment_id} className="hover:bg-gray-50 border-b border-gray-50">
                                             <td className="p-3 text-gray-500 text-sm">#{enroll.student.student_id}</td>
                                             <td className="p-3 font-medium text-gray-900">{enroll.student.name}</td>
@@ -213,6 +230,18 @@ const ProgramDetails: React.FC = () => {
                                     )}
                                 </tbody>
                             </table>
+                            {enrollmentCursor && (
+                                <div className="flex justify-between items-center pt-4 text-sm text-gray-500">
+                                    <span>Showing {enrollments.length} of {totalEnrolled} students</span>
+                                    <button
+                                        onClick={loadMoreEnrollments}
+                                        disabled={loadingEnrollments}
+                                        className="border border-gray-300 px-3 py-1.5 rounded hover:bg-gray-50 disabled:opacity-50"
+                                    >
+                                        {loadingEnrollments ? 'Loading...' : 'Load more'}
+                                    </button>
+                                </div>
+                            )}
                         </div>
                     )}
 
@@ -233,7 +262,7 @@ const ProgramDetails: React.FC = () => {
                                 </div>
                             ) : (
                                 <ul className="space-y-2">
-                                    {program.exam?.map((exam: any) => (
+                                    {program.exams?.items?.map((exam: any) => (
                                         <li key={exam.exam_id} className="border p-4 rounded-lg flex justify-between items-center hover:bg-gray-50 transition-colors">
                                             <Link to={`/exams/${exam.exam_id}`} className="block flex-1">
                                                 <div>
@@ -1,3 +1,5 @@
+import { idempotentPost } from "./idempotentPost";
+
 const API_BASE_URL = "http://127.0.0.1:8000";
 
 export const ExamRepository = {
@@ -56,11 +58,7 @@ export const ExamRepository = {
 
     // 6. Submit Bulk Results
     async submitBulkResults(data: { exam_id: number, results: any[] }) {
-        const response = await fetch(`${API_BASE_URL}/results/bulk`, {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(data),
-        });
+        const response = await idempotentPost(`${API_BASE_URL}/results/bulk`, data);
         if (!response.ok) throw new Error("Failed to submit results");
         return await response.json();
     }
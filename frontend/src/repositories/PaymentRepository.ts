@@ -1,3 +1,5 @@
+import { idempotentPost } from "./idempotentPost";
+
 const API_BASE_URL = "http://127.0.0.1:8000";
 
 export const PaymentRepository = {
@@ -14,22 +16,14 @@ export const PaymentRepository = {
         // User backend now has 'create_bulk_payment'. 
         // Let's implement 'createBulkPayment' for the new logic, and maybe keep this for legacy if needed, 
         // or redirect. For now, we add the new ones.
-        const response = await fetch(`${API_BASE_URL}/payments`, {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(payment)
-        });
+        const response = await idempotentPost(`${API_BASE_URL}/payments`, payment);
         if (!response.ok) throw new Error("Failed to record payment");
         return await response.json();
     },
 
     // New: Bulk Payment (Atomic)
     async createBulkPayment(payments: any[]) {
-        const response = await fetch(`${API_BASE_URL}/payments/bulk`, {
-            method: "POST", // We need to ensure we have a route for this!
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(payments)
-        });
+        const response = await idempotentPost(`${API_BASE_URL}/payments/bulk`, payments);
         if (!response.ok) throw new Error("Failed to record bulk payment");
         return await response.json();
     },
@@ -30,11 +30,20 @@ export const ProgramRepository = {
     },
 
     async getProgramById(id: string) {
-        const response = await fetch(`${API_BASE_URL}/programs/${id}`);
+        // Summary (counts + totals) plus only the sections the Details page renders
+        const response = await fetch(`${API_BASE_URL}/programs/${id}?include=enrollments,exams`);
         if (!response.ok) throw new Error("Failed to fetch program details");
         return await response.json();
     },
 
+    async getProgramEnrollments(id: string, cursor: string) {
+        // Next page of the Students tab: { items, next_cursor }
+        const params = new URLSearchParams({ limit: "500", cursor });
+        const response = await fetch(`${API_BASE_URL}/programs/${id}/enrollments?${params}`);
+        if (!response.ok) throw new Error("Failed to fetch enrollments");
+        return await response.json();
+    },
+
     async createProgram(programData: any) {
         const response = await fetch(`${API_BASE_URL}/programs`, {
             method: "POST",
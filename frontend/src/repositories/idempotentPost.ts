@@ -0,0 +1,19 @@
+// POST with an 'Idempotency-Key' header (see backend/app/core/idempotency.py).
+// When the network drops before a response arrives, the SAME request (same key) is sent again:
+// the server recognises the key and returns the first result instead of saving twice.
+export async function idempotentPost(url: string, body: unknown, retries = 2): Promise<Response> {
+    const key = crypto.randomUUID();
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await fetch(url, {
+                method: "POST",
+                headers: { "Content-Type": "application/json", "Idempotency-Key": key },
+                body: JSON.stringify(body),
+            });
+        } catch (err) {
+            // fetch only rejects when no response came back (offline, connection reset, ...)
+            if (attempt >= retries) throw err;
+            await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+        }
+    }
+}